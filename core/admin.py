@@ -6,7 +6,11 @@ para el módulo core del sistema.
 """
 
 from django.contrib import admin
-from .models import SystemConfig
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import SlowQuery, SystemConfig
+from .slow_queries import fingerprint_report
 from .reservation_security import ReservationSecurityRule, ReservationUsageLog
 
 
@@ -139,3 +143,52 @@ class ReservationUsageLogAdmin(admin.ModelAdmin):
             f"Se eliminaron {count} logs de más de 90 días."
         )
     delete_old_logs.short_description = "Eliminar logs antiguos (>90 días)"
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Consultas lentas registradas y su informe agrupado por huella."""
+
+    change_list_template = 'admin/core/slowquery/change_list.html'
+    list_display = ['created_at', 'duration_ms', 'view_name', 'fingerprint', 'sql_preview']
+    list_filter = ['view_name', 'created_at']
+    search_fields = ['fingerprint', 'sql', 'view_name', 'path']
+    readonly_fields = [
+        'fingerprint', 'sql', 'duration_ms', 'view_name', 'path', 'stack', 'created_at'
+    ]
+    ordering = ['-created_at']
+
+    def sql_preview(self, obj):
+        """Mostrar el inicio del SQL normalizado."""
+        return obj.sql[:100] + "..." if len(obj.sql) > 100 else obj.sql
+    sql_preview.short_description = "SQL"
+
+    def has_add_permission(self, request):
+        """Los registros solo los crea RequestTimingMiddleware."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Solo lectura."""
+        return False
+
+    def get_urls(self):
+        report = self.admin_site.admin_view(self.report_view)
+        return [
+            path('informe/', report, name='core_slowquery_report'),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        """Cantidad, p95 y tiempo total por huella de consulta."""
+        queryset = self.get_queryset(request)
+        view_name = request.GET.get('view_name')
+        if view_name:
+            queryset = queryset.filter(view_name=view_name)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Informe de consultas lentas",
+            'report': fingerprint_report(queryset),
+            'view_name': view_name,
+            'total_rows': queryset.count(),
+        }
+        return TemplateResponse(request, 'admin/core/slowquery/report.html', context)
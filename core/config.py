@@ -0,0 +1,227 @@
+"""
+Servicio de configuración en tiempo de ejecución sobre SystemConfig.
+
+Todas las filas de SystemConfig se cargan una vez por proceso en un mapa
+tipado (int, float, bool, duración, JSON, zona horaria o texto). Cada
+parámetro conocido se declara en CONFIG_SCHEMA con su tipo y valor por
+defecto, que se usa mientras no exista la fila o si su valor es inválido.
+
+Al guardar o borrar una configuración se incrementa un sello de versión en
+la caché compartida (ver core/signals.py). Al inicio de cada solicitud se
+compara ese sello con el cargado (una lectura de caché) y solo si cambió
+se recargan las filas, por lo que las rutas calientes leen sus umbrales
+desde memoria sin consultar la base de datos.
+
+Uso:
+
+    from core.config import config
+    window = config.get('reservations.cancel_window')  # timedelta
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+import json
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+import pytz
+
+logger = logging.getLogger(__name__)
+
+CONFIG_VERSION_KEY = 'core:config:version'
+
+ConfigEntry = namedtuple('ConfigEntry', 'type default description')
+
+# Parámetros conocidos: clave -> (tipo, valor por defecto en texto, descripción)
+CONFIG_SCHEMA = {
+    'reservations.cancel_window': ConfigEntry(
+        'duration', '30m',
+        "Anticipación mínima para cancelar una reserva confirmada",
+    ),
+    'availability.continuous_gap': ConfigEntry(
+        'duration', '15m',
+        "Separación bajo la cual dos reservas seguidas se muestran como ocupación continua",
+    ),
+    'site.timezone': ConfigEntry(
+        'timezone', 'America/Santiago',
+        "Zona horaria local usada para los horarios de apertura de las salas",
+    ),
+    'booking.max_concurrent_per_room': ConfigEntry(
+        'int', '2',
+        "Reservas que se procesan a la vez por sala en cada proceso (ver rooms/admission.py)",
+    ),
+    'booking.max_concurrent_per_process': ConfigEntry(
+        'int', '4',
+        "Reservas que se procesan a la vez en cada proceso",
+    ),
+    'booking.max_queue': ConfigEntry(
+        'int', '32',
+        "Solicitudes de reserva que pueden esperar turno en cada proceso",
+    ),
+    'booking.queue_timeout': ConfigEntry(
+        'duration', '5s',
+        "Espera máxima en la cola antes de responder 503",
+    ),
+    'booking.retry_after': ConfigEntry(
+        'duration', '10s',
+        "Valor de Retry-After al rechazar una reserva por sobrecarga",
+    ),
+    'booking.idempotency_ttl': ConfigEntry(
+        'duration', '10m',
+        "Tiempo durante el cual un reenvío del formulario de reserva devuelve el resultado original",
+    ),
+    'booking.import_max_rows': ConfigEntry(
+        'int', '5000',
+        "Filas máximas de un CSV de horario; la importación bloquea sus salas mientras escribe (ver rooms/timetable_import.py)",
+    ),
+    'diagnostics.slow_query_threshold': ConfigEntry(
+        'duration', '100ms',
+        "Duración desde la cual una consulta SQL se registra como lenta (ver core/slow_queries.py)",
+    ),
+    'diagnostics.slow_query_stack_sample': ConfigEntry(
+        'float', '0.25',
+        "Fracción de las consultas lentas que guardan su pila de llamadas (0 a 1)",
+    ),
+    'diagnostics.slow_query_max_rows': ConfigEntry(
+        'int', '5000',
+        "Máximo de consultas lentas guardadas; se borran las más antiguas",
+    ),
+    'live.poll_interval': ConfigEntry(
+        'duration', '2s',
+        "Cada cuánto el estado en vivo de las salas revisa cambios de otros procesos (ver rooms/live_status.py)",
+    ),
+    'live.heartbeat_interval': ConfigEntry(
+        'duration', '15s',
+        "Intervalo de los mensajes de mantenimiento del flujo de estado en vivo",
+    ),
+    'live.stream_max_age': ConfigEntry(
+        'duration', '10m',
+        "Duración máxima de una conexión al flujo de estado en vivo bajo ASGI; el navegador reconecta",
+    ),
+    'live.wsgi_stream_max_age': ConfigEntry(
+        'duration', '1m',
+        "Duración máxima de una conexión al flujo bajo WSGI, donde cada conexión ocupa un hilo",
+    ),
+    'live.wsgi_max_streams': ConfigEntry(
+        'int', '2',
+        "Conexiones simultáneas al flujo de estado en vivo por proceso WSGI; las demás reciben 503",
+    ),
+    'live.client_poll_interval': ConfigEntry(
+        'duration', '30s',
+        "Cada cuánto las páginas servidas por WSGI consultan el estado de las salas en lugar del flujo",
+    ),
+    'security.rate_limits': ConfigEntry(
+        'json', json.dumps(getattr(settings, 'RATE_LIMITS', {})),
+        "Límites de solicitudes (por usuario o IP) por clase de ruta: {clase: {limit, window, methods}}",
+    ),
+}
+
+_DURATION_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|min|h|d)?\s*$', re.IGNORECASE)
+_DURATION_UNITS = {None: 1, 'ms': 0.001, 's': 1, 'm': 60, 'min': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_duration(value):
+    """Convertir '1800', '250ms', '30m', '1.5h' o '2d' a timedelta (sin unidad = segundos)."""
+    match = _DURATION_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Duración inválida: {value!r}")
+    amount, unit = match.groups()
+    return timedelta(seconds=float(amount) * _DURATION_UNITS[unit.lower() if unit else None])
+
+
+def parse_bool(value):
+    """Interpretar 'true', '1', 'sí', 'on'... como booleano."""
+    normalized = value.strip().lower()
+    if normalized in ('1', 'true', 'yes', 'si', 'sí', 'on'):
+        return True
+    if normalized in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError(f"Booleano inválido: {value!r}")
+
+
+PARSERS = {
+    'int': lambda value: int(value.strip()),
+    'float': lambda value: float(value.strip()),
+    'bool': parse_bool,
+    'duration': parse_duration,
+    'json': json.loads,
+    'timezone': lambda value: pytz.timezone(value.strip()),
+    'str': str,
+}
+
+
+def get_config_version():
+    """Sello de versión actual de la configuración (ms desde epoch)."""
+    version = cache.get(CONFIG_VERSION_KEY)
+    if version is None:
+        version = int(time.time() * 1000)
+        if not cache.add(CONFIG_VERSION_KEY, version, timeout=None):
+            version = cache.get(CONFIG_VERSION_KEY, version)
+    return version
+
+
+def bump_config_version():
+    """Invalidar la configuración cargada en todos los procesos."""
+    current = cache.get(CONFIG_VERSION_KEY, 0)
+    cache.set(CONFIG_VERSION_KEY, max(int(time.time() * 1000), current + 1), timeout=None)
+
+
+class ConfigService:
+    """Mapa tipado de SystemConfig, recargado solo cuando cambia su versión."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._defaults = {key: self._parse(key, entry.default) for key, entry in schema.items()}
+
+    def _parse(self, key, raw):
+        entry = self.schema.get(key)
+        return PARSERS[entry.type if entry else 'str'](raw)
+
+    def load(self):
+        """Cargar todas las filas de SystemConfig en una consulta."""
+        from .models import SystemConfig
+
+        values = dict(self._defaults)
+        try:
+            rows = list(SystemConfig.objects.values_list('key', 'value'))
+        except DatabaseError as e:
+            # Tabla aún no migrada: usar los valores por defecto
+            logger.warning("No se pudo cargar SystemConfig: %s", e)
+            rows = []
+
+        for key, raw in rows:
+            try:
+                values[key] = self._parse(key, raw)
+            except (ValueError, TypeError, pytz.UnknownTimeZoneError) as e:
+                logger.warning("Configuración inválida '%s' = %r, se usa el valor por defecto: %s", key, raw, e)
+        return values
+
+    def reload(self, version=None):
+        version = get_config_version() if version is None else version
+        values = self.load()
+        with self._lock:
+            self._values = values
+            self._version = version
+
+    def check_version(self, **kwargs):
+        """Recargar si otro proceso cambió la configuración (una lectura de caché)."""
+        version = get_config_version()
+        if version != self._version:
+            self.reload(version)
+
+    def get(self, key, default=None):
+        """Valor tipado de una configuración (o su valor por defecto)."""
+        if self._values is None:
+            self.reload()
+        return self._values.get(key, default)
+
+
+config = ConfigService(CONFIG_SCHEMA)
@@ -0,0 +1,366 @@
+"""
+Instrumentación de rendimiento por solicitud.
+
+RequestTimingMiddleware mide en cada solicitud:
+
+- Consultas SQL y su tiempo, con connection.execute_wrapper.
+- Tiempo de la vista (desde process_view hasta que vuelve la respuesta).
+- Tiempo de renderizado de plantillas, mediante el backend
+  InstrumentedDjangoTemplates (settings.TEMPLATES).
+- Aciertos y fallos de caché, informados por el backend de caché
+  (core/sqlite_cache.py llama a record_cache_lookup).
+- Consultas más lentas que 'diagnostics.slow_query_threshold', que se
+  guardan al terminar la solicitud (ver core/slow_queries.py).
+
+A los usuarios staff se les envían como cabecera Server-Timing (visible en
+las herramientas de desarrollo del navegador). Para todos, las mediciones
+se agregan por vista en histogramas de ventana móvil (view_histograms), que
+se muestran en el panel de rendimiento (core.security_views). Esos
+histogramas son de cada proceso; la latencia de todos los procesos sale del
+histograma compartido http_request_duration_seconds (shared_view_summary).
+
+Las métricas de la solicitud en curso viven en una ContextVar, por lo que
+el middleware funciona igual bajo WSGI y ASGI: asgiref copia el contexto
+al hilo donde sync_to_async ejecuta el ORM y las plantillas.
+"""
+
+from collections import deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+from .config import config
+from .metrics import CACHE_LOOKUPS, HTTP_REQUEST_DURATION, registry
+from .slow_queries import save_slow_queries, slow_query_record
+
+# Límites superiores (ms) de los buckets de latencia
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Ventana móvil de los histogramas: WINDOW_SLOTS intervalos de SLOT_SECONDS
+SLOT_SECONDS = 60
+WINDOW_SLOTS = 15
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Contadores de una solicitud en curso."""
+
+    __slots__ = (
+        'db_queries', 'db_time', 'template_time', 'view_time',
+        'cache_hits', 'cache_misses', 'view_started', '_template_depth',
+        'slow_query_threshold', 'stack_sample', 'slow_queries',
+    )
+
+    def __init__(self, slow_query_threshold=float('inf'), stack_sample=0.0):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.view_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.view_started = None
+        self._template_depth = 0
+        self.slow_query_threshold = slow_query_threshold
+        self.stack_sample = stack_sample
+        self.slow_queries = []
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """execute_wrapper: contar y cronometrar cada consulta, y anotar las lentas."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_queries += 1
+            self.db_time += elapsed
+            if elapsed >= self.slow_query_threshold:
+                self.slow_queries.append(slow_query_record(sql, elapsed, self.stack_sample))
+
+    def end_view(self):
+        """Cerrar el tiempo de la vista al volver la respuesta."""
+        if self.view_started is not None:
+            self.view_time = time.perf_counter() - self.view_started
+
+    def server_timing(self, total):
+        """Valor de la cabecera Server-Timing (duraciones en ms)."""
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} consultas"',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} aciertos, {self.cache_misses} fallos"',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+def current_metrics():
+    """Métricas de la solicitud en curso en este hilo (o None)."""
+    return _current.get()
+
+
+def record_cache_lookup(hits, misses=0):
+    """Registrar aciertos y fallos de caché en la solicitud en curso."""
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.cache_hits += hits
+        metrics.cache_misses += misses
+
+
+class InstrumentedTemplate(Template):
+    """Plantilla del backend Django que acumula su tiempo de renderizado."""
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        # Las plantillas anidadas (render_to_string dentro de otra) no se cuentan dos veces
+        metrics._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if not metrics._template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend DjangoTemplates cuyas plantillas informan su tiempo de renderizado."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _percentile_from_buckets(buckets, count, fraction, bounds=LATENCY_BUCKETS_MS):
+    """Límite superior del bucket que contiene el percentil (None si excede el último)."""
+    if not count:
+        return None
+    target = fraction * count
+    cumulative = 0
+    for bound, bucket_count in zip(bounds, buckets):
+        cumulative += bucket_count
+        if cumulative >= target:
+            return bound
+    return None
+
+
+class ViewHistograms:
+    """Histogramas de latencia por vista en una ventana móvil, con promedios de consultas y caché."""
+
+    FIELDS = ('count', 'total_ms', 'db_queries', 'db_ms', 'template_ms', 'cache_hits', 'cache_misses')
+
+    def __init__(self, slot_seconds=SLOT_SECONDS, window_slots=WINDOW_SLOTS):
+        self.slot_seconds = slot_seconds
+        self.window_slots = window_slots
+        self._lock = threading.Lock()
+        # Cada intervalo: (número de intervalo, {vista: {campo: valor, 'buckets': [...]}})
+        self._slots = deque(maxlen=window_slots)
+
+    def _current_slot(self, now):
+        slot_id = int(now // self.slot_seconds)
+        if not self._slots or self._slots[-1][0] != slot_id:
+            self._slots.append((slot_id, {}))
+        return self._slots[-1][1]
+
+    def observe(self, view_name, total, metrics, now=None):
+        elapsed_ms = total * 1000
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            views = self._current_slot(time.time() if now is None else now)
+            entry = views.get(view_name)
+            if entry is None:
+                entry = views[view_name] = dict.fromkeys(self.FIELDS, 0)
+                entry['buckets'] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['db_queries'] += metrics.db_queries
+            entry['db_ms'] += metrics.db_time * 1000
+            entry['template_ms'] += metrics.template_time * 1000
+            entry['cache_hits'] += metrics.cache_hits
+            entry['cache_misses'] += metrics.cache_misses
+            entry['buckets'][bucket] += 1
+
+    def snapshot(self, now=None):
+        """Resumen por vista de los intervalos dentro de la ventana, ordenado por tiempo total."""
+        oldest = int((time.time() if now is None else now) // self.slot_seconds) - self.window_slots + 1
+        merged = {}
+        with self._lock:
+            for slot_id, views in self._slots:
+                if slot_id < oldest:
+                    continue
+                for view_name, entry in views.items():
+                    target = merged.get(view_name)
+                    if target is None:
+                        target = merged[view_name] = dict.fromkeys(self.FIELDS, 0)
+                        target['buckets'] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                    for field in self.FIELDS:
+                        target[field] += entry[field]
+                    target['buckets'] = [a + b for a, b in zip(target['buckets'], entry['buckets'])]
+
+        summary = []
+        for view_name, entry in merged.items():
+            count = entry['count']
+            lookups = entry['cache_hits'] + entry['cache_misses']
+            summary.append({
+                'view': view_name,
+                'count': count,
+                'mean_ms': round(entry['total_ms'] / count, 1),
+                'p50_ms': _percentile_from_buckets(entry['buckets'], count, 0.50),
+                'p95_ms': _percentile_from_buckets(entry['buckets'], count, 0.95),
+                'p99_ms': _percentile_from_buckets(entry['buckets'], count, 0.99),
+                'total_ms': round(entry['total_ms'], 1),
+                'avg_queries': round(entry['db_queries'] / count, 1),
+                'avg_db_ms': round(entry['db_ms'] / count, 1),
+                'avg_template_ms': round(entry['template_ms'] / count, 1),
+                'cache_hit_ratio': round(entry['cache_hits'] / lookups, 3) if lookups else None,
+                'buckets': entry['buckets'],
+            })
+        summary.sort(key=lambda row: row['total_ms'], reverse=True)
+        return summary
+
+
+view_histograms = ViewHistograms()
+
+
+def shared_view_summary():
+    """
+    Latencia por vista de todos los procesos, desde el almacén de métricas.
+
+    A diferencia de view_histograms no es una ventana móvil: acumula desde
+    que se creó settings.METRICS_DB, y los demás procesos aportan sus
+    solicitudes con hasta FLUSH_INTERVAL de retraso. Solo incluye latencia
+    (consultas, plantillas y caché se miden por proceso).
+    """
+    registry.flush()
+    bounds_ms = [round(bound * 1000) for bound in HTTP_REQUEST_DURATION.buckets]
+    summary = []
+    for view_name, entry in HTTP_REQUEST_DURATION.by_label(registry.read(), 'view').items():
+        count = int(entry['count'])
+        if not count:
+            continue
+        buckets = [int(bucket_count) for bucket_count in entry['buckets']]
+        summary.append({
+            'view': view_name,
+            'count': count,
+            'mean_ms': round(entry['sum'] * 1000 / count, 1),
+            'p50_ms': _percentile_from_buckets(buckets, count, 0.50, bounds_ms),
+            'p95_ms': _percentile_from_buckets(buckets, count, 0.95, bounds_ms),
+            'p99_ms': _percentile_from_buckets(buckets, count, 0.99, bounds_ms),
+            'total_ms': round(entry['sum'] * 1000, 1),
+        })
+    summary.sort(key=lambda row: row['total_ms'], reverse=True)
+    return summary
+
+
+def get_view_name(request):
+    """Nombre de la vista resuelta (p. ej. 'rooms:room_list'), o None si la ruta no existe."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+class RequestTimingMiddleware:
+    """
+    Medir consultas, vista, plantillas y caché de cada solicitud.
+
+    Debe ir al inicio de MIDDLEWARE para que el total incluya al resto de
+    middlewares. Admite cadenas síncronas y asíncronas.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Evita que el handler envuelva process_view en sync_to_async
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = self._start()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            with self._wrap_connections(metrics):
+                response = self.get_response(request)
+            metrics.end_view()
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = self._start()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            # Las conexiones son locales al hilo: el wrapper se instala en el hilo
+            # donde sync_to_async ejecuta el ORM de esta solicitud
+            wrappers = await sync_to_async(self._wrap_connections)(metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+            metrics.end_view()
+        finally:
+            _current.reset(token)
+        # El usuario perezoso y el guardado de consultas lentas pueden consultar la base
+        return await sync_to_async(self._finish)(request, response, metrics, time.perf_counter() - started)
+
+    @staticmethod
+    def _start():
+        # Configuración ya cargada por request_started: solo lecturas en memoria
+        return RequestMetrics(
+            slow_query_threshold=config.get('diagnostics.slow_query_threshold').total_seconds(),
+            stack_sample=config.get('diagnostics.slow_query_stack_sample'),
+        )
+
+    @staticmethod
+    def _wrap_connections(metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.db_wrapper))
+        return stack
+
+    def _finish(self, request, response, metrics, total):
+        view_name = get_view_name(request)
+        if view_name is not None:
+            view_histograms.observe(view_name, total, metrics)
+            HTTP_REQUEST_DURATION.observe(total, view=view_name)
+        if metrics.cache_hits:
+            CACHE_LOOKUPS.inc(metrics.cache_hits, result='hit')
+        if metrics.cache_misses:
+            CACHE_LOOKUPS.inc(metrics.cache_misses, result='miss')
+        if metrics.slow_queries:
+            # Fuera del execute_wrapper: estas escrituras no se miden ni se registran
+            save_slow_queries(metrics.slow_queries, view_name, request.path)
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            response['Server-Timing'] = metrics.server_timing(total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+        return None
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        return RequestTimingMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
@@ -0,0 +1,197 @@
+"""
+Infraestructura de logging asíncrono.
+
+Los handlers de archivo no escriben en el hilo de la solicitud: cada
+registro se encola (QueueHandler) y un hilo de fondo (QueueListener) lo
+formatea y lo escribe en un archivo con rotación por tamaño. Si la cola se
+llena, el registro se descarta en lugar de bloquear la solicitud; la
+cantidad descartada se anota en el mismo archivo con el siguiente registro
+que se escribe (y al cerrar el handler).
+
+La rotación por tamaño solo es segura con un único proceso escribiendo el
+archivo (runserver, uvicorn con un worker). Con varios workers (gunicorn)
+cada uno rotaría el archivo por su cuenta y pisaría los respaldos de los
+demás: en ese caso se usa watched=True (LOG_EXTERNAL_ROTATION=1 en el
+entorno), que escribe con WatchedFileHandler y deja la rotación a una
+herramienta externa como logrotate.
+
+Incluye además:
+
+- JsonFormatter: un registro JSON por línea (logs estructurados).
+- SamplingFilter: muestreo por nivel para loggers de alta frecuencia
+  (p. ej. el log de cada solicitud en core.route_policy).
+
+Se configuran desde LOGGING en settings.py.
+"""
+
+import atexit
+from datetime import datetime, timezone
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+# Atributos estándar de LogRecord; el resto se considera "extra"
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord('', logging.INFO, '', 0, '', None, None).__dict__
+) | {'message', 'asctime'}
+
+_listeners = []
+_listeners_lock = threading.Lock()
+
+
+class AsyncRotatingFileHandler(logging.handlers.QueueHandler):
+    """
+    Handler que escribe en un RotatingFileHandler desde un hilo de fondo.
+
+    Args:
+        filename: Ruta del archivo de log (el directorio se crea si no existe)
+        maxBytes (int): Tamaño máximo antes de rotar
+        backupCount (int): Cantidad de archivos rotados a conservar
+        queue_size (int): Capacidad de la cola; al llenarse se descartan registros
+        encoding (str): Codificación del archivo
+        watched (bool): Escribir con WatchedFileHandler y dejar la rotación a
+                        una herramienta externa (varios procesos); ignora
+                        maxBytes y backupCount
+    """
+
+    def __init__(self, filename, maxBytes=5 * 1024 * 1024, backupCount=5,
+                 queue_size=10000, encoding='utf-8', watched=False):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        if watched:
+            self.target = logging.handlers.WatchedFileHandler(filename, encoding=encoding, delay=True)
+        else:
+            self.target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=maxBytes, backupCount=backupCount,
+                encoding=encoding, delay=True,
+            )
+        self.dropped = 0
+        self._unreported = 0
+        self._dropped_lock = threading.Lock()
+        self.listener = _DropReportingListener(self)
+        self.listener.start()
+        with _listeners_lock:
+            _listeners.append(self.listener)
+
+    def setFormatter(self, fmt):
+        # El formateo ocurre en el hilo de fondo, con el formatter del archivo
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        """
+        Copiar el registro listo para cruzar de hilo.
+
+        El mensaje se resuelve aquí (los argumentos podrían cambiar después),
+        pero el formateo completo (fecha, JSON, etc.) queda para el listener.
+        """
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+                self._unreported += 1
+
+    def report_dropped(self):
+        """Escribir en el archivo cuántos registros se descartaron desde el último aviso."""
+        with self._dropped_lock:
+            count, self._unreported = self._unreported, 0
+        if count:
+            self.target.handle(logging.makeLogRecord({
+                'name': __name__,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'module': 'logging_pipeline',
+                'msg': f"Cola de logging llena: se descartaron {count} registros "
+                       f"({self.dropped} desde el inicio del proceso)",
+                'dropped': count,
+            }))
+
+    def close(self):
+        with _listeners_lock:
+            running = self.listener in _listeners
+            if running:
+                _listeners.remove(self.listener)
+        if running:
+            self.listener.stop()
+        self.report_dropped()
+        self.target.close()
+        super().close()
+
+
+class _DropReportingListener(logging.handlers.QueueListener):
+    """QueueListener que antepone el aviso de registros descartados."""
+
+    def __init__(self, owner):
+        super().__init__(owner.queue, owner.target, respect_handler_level=False)
+        self.owner = owner
+
+    def handle(self, record):
+        self.owner.report_dropped()
+        super().handle(record)
+
+
+@atexit.register
+def stop_listeners():
+    """Vaciar las colas pendientes al terminar el proceso."""
+    with _listeners_lock:
+        listeners = list(_listeners)
+        _listeners.clear()
+    for listener in listeners:
+        listener.stop()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatear cada registro como un objeto JSON en una línea."""
+
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                payload[key] = value
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Dejar pasar solo una fracción de los registros de ciertos niveles.
+
+    Args:
+        rates (dict): Nivel -> fracción a conservar, p. ej. {'DEBUG': 0.01}.
+                      Los niveles no indicados se conservan siempre.
+    """
+
+    def __init__(self, rates=None, name=''):
+        super().__init__(name)
+        self.rates = {
+            logging.getLevelName(level) if isinstance(level, str) else level: rate
+            for level, rate in (rates or {}).items()
+        }
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or random.random() < rate
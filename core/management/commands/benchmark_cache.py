@@ -0,0 +1,127 @@
+"""
+Comando para comparar los backends de caché disponibles.
+
+Mide la latencia de get, set, add e incr de LocMemCache, FileBasedCache y
+core.sqlite_cache.SQLiteCache, y verifica si los contadores incrementados
+desde varios procesos a la vez se comparten sin perder actualizaciones.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+
+def _increment_worker(cache, key, iterations):
+    for _ in range(iterations):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0)
+            cache.incr(key)
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia y la consistencia entre procesos de los backends de caché'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=2000,
+            help='Operaciones por medición (default: 2000)',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=4,
+            help='Procesos concurrentes en la prueba de incr (default: 4)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        processes = options['processes']
+
+        with tempfile.TemporaryDirectory() as directory:
+            backends = [
+                ('LocMemCache', lambda: LocMemCache('benchmark', {})),
+                ('FileBasedCache', lambda: FileBasedCache(os.path.join(directory, 'files'), {})),
+                ('SQLiteCache', lambda: SQLiteCache(os.path.join(directory, 'cache.sqlite3'), {})),
+            ]
+
+            self.stdout.write(
+                f"⏱️  Benchmark de caché: {iterations} operaciones, {processes} procesos para incr\n"
+            )
+            self.stdout.write(
+                f"{'Backend':<16}{'get':>10}{'set':>10}{'add':>10}{'incr':>10}   incr entre procesos"
+            )
+            for name, factory in backends:
+                cache = factory()
+                timings = self.measure(cache, iterations)
+                shared, expected = self.measure_shared_counter(factory, processes, iterations // 4)
+                status = '✅' if shared == expected else '❌'
+                self.stdout.write(
+                    f"{name:<16}"
+                    + ''.join(f"{timings[operation]:>8.1f}µs" for operation in ('get', 'set', 'add', 'incr'))
+                    + f"   {status} {shared}/{expected}"
+                )
+
+        self.stdout.write("\nLatencias promedio por operación (µs) en un solo proceso.")
+
+    def measure(self, cache, iterations):
+        """Latencia promedio (µs) de cada operación."""
+        cache.clear()
+        keys = [f'bench:{index}' for index in range(iterations)]
+        timings = {}
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.set(key, {'value': key}, 300)
+        timings['set'] = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.get(key)
+        timings['get'] = (time.perf_counter() - start) / iterations * 1e6
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.add(f'{key}:add', 1, 300)
+        timings['add'] = (time.perf_counter() - start) / iterations * 1e6
+
+        cache.set('bench:counter', 0, 300)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            cache.incr('bench:counter')
+        timings['incr'] = (time.perf_counter() - start) / iterations * 1e6
+
+        cache.clear()
+        return timings
+
+    def measure_shared_counter(self, factory, processes, iterations):
+        """
+        Incrementar un contador desde varios procesos.
+
+        Returns:
+            tuple: (valor leído por el proceso padre, valor esperado)
+        """
+        cache = factory()
+        cache.set('bench:shared', 0, 300)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=_increment_worker, args=(cache, 'bench:shared', iterations))
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        result = cache.get('bench:shared', 0)
+        cache.clear()
+        return result, processes * iterations
@@ -0,0 +1,481 @@
+"""
+Comando de prueba de carga para los flujos de navegación y reserva.
+
+Crea (si no existen) salas, usuarios y reservas sintéticas y lanza
+usuarios virtuales concurrentes que recorren:
+
+    login → room_list → room_detail → room_reserve (GET y POST) → calendar_events_api
+
+Por defecto las solicitudes se ejecutan en el mismo proceso con el
+cliente de pruebas de Django (la aplicación WSGI completa, middlewares
+incluidos); con --base-url se envían por HTTP a un servidor local.
+
+Informa por endpoint el rendimiento (solicitudes/s), las latencias p50,
+p95 y p99, y las tasas de error y de rechazo por límite o sobrecarga
+(429/503). Los resultados se guardan en JSON para comparar entre commits
+(--compare).
+
+Como escribe en la base de datos configurada, solo se ejecuta con DEBUG
+activo (o con --force). Los usuarios virtuales reciben una contraseña
+aleatoria por ejecución y, salvo --keep, al terminar se eliminan las
+salas, los usuarios y las reservas sintéticos.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, time as dt_time, timedelta
+import http.cookiejar
+import json
+import os
+import random
+import re
+import secrets
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from rooms.models import Reservation, Room
+
+User = get_user_model()
+
+ROOM_PREFIX = 'Sala de carga'
+USER_PREFIX = 'carga_usuario'
+PURPOSE = 'Prueba de carga'
+
+ENDPOINTS = [
+    'login_form', 'login', 'room_list', 'room_detail',
+    'room_reserve_form', 'room_reserve', 'calendar_events_api',
+]
+
+_IDEMPOTENCY_PATTERN = re.compile(rb'name="idempotency_key" value="([^"]+)"')
+_CSRF_PATTERN = re.compile(rb'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class InProcessTransport:
+    """Solicitudes a la aplicación WSGI en este proceso (sin verificación CSRF)."""
+
+    def __init__(self, ip_address):
+        self.client = Client(REMOTE_ADDR=ip_address, HTTP_USER_AGENT='loadtest')
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            response = self.client.post(path, data or {})
+        else:
+            response = self.client.get(path, data or {})
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, response.get('Location', ''), body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """Solicitudes HTTP a un servidor en ejecución, con cookies y token CSRF."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # Con CSRF_USE_SESSIONS el token no viaja en una cookie: se toma del último formulario
+        self.csrf_token = ''
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        if method == 'POST':
+            payload = dict(data or {}, csrfmiddlewaretoken=self.csrf_token)
+            body = urllib.parse.urlencode(payload).encode()
+        elif data:
+            url += '?' + urllib.parse.urlencode(data)
+
+        request = urllib.request.Request(url, data=body, method=method, headers={
+            'User-Agent': 'loadtest',
+            'Referer': url,
+        })
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, location, content = response.status, response.headers.get('Location', ''), response.read()
+        except urllib.error.HTTPError as e:
+            status, location, content = e.code, e.headers.get('Location', ''), e.read()
+
+        match = _CSRF_PATTERN.search(content)
+        if match:
+            self.csrf_token = match.group(1).decode()
+        return status, location, content
+
+
+class VirtualUser:
+    """Recorre el flujo completo registrando cada solicitud."""
+
+    def __init__(self, index, username, password, transport, rooms, iterations, rng):
+        self.index = index
+        self.username = username
+        self.password = password
+        self.transport = transport
+        self.rooms = rooms
+        self.iterations = iterations
+        self.rng = rng
+        self.samples = []
+
+    def call(self, endpoint, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, location, body = self.transport.request(method, path, data)
+        except Exception as e:
+            self.samples.append((endpoint, 'exception', time.perf_counter() - started, type(e).__name__))
+            return None, '', b''
+        elapsed = time.perf_counter() - started
+        self.samples.append((endpoint, status, elapsed, self.classify(endpoint, status, location)))
+        return status, location, body
+
+    @staticmethod
+    def classify(endpoint, status, location):
+        if status >= 500 and status != 503:
+            return 'error'
+        if status in (429, 503):
+            return 'throttled'
+        if endpoint == 'room_reserve':
+            if status == 200:
+                return 'form_error'
+            if '/reserva/' in location:
+                return 'booked'
+            return 'rejected'
+        if endpoint == 'login' and status != 302:
+            return 'error'
+        return 'ok'
+
+    def slot(self, room):
+        """Franja de una hora en la próxima semana, dentro del horario de la sala."""
+        day = timezone.localdate() + timedelta(days=self.rng.randint(1, 6))
+        first_hour = max(room.opening_time.hour, 14)
+        last_hour = max(first_hour, room.closing_time.hour - 1)
+        start = datetime.combine(day, dt_time(self.rng.randint(first_hour, last_hour)))
+        return start, start + timedelta(hours=1)
+
+    def run(self):
+        login_path = reverse('usuarios:login')
+        self.call('login_form', 'GET', login_path)
+        status, _, _ = self.call('login', 'POST', login_path, {'username': self.username, 'password': self.password})
+        if status != 302:
+            return
+
+        for _ in range(self.iterations):
+            room = self.rng.choice(self.rooms)
+            self.call('room_list', 'GET', reverse('rooms:room_list'))
+            self.call('room_detail', 'GET', reverse('rooms:room_detail', args=[room.id]))
+
+            reserve_path = reverse('rooms:room_reserve', args=[room.id])
+            _, _, body = self.call('room_reserve_form', 'GET', reserve_path)
+            match = _IDEMPOTENCY_PATTERN.search(body or b'')
+            start, end = self.slot(room)
+            data = {
+                'room': room.id,
+                'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+                'end_time': end.strftime('%Y-%m-%dT%H:%M'),
+                'purpose': PURPOSE,
+                'attendees_count': 1,
+            }
+            if match:
+                data['idempotency_key'] = match.group(1).decode()
+            self.call('room_reserve', 'POST', reserve_path, data)
+
+            today = timezone.localdate()
+            self.call('calendar_events_api', 'GET', reverse('rooms:calendar_events_api'), {
+                'start': today.isoformat(),
+                'end': (today + timedelta(days=7)).isoformat(),
+            })
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga de los flujos de navegación y reserva con usuarios virtuales concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20,
+                            help='Usuarios virtuales concurrentes (default: 20)')
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Recorridos del flujo por usuario virtual (default: 5)')
+        parser.add_argument('--rooms', type=int, default=20,
+                            help='Salas sintéticas a crear (default: 20)')
+        parser.add_argument('--reservations-per-room', type=int, default=100,
+                            help='Reservas históricas sintéticas por sala (default: 100)')
+        parser.add_argument('--role', default='profesor',
+                            help='Rol de los usuarios virtuales (default: profesor)')
+        parser.add_argument('--base-url',
+                            help='Probar contra un servidor en ejecución (p. ej. http://127.0.0.1:8000) '
+                                 'en lugar de la aplicación en este proceso')
+        parser.add_argument('--output',
+                            help='Archivo JSON de resultados (default: logs/loadtest-<commit>-<fecha>.json)')
+        parser.add_argument('--compare',
+                            help='Resultados JSON previos con los que comparar')
+        parser.add_argument('--seed', type=int, default=1,
+                            help='Semilla para las decisiones de los usuarios virtuales (default: 1)')
+        parser.add_argument('--keep', action='store_true',
+                            help='Conservar las salas, usuarios y reservas sintéticos al terminar')
+        parser.add_argument('--force', action='store_true',
+                            help='Ejecutar aunque DEBUG esté desactivado')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['iterations'] < 1 or options['rooms'] < 1:
+            raise CommandError('--users, --iterations y --rooms deben ser al menos 1')
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                'La prueba de carga crea salas y usuarios en la base de datos configurada: '
+                'solo se ejecuta con DEBUG activo (use --force para ejecutarla de todos modos)'
+            )
+
+        self.stdout.write("🌱 Preparando datos sintéticos...")
+        password = secrets.token_urlsafe(16)
+        rooms = self.seed_rooms(options['rooms'], options['reservations_per_room'], options['role'])
+        usernames = self.seed_users(options['users'], options['role'], password)
+
+        mode = options['base_url'] or 'en proceso'
+        self.stdout.write(
+            f"🚀 {options['users']} usuarios virtuales × {options['iterations']} recorridos "
+            f"sobre {len(rooms)} salas ({mode})"
+        )
+
+        started_at = timezone.now()
+        virtual_users = []
+        for index, username in enumerate(usernames):
+            if options['base_url']:
+                transport = HttpTransport(options['base_url'])
+            else:
+                # Una IP distinta por usuario virtual, como en un despliegue real
+                transport = InProcessTransport(f'10.77.{index // 250}.{index % 250 + 1}')
+            virtual_users.append(VirtualUser(
+                index, username, password, transport, rooms, options['iterations'],
+                random.Random(options['seed'] * 100003 + index),
+            ))
+
+        elapsed = self.run_users(virtual_users)
+        samples = [sample for user in virtual_users for sample in user.samples]
+        results = self.summarize(samples, elapsed, options, started_at)
+
+        if not options['keep']:
+            self.cleanup()
+
+        self.print_report(results)
+        output = options['output'] or self.default_output(results)
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {output}"))
+
+        if options['compare']:
+            self.print_comparison(results, options['compare'])
+
+    def cleanup(self):
+        """Eliminar las salas, usuarios y reservas sintéticos (ver seed_rooms y seed_users)."""
+        _, reservations = Reservation.objects.filter(
+            Q(room__name__startswith=ROOM_PREFIX) | Q(user__username__startswith=USER_PREFIX)
+        ).delete()
+        _, rooms = Room.objects.filter(name__startswith=ROOM_PREFIX).delete()
+        _, users = User.objects.filter(username__startswith=USER_PREFIX).delete()
+        self.stdout.write(
+            f"🧹 Eliminadas {reservations.get(Reservation._meta.label, 0)} reservas, "
+            f"{rooms.get(Room._meta.label, 0)} salas y {users.get(User._meta.label, 0)} usuarios de la prueba"
+        )
+
+    def seed_rooms(self, count, reservations_per_room, role):
+        """Salas de carga abiertas de 8:00 a 22:00, con historial de reservas."""
+        existing = {room.name: room for room in Room.objects.filter(name__startswith=ROOM_PREFIX)}
+        missing = [
+            Room(
+                name=f'{ROOM_PREFIX} {index:03d}',
+                capacity=40,
+                location='Edificio de pruebas',
+                opening_time=dt_time(8, 0),
+                closing_time=dt_time(22, 0),
+                allowed_roles=f'admin,{role}',
+            )
+            for index in range(1, count + 1)
+            if f'{ROOM_PREFIX} {index:03d}' not in existing
+        ]
+        Room.objects.bulk_create(missing)
+        rooms = list(Room.objects.filter(name__startswith=ROOM_PREFIX).order_by('name')[:count])
+
+        # El dueño del historial nunca inicia sesión
+        owner, _ = User.objects.get_or_create(
+            username=f'{USER_PREFIX}_historial',
+            defaults={'role': role, 'password': make_password(None)},
+        )
+        seeded = set(
+            Reservation.objects.filter(room__in=rooms, user=owner).values_list('room_id', flat=True).distinct()
+        )
+        history = []
+        today = timezone.localdate()
+        for room in rooms:
+            if room.id in seeded:
+                continue
+            # Reservas pasadas de dos horas, una por franja: no se solapan entre sí
+            for index in range(reservations_per_room):
+                day = today - timedelta(days=1 + index // 3)
+                start = timezone.make_aware(datetime.combine(day, dt_time(8 + 2 * (index % 3))))
+                history.append(Reservation(
+                    room=room, user=owner, start_time=start, end_time=start + timedelta(hours=2),
+                    purpose='Historial de carga', attendees_count=10, status='completed',
+                ))
+        Reservation.objects.bulk_create(history, batch_size=1000)
+        self.stdout.write(f"   Salas: {len(rooms)} ({len(missing)} nuevas), reservas históricas nuevas: {len(history)}")
+        return rooms
+
+    def seed_users(self, count, role, password):
+        """Usuarios virtuales con la contraseña de esta ejecución (también los de un --keep previo)."""
+        usernames = [f'{USER_PREFIX}{index:03d}' for index in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Un solo hash para todos: el hasher es deliberadamente lento
+        password = make_password(password)
+        User.objects.filter(username__in=existing).update(password=password)
+        User.objects.bulk_create([
+            User(username=username, role=role, password=password, email=f'{username}@example.com')
+            for username in usernames if username not in existing
+        ])
+        self.stdout.write(f"   Usuarios virtuales: {count} ({count - len(existing)} nuevos)")
+        return usernames
+
+    def run_users(self, virtual_users):
+        barrier = threading.Barrier(len(virtual_users))
+
+        def run(user):
+            barrier.wait()
+            try:
+                user.run()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(user,)) for user in virtual_users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def summarize(self, samples, elapsed, options, started_at):
+        by_endpoint = defaultdict(list)
+        for sample in samples:
+            by_endpoint[sample[0]].append(sample)
+
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            entries = by_endpoint.get(endpoint, [])
+            if not entries:
+                continue
+            latencies = sorted(elapsed_s * 1000 for _, _, elapsed_s, _ in entries)
+            outcomes = Counter(outcome for _, _, _, outcome in entries)
+            errors = sum(count for outcome, count in outcomes.items() if outcome not in (
+                'ok', 'booked', 'rejected', 'form_error', 'throttled'))
+            endpoints[endpoint] = {
+                'requests': len(entries),
+                'throughput_rps': round(len(entries) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 0.50), 2),
+                'p95_ms': round(percentile(latencies, 0.95), 2),
+                'p99_ms': round(percentile(latencies, 0.99), 2),
+                'mean_ms': round(sum(latencies) / len(latencies), 2),
+                'max_ms': round(latencies[-1], 2),
+                'errors': errors,
+                'error_rate': round(errors / len(entries), 4),
+                'throttled_rate': round(outcomes['throttled'] / len(entries), 4),
+                'outcomes': dict(outcomes),
+                'status_codes': dict(Counter(str(status) for _, status, _, _ in entries)),
+            }
+
+        total_errors = sum(entry['errors'] for entry in endpoints.values())
+        return {
+            'commit': self.git_commit(),
+            'started_at': started_at.isoformat(),
+            'mode': 'http' if options['base_url'] else 'in_process',
+            'base_url': options['base_url'],
+            'database': connections['default'].vendor,
+            'parameters': {
+                key: options[key]
+                for key in ('users', 'iterations', 'rooms', 'reservations_per_room', 'role', 'seed')
+            },
+            'duration_s': round(elapsed, 3),
+            'total_requests': len(samples),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'error_rate': round(total_errors / len(samples), 4) if samples else 0,
+            'endpoints': endpoints,
+        }
+
+    @staticmethod
+    def git_commit():
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout.strip() or None
+
+    @staticmethod
+    def default_output(results):
+        stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        return os.path.join(settings.BASE_DIR, 'logs', f"loadtest-{results['commit'] or 'local'}-{stamp}.json")
+
+    def print_report(self, results):
+        self.stdout.write(
+            f"\n📊 {results['total_requests']} solicitudes en {results['duration_s']}s "
+            f"({results['throughput_rps']} sol/s, errores {results['error_rate']:.2%})\n"
+        )
+        self.stdout.write(
+            f"{'Endpoint':<22}{'sol':>6}{'sol/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'error':>8}{'429/503':>9}"
+        )
+        for endpoint, entry in results['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<22}{entry['requests']:>6}{entry['throughput_rps']:>9.1f}"
+                f"{entry['p50_ms']:>7.1f}ms{entry['p95_ms']:>7.1f}ms{entry['p99_ms']:>7.1f}ms"
+                f"{entry['error_rate']:>8.1%}{entry['throttled_rate']:>9.1%}"
+            )
+        reserve = results['endpoints'].get('room_reserve')
+        if reserve:
+            outcomes = ', '.join(f"{name}: {count}" for name, count in sorted(reserve['outcomes'].items()))
+            self.stdout.write(f"\n📝 Resultado de las reservas: {outcomes}")
+
+    def print_comparison(self, results, path):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                previous = json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {path}: {e}')
+
+        self.stdout.write(f"\n🔍 Comparación con {previous.get('commit') or path}:")
+        for endpoint, entry in results['endpoints'].items():
+            before = previous.get('endpoints', {}).get(endpoint)
+            if not before:
+                continue
+            p95_change = (entry['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+            rps_change = (
+                (entry['throughput_rps'] - before['throughput_rps']) / before['throughput_rps']
+                if before['throughput_rps'] else 0
+            )
+            marker = '⚠️ ' if p95_change > 0.2 else '   '
+            self.stdout.write(
+                f"{marker}{endpoint:<22} p95 {before['p95_ms']:.1f} → {entry['p95_ms']:.1f}ms ({p95_change:+.0%}), "
+                f"sol/s {before['throughput_rps']:.1f} → {entry['throughput_rps']:.1f} ({rps_change:+.0%})"
+            )
@@ -0,0 +1,289 @@
+"""
+Comparación WSGI/ASGI de las APIs JSON que el frontend consulta periódicamente.
+
+calendar_events_api, api_room_availability y security_stats_api son vistas
+asíncronas. El comando lanza --pollers clientes concurrentes que las
+consultan sin pausa (o con --think segundos entre consultas) y mide:
+
+- wsgi: la aplicación WSGI atendida por --threads hilos, como un servidor
+  WSGI con un grupo fijo de hilos; los clientes que no encuentran un hilo
+  libre esperan (esa espera cuenta en la latencia).
+- asgi: la aplicación ASGI en un solo bucle de eventos, como un proceso de
+  uvicorn; una solicitud solo ocupa un hilo mientras ejecuta código
+  síncrono (ORM, middlewares).
+
+Por defecto ambas se ejecutan en este proceso. Para medir servidores reales
+se indican sus URLs, por ejemplo:
+
+    gunicorn proyecto_calidad.wsgi --threads 8 -b 127.0.0.1:8001
+    uvicorn proyecto_calidad.asgi:application --port 8002
+    python manage.py pollbench --wsgi-url http://127.0.0.1:8001 --asgi-url http://127.0.0.1:8002
+"""
+
+from collections import Counter, defaultdict
+import asyncio
+import json
+import os
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .loadtest import Command as LoadTestCommand, HttpTransport, USER_PREFIX, percentile
+
+User = get_user_model()
+
+BENCH_USERNAME = f'{USER_PREFIX}_sondeo'
+ENDPOINTS = ('calendar', 'availability', 'stats')
+
+
+class Command(BaseCommand):
+    help = 'Comparar el rendimiento WSGI (hilos) y ASGI (bucle de eventos) de las APIs de sondeo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pollers', type=int, default=50,
+                            help='Clientes concurrentes (default: 50)')
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Consultas por cliente (default: 20)')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Hilos del servidor WSGI simulado en proceso (default: 8)')
+        parser.add_argument('--think', type=float, default=0.0,
+                            help='Pausa en segundos entre consultas de un cliente (default: 0)')
+        parser.add_argument('--endpoints', default='calendar,availability',
+                            help=f"APIs a consultar, separadas por coma: {', '.join(ENDPOINTS)} "
+                                 "(default: calendar,availability)")
+        parser.add_argument('--modes', default='wsgi,asgi',
+                            help='Modos a medir: wsgi, asgi (default: ambos)')
+        parser.add_argument('--wsgi-url',
+                            help='Servidor WSGI en ejecución (en lugar de la aplicación en proceso)')
+        parser.add_argument('--asgi-url',
+                            help='Servidor ASGI en ejecución (en lugar de la aplicación en proceso)')
+        parser.add_argument('--output',
+                            help='Archivo JSON de resultados (default: logs/pollbench-<commit>-<fecha>.json)')
+
+    def handle(self, *args, **options):
+        if options['pollers'] < 1 or options['requests'] < 1 or options['threads'] < 1:
+            raise CommandError('--pollers, --requests y --threads deben ser al menos 1')
+        endpoints = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        modes = [name.strip() for name in options['modes'].split(',') if name.strip()]
+        unknown = (set(endpoints) - set(ENDPOINTS)) | (set(modes) - {'wsgi', 'asgi'})
+        if unknown:
+            raise CommandError(f"Valores desconocidos: {', '.join(sorted(unknown))}")
+
+        self.stdout.write("🌱 Preparando datos sintéticos...")
+        room = LoadTestCommand(stdout=self.stdout).seed_rooms(1, 100, 'admin')[0]
+        user = self.seed_user()
+        paths = self.poll_paths(endpoints, room)
+
+        results = {
+            'commit': LoadTestCommand.git_commit(),
+            'started_at': timezone.now().isoformat(),
+            'parameters': {
+                key: options[key] for key in ('pollers', 'requests', 'threads', 'think', 'wsgi_url', 'asgi_url')
+            },
+            'endpoints': endpoints,
+            'modes': {},
+        }
+        for mode in modes:
+            url = options[f'{mode}_url']
+            self.stdout.write(
+                f"🚀 {mode.upper()}: {options['pollers']} clientes × {options['requests']} consultas "
+                f"({url or 'en proceso'})"
+            )
+            if url:
+                samples, elapsed = self.run_http(url, paths, options)
+            elif mode == 'wsgi':
+                samples, elapsed = self.run_wsgi(user, paths, options)
+            else:
+                samples, elapsed = asyncio.run(self.run_asgi(user, paths, options))
+            results['modes'][mode] = self.summarize(samples, elapsed)
+
+        self.print_report(results)
+        output = options['output'] or os.path.join(
+            settings.BASE_DIR, 'logs',
+            f"pollbench-{results['commit'] or 'local'}-{timezone.localtime().strftime('%Y%m%d-%H%M%S')}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {output}"))
+
+    def seed_user(self):
+        """Usuario staff de la prueba (security_stats_api exige staff), con contraseña por ejecución."""
+        self.password = secrets.token_urlsafe(16)
+        user, created = User.objects.update_or_create(
+            username=BENCH_USERNAME,
+            defaults={'role': 'admin', 'is_staff': True, 'password': make_password(self.password)},
+        )
+        self.stdout.write(f"   Usuario de sondeo: {user.username}{' (nuevo)' if created else ''}")
+        return user
+
+    @staticmethod
+    def poll_paths(endpoints, room):
+        """Ruta y parámetros de cada API, como los envía el frontend."""
+        today = timezone.localdate()
+        available = {
+            'calendar': (reverse('rooms:calendar_events_api'), {
+                'start': today.isoformat(),
+                'end': (today + timezone.timedelta(days=7)).isoformat(),
+                'show_all': 'true',
+            }),
+            'availability': (reverse('rooms:api_room_availability', args=[room.id]), {
+                'date': (today + timezone.timedelta(days=1)).isoformat(),
+                'start_time': '10:00',
+                'end_time': '11:00',
+            }),
+            'stats': (reverse('core:security_stats_api'), {'days': 7}),
+        }
+        return [(name, *available[name]) for name in endpoints]
+
+    def session_cookies(self, user):
+        """Cookies de una sesión válida (con la marca de actividad de RoutePolicyMiddleware)."""
+        client = Client()
+        client.force_login(user)
+        session = client.session
+        session['last_activity'] = True
+        session.save()
+        return client.cookies
+
+    def run_wsgi(self, user, paths, options):
+        cookies = self.session_cookies(user)
+        workers = threading.BoundedSemaphore(options['threads'])
+        started = []
+        barrier = threading.Barrier(options['pollers'], action=lambda: started.append(time.perf_counter()))
+        samples = []
+        lock = threading.Lock()
+
+        def poller(index):
+            client = Client(REMOTE_ADDR=f'10.78.{index // 250}.{index % 250 + 1}')
+            client.cookies = cookies
+            local = []
+            barrier.wait()
+            try:
+                for number in range(options['requests']):
+                    name, path, params = paths[number % len(paths)]
+                    sent = time.perf_counter()
+                    # Esperar un hilo libre del servidor cuenta como latencia
+                    with workers:
+                        status = client.get(path, params).status_code
+                    local.append((name, status, time.perf_counter() - sent))
+                    if options['think']:
+                        time.sleep(options['think'])
+            finally:
+                connections.close_all()
+                with lock:
+                    samples.extend(local)
+
+        threads = [threading.Thread(target=poller, args=(index,)) for index in range(options['pollers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started[0]
+
+    async def run_asgi(self, user, paths, options):
+        from asgiref.sync import sync_to_async
+
+        cookies = await sync_to_async(self.session_cookies)(user)
+        samples = []
+
+        async def poller(index):
+            client = AsyncClient(REMOTE_ADDR=f'10.79.{index // 250}.{index % 250 + 1}')
+            client.cookies = cookies
+            for number in range(options['requests']):
+                name, path, params = paths[number % len(paths)]
+                sent = time.perf_counter()
+                response = await client.get(path, params)
+                samples.append((name, response.status_code, time.perf_counter() - sent))
+                if options['think']:
+                    await asyncio.sleep(options['think'])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(poller(index) for index in range(options['pollers'])))
+        return samples, time.perf_counter() - started
+
+    def run_http(self, base_url, paths, options):
+        login_path = reverse('usuarios:login')
+        started = []
+        # El tiempo corre desde que todos los clientes iniciaron sesión
+        barrier = threading.Barrier(options['pollers'], action=lambda: started.append(time.perf_counter()))
+        samples = []
+        lock = threading.Lock()
+
+        def poller(index):
+            transport = HttpTransport(base_url)
+            transport.request('GET', login_path)
+            status, _, _ = transport.request('POST', login_path, {'username': BENCH_USERNAME, 'password': self.password})
+            local = []
+            barrier.wait()
+            for number in range(options['requests'] if status == 302 else 0):
+                name, path, params = paths[number % len(paths)]
+                sent = time.perf_counter()
+                try:
+                    code, _, _ = transport.request('GET', path, params)
+                except Exception as e:
+                    code = type(e).__name__
+                local.append((name, code, time.perf_counter() - sent))
+                if options['think']:
+                    time.sleep(options['think'])
+            with lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=poller, args=(index,)) for index in range(options['pollers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started[0]
+
+    @staticmethod
+    def summarize(samples, elapsed):
+        by_endpoint = defaultdict(list)
+        for name, status, seconds in samples:
+            by_endpoint[name].append((status, seconds * 1000))
+
+        def stats(entries):
+            latencies = sorted(ms for _, ms in entries)
+            errors = sum(1 for status, _ in entries if not isinstance(status, int) or status >= 400)
+            return {
+                'requests': len(entries),
+                'throughput_rps': round(len(entries) / elapsed, 2) if elapsed else 0,
+                'p50_ms': round(percentile(latencies, 0.50), 2) if latencies else None,
+                'p95_ms': round(percentile(latencies, 0.95), 2) if latencies else None,
+                'p99_ms': round(percentile(latencies, 0.99), 2) if latencies else None,
+                'errors': errors,
+                'status_codes': dict(Counter(str(status) for status, _ in entries)),
+            }
+
+        summary = stats([(status, ms) for entries in by_endpoint.values() for status, ms in entries])
+        summary['duration_s'] = round(elapsed, 3)
+        summary['by_endpoint'] = {name: stats(entries) for name, entries in by_endpoint.items()}
+        return summary
+
+    def print_report(self, results):
+        self.stdout.write(
+            f"\n📊 {'Modo':<6}{'Endpoint':<14}{'sol':>6}{'sol/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'error':>7}"
+        )
+        for mode, summary in results['modes'].items():
+            rows = [('total', summary)] + list(summary['by_endpoint'].items())
+            for name, entry in rows:
+                if not entry['requests']:
+                    self.stdout.write(f"   {mode:<6}{name:<14}{0:>6}")
+                    continue
+                self.stdout.write(
+                    f"   {mode:<6}{name:<14}{entry['requests']:>6}{entry['throughput_rps']:>9.1f}"
+                    f"{entry['p50_ms']:>8.1f}ms{entry['p95_ms']:>8.1f}ms{entry['p99_ms']:>8.1f}ms{entry['errors']:>7}"
+                )
+
+        wsgi, asgi = results['modes'].get('wsgi'), results['modes'].get('asgi')
+        if wsgi and asgi and wsgi['throughput_rps']:
+            ratio = asgi['throughput_rps'] / wsgi['throughput_rps']
+            self.stdout.write(f"\n⚖️  ASGI/WSGI: {ratio:.2f}x solicitudes por segundo")
@@ -0,0 +1,323 @@
+"""
+Registro de métricas compartido entre procesos, en formato Prometheus.
+
+Cada proceso acumula los incrementos en memoria y un hilo en segundo
+plano los suma cada FLUSH_INTERVAL segundos, en una sola transacción, a
+un archivo SQLite en modo WAL (settings.METRICS_DB); así la espera por
+el bloqueo de escritura nunca recae en una solicitud. Como solo se escriben deltas con
+INSERT ... ON CONFLICT DO UPDATE SET value = value + excluded.value,
+varios workers pueden escribir a la vez sin perder actualizaciones y el
+endpoint /metrics muestra la suma de todos los procesos. Los valores
+sobreviven a los reinicios (los contadores de Prometheus solo deben
+crecer; un reinicio sin pérdida evita falsos "resets").
+
+Métricas definidas (los módulos las importan desde aquí):
+
+    BOOKINGS_CREATED.inc(kind='single')
+    HTTP_REQUEST_DURATION.observe(0.042, view='rooms:room_list')
+"""
+
+from collections import defaultdict
+import atexit
+import bisect
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0  # segundos
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS metric_samples ("
+    " name TEXT NOT NULL,"
+    " labels TEXT NOT NULL,"
+    " value REAL NOT NULL,"
+    " PRIMARY KEY (name, labels)"
+    ") WITHOUT ROWID",
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    """'{a="1",b="2"}' a partir de pares ordenados (o '' sin etiquetas)."""
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+_LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+_ESCAPE_PATTERN = re.compile(r'\\(.)')
+
+
+def _unescape(match):
+    return '\n' if match.group(1) == 'n' else match.group(1)
+
+
+def _parse_labels(text):
+    """Inverso de _format_labels: '{a="1",b="2"}' -> {'a': '1', 'b': '2'}."""
+    return {name: _ESCAPE_PATTERN.sub(_unescape, value) for name, value in _LABEL_PATTERN.findall(text)}
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base de contadores e histogramas: valida etiquetas y escribe en el registro."""
+
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _label_pairs(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} requiere las etiquetas {self.labelnames}, recibió {sorted(labels)}")
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Un contador no puede disminuir")
+        self.registry.add(self.name, _format_labels(self._label_pairs(labels)), amount)
+
+    def samples(self, stored):
+        for labels, value in sorted(stored.get(self.name, {}).items()):
+            yield self.name, labels, value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=()):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        pairs = self._label_pairs(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        bound = self.buckets[index] if index < len(self.buckets) else math.inf
+        # Se guarda el conteo por bucket (no acumulado); se acumula al exportar
+        self.registry.add(f'{self.name}_bucket', _format_labels(pairs + (('le', _format_value(bound)),)), 1)
+        self.registry.add(f'{self.name}_sum', _format_labels(pairs), value)
+        self.registry.add(f'{self.name}_count', _format_labels(pairs), 1)
+
+    def samples(self, stored):
+        counts = stored.get(f'{self.name}_count', {})
+        sums = stored.get(f'{self.name}_sum', {})
+        buckets = stored.get(f'{self.name}_bucket', {})
+        for labels in sorted(counts):
+            inner = labels[1:-1] if labels else ''
+            prefix = inner + ',' if inner else ''
+            cumulative = 0
+            for bound in self.buckets + (math.inf,):
+                le = _format_value(bound)
+                cumulative += buckets.get('{' + prefix + f'le="{le}"' + '}', 0)
+                yield f'{self.name}_bucket', '{' + prefix + f'le="{le}"' + '}', cumulative
+            yield f'{self.name}_sum', labels, sums.get(labels, 0)
+            yield f'{self.name}_count', labels, counts[labels]
+
+    def by_label(self, stored, label):
+        """
+        Agrupar los valores guardados por una etiqueta.
+
+        Returns:
+            dict: valor de la etiqueta -> {'count', 'sum', 'buckets'}, con los
+                  conteos por bucket sin acumular (el último es +Inf)
+        """
+        bounds = [_format_value(bound) for bound in self.buckets + (math.inf,)]
+        grouped = {}
+        for labels, count in stored.get(f'{self.name}_count', {}).items():
+            key = _parse_labels(labels).get(label)
+            entry = grouped.setdefault(key, {'count': 0, 'sum': 0.0, 'buckets': [0] * len(bounds)})
+            entry['count'] += count
+            entry['sum'] += stored.get(f'{self.name}_sum', {}).get(labels, 0)
+        for labels, count in stored.get(f'{self.name}_bucket', {}).items():
+            parsed = _parse_labels(labels)
+            entry = grouped.get(parsed.get(label))
+            if entry is not None and parsed.get('le') in bounds:
+                entry['buckets'][bounds.index(parsed['le'])] += count
+        return grouped
+
+
+class MetricsRegistry:
+    """Métricas con búfer por proceso y almacenamiento compartido en SQLite."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._flusher = None
+        self._local = threading.local()
+        if hasattr(os, 'register_at_fork'):
+            # El hijo no debe volver a escribir lo que el padre tenía pendiente
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    @property
+    def path(self):
+        return str(self._path or getattr(settings, 'METRICS_DB', settings.BASE_DIR / 'metrics.sqlite3'))
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._flusher = None
+        self._local = threading.local()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=()):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    # Almacenamiento
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    def add(self, name, labels, amount):
+        """Sumar amount a la serie (name, labels); se escribe en el próximo flush."""
+        with self._lock:
+            self._pending[(name, labels)] += amount
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, name='metrics-flush', daemon=True,
+                )
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        """Hilo de fondo: escribir los incrementos pendientes cada FLUSH_INTERVAL segundos."""
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error inesperado al guardar las métricas")
+
+    def flush(self):
+        """Escribir los incrementos pendientes de este proceso."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+        if not pending:
+            return
+        rows = [(name, labels, value) for (name, labels), value in pending.items()]
+        try:
+            connection = self._connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    "INSERT INTO metric_samples (name, labels, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+                    rows,
+                )
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        except sqlite3.Error as e:
+            # Conservar los incrementos para el próximo intento
+            logger.warning("No se pudieron guardar las métricas: %s", e)
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending[key] += value
+
+    def read(self):
+        """Valores guardados: {nombre de serie: {etiquetas: valor}}."""
+        stored = defaultdict(dict)
+        for name, labels, value in self._connection().execute("SELECT name, labels, value FROM metric_samples"):
+            stored[name][labels] = value
+        return stored
+
+    def reset(self):
+        """Borrar todos los valores guardados y pendientes (pruebas o mantenimiento)."""
+        with self._lock:
+            self._pending = defaultdict(float)
+        self._connection().execute("DELETE FROM metric_samples")
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def exposition(self):
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        self.flush()
+        stored = self.read()
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples(stored):
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush)
+
+BOOKINGS_CREATED = registry.counter(
+    'booking_reservations_created_total', 'Reservas creadas', ['kind'],
+)
+BOOKINGS_CANCELLED = registry.counter(
+    'booking_reservations_cancelled_total', 'Reservas canceladas por sus usuarios',
+)
+BOOKINGS_OVERLOADED = registry.counter(
+    'booking_overloaded_total', 'Solicitudes de reserva rechazadas con 503 por el control de admisión',
+)
+SECURITY_EVENTS = registry.counter(
+    'security_events_total', 'Acciones registradas en ReservationUsageLog', ['action'],
+)
+SECURITY_BLOCKED_ATTEMPTS = registry.counter(
+    'security_attempts_blocked_total', 'Intentos de reserva bloqueados por tipo de violación', ['violation'],
+)
+SECURITY_USERS_BLOCKED = registry.counter(
+    'security_users_blocked_total', 'Usuarios bloqueados temporalmente',
+)
+RATE_LIMIT_REJECTIONS = registry.counter(
+    'http_rate_limited_total', 'Solicitudes rechazadas por el límite por IP', ['route_class'],
+)
+CACHE_LOOKUPS = registry.counter(
+    'cache_lookups_total', 'Lecturas de la caché compartida durante solicitudes', ['result'],
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Duración de las solicitudes por vista', ['view'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_reservationsecurityrule_reservationusagelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(db_index=True, help_text='Hash del SQL normalizado; agrupa las ejecuciones de una misma consulta', max_length=16)),
+                ('sql', models.TextField(help_text='SQL normalizado (valores reemplazados por ?)')),
+                ('duration_ms', models.FloatField(help_text='Duración de la consulta en milisegundos')),
+                ('view_name', models.CharField(blank=True, help_text='Vista que ejecutó la consulta', max_length=200)),
+                ('path', models.CharField(blank=True, help_text='Ruta de la solicitud', max_length=500)),
+                ('stack', models.TextField(blank=True, help_text='Pila de llamadas del proyecto (solo en una muestra de los registros)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Consulta Lenta',
+                'verbose_name_plural': 'Consultas Lentas',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -182,3 +182,53 @@ class ErrorLog(models.Model):
         verbose_name = "Log de Error"
         verbose_name_plural = "Logs de Errores"
         ordering = ['-created_at']
+
+
+class SlowQuery(models.Model):
+    """
+    Consulta SQL lenta registrada durante una solicitud.
+
+    La escribe RequestTimingMiddleware; la tabla se mantiene acotada
+    (ver core/slow_queries.py).
+    """
+
+    fingerprint = models.CharField(
+        max_length=16,
+        db_index=True,
+        help_text="Hash del SQL normalizado; agrupa las ejecuciones de una misma consulta"
+    )
+
+    sql = models.TextField(
+        help_text="SQL normalizado (valores reemplazados por ?)"
+    )
+
+    duration_ms = models.FloatField(
+        help_text="Duración de la consulta en milisegundos"
+    )
+
+    view_name = models.CharField(
+        max_length=200,
+        blank=True,
+        help_text="Vista que ejecutó la consulta"
+    )
+
+    path = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text="Ruta de la solicitud"
+    )
+
+    stack = models.TextField(
+        blank=True,
+        help_text="Pila de llamadas del proyecto (solo en una muestra de los registros)"
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.duration_ms:.1f}ms {self.view_name or '-'}: {self.sql[:80]}"
+
+    class Meta:
+        verbose_name = "Consulta Lenta"
+        verbose_name_plural = "Consultas Lentas"
+        ordering = ['-created_at']
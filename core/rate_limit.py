@@ -0,0 +1,236 @@
+"""
+Limitador de solicitudes por IP con ventana deslizante.
+
+Cada clase de ruta (ver core.route_policy.ROUTE_RULES) tiene su propio
+límite, definido en la configuración 'security.rate_limits' (por defecto
+settings.RATE_LIMITS, ver core/config.py). El conteo usa dos ventanas
+fijas consecutivas ponderadas (ventana deslizante aproximada):
+
+    estimado = previa * (tiempo restante de la ventana / ventana) + actual
+
+Los contadores se actualizan con cache.add + cache.incr, que son atómicos
+en el backend de caché, de modo que procesos distintos que comparten la
+caché cuentan sobre el mismo valor y el TTL no se reinicia en cada acierto.
+
+Login y registro se limitan en RateLimitMiddleware, antes de la vista. La
+creación de reservas ('rate_reserve') se limita dentro de room_reserve con
+enforce_rate_limit, justo antes de escribir: así los reenvíos respondidos
+por la clave de idempotencia y los formularios inválidos no consumen cupo.
+"""
+
+from collections import namedtuple
+from functools import wraps
+import logging
+import math
+import time
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.shortcuts import redirect
+
+from .config import config as runtime_config
+from .metrics import RATE_LIMIT_REJECTIONS
+from .route_policy import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+RateLimit = namedtuple('RateLimit', 'limit window methods')
+
+# allowed, limit, remaining, reset_after (s), retry_after (s o None)
+RateLimitResult = namedtuple('RateLimitResult', 'allowed limit remaining reset_after retry_after')
+
+KEY_TEMPLATE = 'ratelimit:{scope}:{identity}:{bucket}'
+
+
+# (valor de configuración, límites interpretados); se reinterpreta solo si cambia
+_parsed_limits = (None, {})
+
+
+def get_rate_limits():
+    """Límites configurados por clase de ruta (sin consultar la base de datos)."""
+    global _parsed_limits
+    source = runtime_config.get('security.rate_limits')
+    if _parsed_limits[0] is not source:
+        _parsed_limits = (source, {
+            route_class: RateLimit(
+                limit=int(limit_config['limit']),
+                window=int(limit_config['window']),
+                methods=frozenset(method.upper() for method in limit_config.get('methods', ())),
+            )
+            for route_class, limit_config in source.items()
+        })
+    return _parsed_limits[1]
+
+
+def find_rate_limit(route_classes, method, limits=None):
+    """
+    Límite aplicable a una solicitud.
+
+    Returns:
+        tuple: (clase de ruta, RateLimit) o (None, None)
+    """
+    limits = get_rate_limits() if limits is None else limits
+    for route_class in sorted(route_classes):
+        rate_limit = limits.get(route_class)
+        if rate_limit and (not rate_limit.methods or method in rate_limit.methods):
+            return route_class, rate_limit
+    return None, None
+
+
+def _increment(key, timeout):
+    """Incrementar atómicamente un contador, creándolo si no existe."""
+    cache.add(key, 0, timeout=timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave expiró entre add e incr
+        cache.add(key, 0, timeout=timeout)
+        return cache.incr(key)
+
+
+def _retry_after(previous, current, elapsed, limit, window):
+    """Segundos hasta que un nuevo acierto vuelva a estar dentro del límite."""
+    remaining_window = window - elapsed
+    if current + 1 <= limit and previous > 0:
+        # Basta con que decaiga el peso de la ventana anterior
+        wait = remaining_window - window * (limit - current - 1) / previous
+    else:
+        # Hay que esperar a la ventana siguiente, donde "current" pasa a ser la previa
+        wait = remaining_window
+        if current:
+            wait += max(0.0, window * (1 - (limit - 1) / current))
+    return max(1, math.ceil(wait))
+
+
+def hit(scope, identity, limit, window, now=None):
+    """
+    Registrar un acierto y decidir si está dentro del límite.
+
+    Los aciertos rechazados no consumen cupo, por lo que Retry-After es
+    exacto mientras no lleguen otros aciertos permitidos.
+
+    Args:
+        scope (str): Clase de ruta
+        identity (str): Identificador del cliente (IP o usuario)
+        limit (int): Aciertos permitidos por ventana
+        window (int): Tamaño de la ventana en segundos
+
+    Returns:
+        RateLimitResult
+    """
+    now = time.time() if now is None else now
+    bucket = int(now // window)
+    elapsed = now - bucket * window
+    current_key = KEY_TEMPLATE.format(scope=scope, identity=identity, bucket=bucket)
+    previous_key = KEY_TEMPLATE.format(scope=scope, identity=identity, bucket=bucket - 1)
+
+    # Dos ventanas de TTL: la actual se usa como "previa" en la siguiente
+    current = _increment(current_key, timeout=window * 2)
+    previous = cache.get(previous_key, 0)
+    weight = (window - elapsed) / window
+    estimate = previous * weight + current
+    reset_after = max(1, math.ceil(window - elapsed))
+
+    if estimate <= limit:
+        return RateLimitResult(True, limit, int(limit - estimate), reset_after, None)
+
+    try:
+        cache.decr(current_key)
+        current -= 1
+    except ValueError:
+        pass
+    return RateLimitResult(
+        False, limit, 0, reset_after,
+        _retry_after(previous, current, elapsed, limit, window),
+    )
+
+
+def rate_limit_headers(result):
+    """Encabezados X-RateLimit-* (y Retry-After si se rechazó la solicitud)."""
+    headers = {
+        'X-RateLimit-Limit': str(result.limit),
+        'X-RateLimit-Remaining': str(result.remaining),
+        'X-RateLimit-Reset': str(result.reset_after),
+    }
+    if result.retry_after is not None:
+        headers['Retry-After'] = str(result.retry_after)
+    return headers
+
+
+class RateLimitExceeded(Exception):
+    """La solicitud superó el límite de su clase de ruta."""
+
+    def __init__(self, route_class, result):
+        self.route_class = route_class
+        self.result = result
+        super().__init__(f"Límite de solicitudes excedido ({route_class})")
+
+
+def client_identity(request):
+    """
+    Identidad con la que se cuenta la solicitud: el usuario si hay sesión
+    (una red escolar con NAT comparte una sola IP) o la IP del cliente.
+
+    Returns:
+        tuple: (tipo, identificador), con tipo 'usuario' o 'ip'
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return 'usuario', f'user:{user.pk}'
+    return 'ip', get_client_ip(request)
+
+
+def enforce_rate_limit(request, route_class, rate_limit=None):
+    """
+    Consumir un acierto del límite de la clase de ruta.
+
+    El resultado queda en request.rate_limit para los encabezados
+    X-RateLimit-* (ver RateLimitMiddleware.process_response).
+
+    Raises:
+        RateLimitExceeded: Si la solicitud supera el límite
+    """
+    rate_limit = rate_limit or get_rate_limits().get(route_class)
+    if rate_limit is None:
+        return None
+    kind, identity = client_identity(request)
+    result = hit(route_class, identity, rate_limit.limit, rate_limit.window)
+    request.rate_limit = result
+    if not result.allowed:
+        RATE_LIMIT_REJECTIONS.inc(route_class=route_class)
+        logger.warning(
+            "Límite de solicitudes excedido por %s %s: %s en %s (reintentar en %ss)",
+            kind, identity, route_class, request.path, result.retry_after,
+        )
+        raise RateLimitExceeded(route_class, result)
+    return result
+
+
+def rate_limited_response(request, result):
+    """Respuesta 429 (JSON) o redirección con mensaje para una solicitud rechazada."""
+    if request.headers.get('Accept', '').startswith('application/json'):
+        return JsonResponse({
+            'error': True,
+            'message': 'Demasiadas solicitudes. Intenta de nuevo en unos minutos.',
+            'type': 'rate_limit',
+            'retry_after': result.retry_after,
+        }, status=429)
+    messages.error(request, 'Demasiadas solicitudes. Intenta de nuevo en unos minutos.')
+    return redirect('rooms:room_list')
+
+
+def rate_limited(view_func):
+    """
+    Decorador: responder 429 si la vista lanza RateLimitExceeded.
+
+    Debe ir después de idempotent_post, para que los reenvíos se respondan
+    sin llegar al límite.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except RateLimitExceeded as e:
+            return rate_limited_response(request, e.result)
+    return wrapper
@@ -18,10 +18,13 @@ from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.utils import timezone
 from django.core.mail import mail_admins
+from collections import defaultdict
 from datetime import datetime, timedelta
 import logging
 import json
 
+from .metrics import SECURITY_BLOCKED_ATTEMPTS, SECURITY_EVENTS, SECURITY_USERS_BLOCKED
+
 User = get_user_model()
 logger = logging.getLogger(__name__)
 
@@ -252,6 +255,7 @@ class SecurityManager:
         blocked_until = timezone.now() + timedelta(minutes=duration_minutes)
         
         cache.set(cache_key, blocked_until, timeout=duration_minutes * 60)
+        SECURITY_USERS_BLOCKED.inc()
         
         # Registrar el bloqueo
         SecurityManager.log_action(
@@ -466,6 +470,109 @@ class SecurityManager:
         
         return len(violations) == 0, violations
     
+    @staticmethod
+    def check_series_limits(user, occurrences):
+        """
+        Verificar los límites de tasa y de horas para una serie recurrente.
+        
+        Cada ocurrencia cuenta como una reserva nueva: la serie se crea de una
+        vez, por lo que todas caen en las ventanas de hora, día y semana, y sus
+        horas se suman a las de cada día y semana en que ocurren.
+        
+        Args:
+            user: Usuario que crea la serie
+            occurrences: Lista de (inicio, fin) de las ocurrencias
+            
+        Returns:
+            tuple: (is_allowed: bool, violations: list)
+        """
+        rules = SecurityManager.get_security_rules(user)
+        now = timezone.now()
+        violations = []
+        
+        is_blocked, blocked_until = SecurityManager.is_user_blocked(user)
+        if is_blocked:
+            violations.append({
+                'type': 'user_blocked',
+                'message': f"Usuario bloqueado temporalmente hasta {blocked_until.strftime('%H:%M')}",
+                'blocked_until': blocked_until
+            })
+            return False, violations
+        if not occurrences:
+            return True, violations
+        
+        from rooms.models import Reservation
+        user_reservations = Reservation.objects.filter(
+            user=user,
+            status__in=['confirmed', 'in_progress']
+        )
+        new_count = len(occurrences)
+        
+        # Límites de cantidad: todas las ocurrencias se crean ahora
+        windows = [
+            ('hourly_limit', 'por hora', timedelta(hours=1), rules.max_reservations_per_hour),
+            ('daily_limit', 'diario', timedelta(days=1), rules.max_reservations_per_day),
+            ('weekly_limit', 'semanal', timedelta(days=7), rules.max_reservations_per_week),
+        ]
+        for violation_type, label, window, limit in windows:
+            total = user_reservations.filter(created_at__gte=now - window).count() + new_count
+            if total > limit:
+                violations.append({
+                    'type': violation_type,
+                    'message': f"Límite {label} excedido por la serie ({total}/{limit})",
+                    'current': total,
+                    'limit': limit
+                })
+        
+        # Límites de horas: por cada día y semana que toca la serie
+        def week_of(day):
+            return day - timedelta(days=day.weekday())
+        
+        daily_hours = defaultdict(float)
+        weekly_hours = defaultdict(float)
+        for start, end in occurrences:
+            day = timezone.localtime(start).date()
+            hours = (end - start).total_seconds() / 3600
+            daily_hours[day] += hours
+            weekly_hours[week_of(day)] += hours
+        
+        first_week = min(weekly_hours)
+        last_week = max(weekly_hours)
+        existing = user_reservations.filter(
+            start_time__gte=timezone.make_aware(datetime.combine(first_week, datetime.min.time())),
+            start_time__lt=timezone.make_aware(datetime.combine(last_week + timedelta(days=7), datetime.min.time()))
+        ).values_list('start_time', 'end_time')
+        existing_daily = defaultdict(float)
+        existing_weekly = defaultdict(float)
+        for start, end in existing:
+            day = timezone.localtime(start).date()
+            hours = (end - start).total_seconds() / 3600
+            existing_daily[day] += hours
+            existing_weekly[week_of(day)] += hours
+        
+        for day in sorted(daily_hours):
+            total = existing_daily[day] + daily_hours[day]
+            if total > rules.max_total_hours_per_day:
+                violations.append({
+                    'type': 'daily_hours_limit',
+                    'message': f"Límite de horas diarias excedido el {day.strftime('%d/%m/%Y')} ({total:.1f}/{rules.max_total_hours_per_day})",
+                    'current': total,
+                    'limit': rules.max_total_hours_per_day
+                })
+                break
+        for week in sorted(weekly_hours):
+            total = existing_weekly[week] + weekly_hours[week]
+            if total > rules.max_total_hours_per_week:
+                violations.append({
+                    'type': 'weekly_hours_limit',
+                    'message': f"Límite de horas semanales excedido la semana del {week.strftime('%d/%m/%Y')} ({total:.1f}/{rules.max_total_hours_per_week})",
+                    'current': total,
+                    'limit': rules.max_total_hours_per_week
+                })
+                break
+        
+        return len(violations) == 0, violations
+    
     @staticmethod
     def detect_suspicious_patterns(user):
         """
@@ -477,14 +584,14 @@ class SecurityManager:
         suspicions = []
         now = timezone.now()
         
-        # Analizar últimas 24 horas
-        recent_logs = ReservationUsageLog.objects.filter(
+        # Analizar últimas 24 horas (una sola consulta; los patrones se evalúan en memoria)
+        recent_logs = list(ReservationUsageLog.objects.filter(
             user=user,
             timestamp__gte=now - timedelta(hours=24)
-        ).order_by('-timestamp')
+        ).order_by('-timestamp'))
         
         # Patrón 1: Muchos intentos bloqueados
-        blocked_attempts = recent_logs.filter(action='attempt_blocked').count()
+        blocked_attempts = sum(1 for log in recent_logs if log.action == 'attempt_blocked')
         if blocked_attempts >= 5:
             suspicions.append({
                 'type': 'excessive_blocked_attempts',
@@ -493,15 +600,20 @@ class SecurityManager:
             })
         
         # Patrón 2: Creación y cancelación rápida
+        cancellations = defaultdict(list)
+        for log in recent_logs:
+            if log.action == 'cancel':
+                cancellations[log.reservation_id].append(log.timestamp)
+        
         quick_cancellations = 0
-        for log in recent_logs.filter(action='create'):
+        for log in recent_logs:
+            if log.action != 'create':
+                continue
             # Buscar cancelaciones de la misma reserva en menos de 5 minutos
-            quick_cancel = recent_logs.filter(
-                action='cancel',
-                reservation_id=log.reservation_id,
-                timestamp__gt=log.timestamp,
-                timestamp__lt=log.timestamp + timedelta(minutes=5)
-            ).exists()
+            quick_cancel = any(
+                log.timestamp < cancelled_at < log.timestamp + timedelta(minutes=5)
+                for cancelled_at in cancellations.get(log.reservation_id, ())
+            )
             if quick_cancel:
                 quick_cancellations += 1
         
@@ -526,6 +638,11 @@ class SecurityManager:
     @staticmethod
     def log_action(user, action, room_name, reservation_id=None, ip_address=None, user_agent=None, additional_data=None):
         """Registrar una acción de reserva para análisis posterior."""
+        SECURITY_EVENTS.inc(action=action)
+        if action == 'attempt_blocked':
+            data = additional_data or {}
+            for violation in data.get('violations') or [data.get('reason', 'unknown')]:
+                SECURITY_BLOCKED_ATTEMPTS.inc(violation=violation)
         try:
             ReservationUsageLog.objects.create(
                 user=user,
@@ -11,12 +11,14 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.urls import reverse
 from django.utils.deprecation import MiddlewareMixin
-from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 import logging
 import json
 
+from .rate_limit import RateLimitExceeded, enforce_rate_limit, find_rate_limit, rate_limit_headers, rate_limited_response
+from .route_policy import RESERVATION_WRITE, get_route_classes
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,12 +35,6 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
     
     def __init__(self, get_response):
         self.get_response = get_response
-        # URLs que requieren controles de seguridad
-        self.protected_urls = [
-            '/rooms/reserve/',
-            '/rooms/api/reserve/',
-            '/api/rooms/reserve/'
-        ]
         super().__init__(get_response)
     
     def process_request(self, request):
@@ -48,7 +44,7 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
             return None
         
         # Solo aplicar a URLs de reserva
-        if not any(url in request.path for url in self.protected_urls):
+        if RESERVATION_WRITE not in get_route_classes(request):
             return None
         
         # Solo aplicar a métodos POST (creación de reservas)
@@ -153,7 +149,7 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
                         messages.warning(request, f"Advertencia: {warning['message']}")
         
         except Exception as e:
-            logger.error(f"Error en ReservationSecurityMiddleware: {e}", exc_info=True)
+            logger.error("Error en ReservationSecurityMiddleware: %s", e, exc_info=True)
             # En caso de error, permitir continuar pero registrar el problema
         
         return None
@@ -162,7 +158,7 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
         """Procesar respuesta después de la vista."""
         # Solo procesar para usuarios autenticados y URLs protegidas
         if (not request.user.is_authenticated or 
-            not any(url in request.path for url in self.protected_urls)):
+            RESERVATION_WRITE not in get_route_classes(request)):
             return response
         
         # Si la respuesta fue exitosa (nueva reserva creada), registrar la acción
@@ -213,7 +209,7 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
                 )
                 
             except Exception as e:
-                logger.error(f"Error registrando acción exitosa: {e}")
+                logger.error("Error registrando acción exitosa: %s", e)
         
         # Agregar advertencias a respuestas JSON si existen
         if (hasattr(request, '_reservation_warnings') and 
@@ -233,10 +229,17 @@ class ReservationSecurityMiddleware(MiddlewareMixin):
 
 class RateLimitMiddleware(MiddlewareMixin):
     """
-    Middleware adicional para rate limiting general basado en IP.
+    Middleware de límites de solicitudes por clase de ruta.
     
     Proporciona una capa adicional de protección contra ataques
-    automatizados desde la misma IP.
+    automatizados. Los límites se definen por clase de ruta en
+    settings.RATE_LIMITS y se cuentan con core.rate_limit (ventana
+    deslizante con contadores atómicos en la caché compartida), por
+    usuario si hay sesión y por IP si no (login y registro).
+    
+    Aquí se aplican los límites de las rutas clasificadas por
+    core.route_policy (login y registro). El de creación de reservas se
+    aplica en room_reserve (ver core.rate_limit.enforce_rate_limit).
     """
     
     def __init__(self, get_response):
@@ -244,80 +247,22 @@ class RateLimitMiddleware(MiddlewareMixin):
         super().__init__(get_response)
     
     def process_request(self, request):
-        """Aplicar rate limiting por IP para ciertas rutas."""
-        # Rutas que requieren rate limiting por IP
-        rate_limited_paths = [
-            '/rooms/reserve/',
-            '/accounts/login/',
-            '/accounts/register/',
-        ]
-        
-        if not any(path in request.path for path in rate_limited_paths):
+        """Aplicar el límite de la clase de ruta de la solicitud, si tiene uno."""
+        route_class, rate_limit = find_rate_limit(get_route_classes(request), request.method)
+        if rate_limit is None:
             return None
         
-        # Obtener IP del cliente
-        ip_address = self.get_client_ip(request)
-        
-        # Aplicar rate limiting
-        if not self.check_rate_limit(ip_address, request.path):
-            logger.warning(f"Rate limit por IP excedido: {ip_address} en {request.path}")
-            
-            if request.headers.get('Accept', '').startswith('application/json'):
-                return JsonResponse({
-                    'error': True,
-                    'message': 'Demasiadas solicitudes. Intenta de nuevo en unos minutos.',
-                    'type': 'ip_rate_limit'
-                }, status=429)
-            else:
-                messages.error(
-                    request,
-                    'Demasiadas solicitudes desde tu conexión. Intenta de nuevo en unos minutos.'
-                )
-                return redirect('rooms:room_list')
-        
+        try:
+            enforce_rate_limit(request, route_class, rate_limit)
+        except RateLimitExceeded as e:
+            return rate_limited_response(request, e.result)
         return None
     
-    def get_client_ip(self, request):
-        """Obtener la IP real del cliente considerando proxies."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-    
-    def check_rate_limit(self, ip_address, path):
-        """
-        Verificar rate limit por IP.
-        
-        Límites:
-        - Reservas: 10 por hora por IP
-        - Login: 20 por hora por IP
-        - Registro: 5 por hora por IP
-        """
-        # Configurar límites según el path
-        if 'reserve' in path:
-            limit = 10
-            window = 3600  # 1 hora
-        elif 'login' in path:
-            limit = 20
-            window = 3600
-        elif 'register' in path:
-            limit = 5
-            window = 3600
-        else:
-            return True  # Sin límite para otras rutas
-        
-        # Crear clave de cache
-        cache_key = f"ip_rate_limit_{ip_address}_{path.replace('/', '_')}"
-        
-        # Obtener contador actual
-        current_count = cache.get(cache_key, 0)
-        
-        if current_count >= limit:
-            return False
-        
-        # Incrementar contador
-        cache.set(cache_key, current_count + 1, timeout=window)
-        
-        return True
+    def process_response(self, request, response):
+        """Agregar los encabezados X-RateLimit-* y Retry-After."""
+        result = getattr(request, 'rate_limit', None)
+        if result is not None:
+            for header, value in rate_limit_headers(result).items():
+                response[header] = value
+        return response
+
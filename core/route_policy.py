@@ -0,0 +1,343 @@
+"""
+Motor unificado de políticas de rutas.
+
+Reemplaza a los middlewares SessionSecurityMiddleware, SecurityMiddleware y
+AdminSecurityMiddleware, que revisaban por separado el estado de la sesión,
+recorrían cada uno su propia lista de expresiones regulares y reconstruían
+en cada solicitud la lista de variaciones de "admin".
+
+Todas las reglas de rutas (incluidas las que usan ReservationSecurityMiddleware
+y RateLimitMiddleware) se compilan una sola vez en una expresión combinada:
+cada regla es un lookahead opcional con grupo nombrado, por lo que una única
+evaluación indica todas las clases de ruta a las que pertenece la ruta. El
+resultado se memoriza por ruta. Luego el estado de la sesión se lee una vez
+y la solicitud pasa por una sola secuencia de decisiones, con el mismo
+resultado (permitir, redirigir o 404) que la cadena anterior.
+"""
+
+from functools import lru_cache
+import ipaddress
+import logging
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import logout
+from django.core.handlers.exception import response_for_exception
+from django.http import Http404
+from django.shortcuts import redirect
+
+logger = logging.getLogger(__name__)
+
+# Clases de ruta
+LOGIN_REQUIRED = 'login_required'      # Anónimos -> login con ?next=
+ADMIN_AREA = 'admin_area'              # Área administrativa (se registra el intento anónimo)
+SUPPORT_API = 'support_api'            # API restringida a los roles admin y soporte
+UNSAFE_PATH = 'unsafe_path'            # Intento de bypass (//, /./, /../, %2e) -> 404
+RESERVATION_WRITE = 'reservation_write'  # Controles de ReservationSecurityMiddleware
+# Clases con límite de solicitudes (límites en settings.RATE_LIMITS). RATE_LOGIN
+# y RATE_REGISTER se aplican en RateLimitMiddleware según la ruta; RATE_RESERVE
+# no tiene regla de ruta: room_reserve lo aplica justo antes de escribir (ver
+# core.rate_limit.enforce_rate_limit)
+RATE_RESERVE = 'rate_reserve'
+RATE_LOGIN = 'rate_login'
+RATE_REGISTER = 'rate_register'
+
+# (clase, expresión evaluada desde el inicio de request.path)
+ROUTE_RULES = (
+    (LOGIN_REQUIRED, r'/rooms/api/'),
+    (LOGIN_REQUIRED, r'.*/admin/'),  # Incluye /admin/ y /rooms/admin/
+    (ADMIN_AREA, r'/rooms/admin/?$'),
+    (ADMIN_AREA, r'/admin/?$'),
+    (SUPPORT_API, r'/rooms/api/'),
+    (UNSAFE_PATH, r'.*?(?://|/\./|/\.\./|%2[eE])'),
+    (RESERVATION_WRITE, r'.*?(?:/rooms/reserve/|/rooms/api/reserve/|/api/rooms/reserve/)'),
+    (RATE_LOGIN, r'.*?(?:/accounts/login/|/usuarios/login/)'),
+    (RATE_REGISTER, r'.*?(?:/accounts/register/|/usuarios/register/)'),
+)
+
+# Roles admitidos en las rutas SUPPORT_API
+SUPPORT_API_ROLES = frozenset({'admin', 'soporte'})
+
+# Variaciones de "admin" usadas en fuzzing; '/admin/' exacto sigue su curso
+ADMIN_VARIATIONS = frozenset(
+    variation.lower() for variation in (
+        'admin', 'Admin', 'ADMIN', 'administrator', 'admin.php',
+        'ademin', 'admon', 'admn', 'adm', 'administracion', 'panel',
+    )
+)
+
+
+def compile_rules(rules):
+    """
+    Compilar las reglas en una sola expresión con un lookahead por regla.
+
+    Returns:
+        tuple: (expresión compilada, dict grupo -> clase de ruta)
+    """
+    groups = {}
+    parts = []
+    for index, (route_class, pattern) in enumerate(rules):
+        group = f'r{index}'
+        groups[group] = route_class
+        parts.append(f'(?:(?=(?P<{group}>{pattern}))|)')
+    return re.compile(''.join(parts)), groups
+
+
+_COMBINED_RULES, _RULE_GROUPS = compile_rules(ROUTE_RULES)
+
+
+@lru_cache(maxsize=4096)
+def classify_path(path):
+    """Obtener el conjunto de clases de ruta de una ruta (una sola evaluación)."""
+    match = _COMBINED_RULES.match(path)
+    return frozenset(
+        _RULE_GROUPS[group] for group, value in match.groupdict().items() if value is not None
+    )
+
+
+def get_route_classes(request):
+    """Clases de ruta de la solicitud (calculadas por RoutePolicyMiddleware)."""
+    route_classes = getattr(request, 'route_classes', None)
+    if route_classes is None:
+        route_classes = request.route_classes = classify_path(request.path)
+    return route_classes
+
+
+def keep_cache_control(request):
+    """
+    Conservar el Cache-Control de la vista en la respuesta de esta solicitud.
+
+    Lo usan solo las APIs con GET condicional (calendar_events_api): ya
+    exigen revalidar en cada uso y el no-store anti-"atrás" impediría que el
+    navegador guarde la copia que revalida con el ETag.
+    """
+    request.keep_cache_control = True
+
+
+# (valor de settings.TRUSTED_PROXIES, redes interpretadas); se reinterpreta solo si cambia
+_trusted_proxies = (None, ())
+
+
+def _is_trusted_proxy(address):
+    """Si la dirección pertenece a settings.TRUSTED_PROXIES (IPs o redes CIDR)."""
+    global _trusted_proxies
+    source = getattr(settings, 'TRUSTED_PROXIES', ())
+    if _trusted_proxies[0] is not source:
+        _trusted_proxies = (source, tuple(ipaddress.ip_network(proxy, strict=False) for proxy in source))
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in _trusted_proxies[1])
+
+
+def get_client_ip(request):
+    """
+    Obtener la IP real del cliente.
+
+    X-Forwarded-For solo se considera si la conexión viene de un proxy de
+    settings.TRUSTED_PROXIES: cualquier cliente puede enviar esa cabecera.
+    Se toma la dirección más a la derecha que no sea un proxy de confianza,
+    porque las anteriores las escribe el propio cliente.
+    """
+    remote_addr = request.META.get('REMOTE_ADDR', 'unknown')
+    if not _is_trusted_proxy(remote_addr):
+        return remote_addr
+    forwarded = [
+        address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
+        if address.strip()
+    ]
+    for address in reversed(forwarded):
+        if not _is_trusted_proxy(address):
+            return address
+    return remote_addr
+
+
+class RoutePolicyMiddleware:
+    """
+    Middleware único de seguridad de sesiones y rutas.
+
+    Previene:
+    1. Acceso después de cerrar sesión mediante el botón "atrás"
+    2. Reutilización de sesiones invalidadas
+    3. Fuzzing de rutas administrativas y manipulación de URLs
+    4. Acceso anónimo a rutas protegidas y a la API de soporte por otros roles
+
+    Los permisos de administrador de cada vista los siguen aplicando sus
+    decoradores (user_passes_test / is_admin).
+
+    Bajo ASGI, las revisiones previas y posteriores (que leen la sesión y el
+    usuario) se ejecutan con sync_to_async y la vista asíncrona se espera
+    directamente.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        rejected, denied = self.check_request(request)
+        if rejected is not None:
+            return rejected
+        response = denied if denied is not None else self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        rejected, denied = await sync_to_async(self.check_request)(request)
+        if rejected is not None:
+            return rejected
+        response = denied if denied is not None else await self.get_response(request)
+        return await sync_to_async(self.process_response)(request, response)
+
+    def check_request(self, request):
+        """
+        Revisar la sesión y las políticas de ruta.
+
+        Returns:
+            tuple: (rechazo de sesión, que se devuelve tal cual; rechazo por
+            política de ruta, que igual pasa por process_response). None si
+            la solicitud puede continuar.
+        """
+        session = request.session
+        user = request.user
+        path = request.path
+
+        # Muestreado por SamplingFilter en LOGGING
+        logger.debug("Procesando solicitud: %s, autenticado: %s", path, user.is_authenticated)
+
+        # 1. Sesión marcada como cerrada (acceso post-logout)
+        if session.get('is_logged_out', False):
+            logger.warning(
+                "[SEGURIDAD_SESIÓN] ALERTA: Intento de acceso con sesión cerrada detectado: "
+                "Usuario '%s' desde IP %s. Posible uso del botón 'atrás' después de cerrar sesión. "
+                "URL solicitada: %s [Demostración de Seguridad]",
+                session.get('last_username', 'desconocido'), get_client_ip(request), path,
+            )
+            session.flush()
+            messages.warning(
+                request,
+                "¡Sesión cerrada detectada! Por seguridad, se ha bloqueado el acceso. "
+                "Inicia sesión nuevamente para continuar. [Demostración de Seguridad]"
+            )
+            return redirect(settings.LOGIN_URL), None
+
+        # 2. Sesión autenticada sin marca de actividad (botón "atrás")
+        if user.is_authenticated:
+            session['last_username'] = user.username
+            if not session.get('last_activity'):
+                return self._reject_stale_session(request), None
+
+        # 3. Políticas de ruta (una evaluación de la expresión combinada)
+        try:
+            denied = self._check_route(request, user, path)
+        except Http404 as exc:
+            # Página 404 estándar; igual recibe los encabezados anti-caché
+            denied = response_for_exception(request, exc)
+        except Exception as e:
+            logger.error("[SEGURIDAD] Error en RoutePolicyMiddleware: %s", e, exc_info=True)
+            denied = None
+        return None, denied
+
+    def process_response(self, request, response):
+        """Renovar la marca de actividad y evitar que el navegador guarde la página."""
+        path = request.path
+        if request.user.is_authenticated:
+            request.session['last_activity'] = True
+
+            # Navegación con sesión válida (muestreado por SamplingFilter en LOGGING)
+            logger.info(
+                "[SEGURIDAD_SESIÓN] Usuario '%s' navegando con sesión válida, URL: %s, IP: %s",
+                request.user.username, path, get_client_ip(request),
+            )
+
+            # Salvo las APIs marcadas con keep_cache_control
+            if not getattr(request, 'keep_cache_control', False):
+                response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+                response['Pragma'] = 'no-cache'
+                response['Expires'] = '0'
+
+        return response
+
+    def _reject_stale_session(self, request):
+        """Cerrar una sesión autenticada sin marca de actividad."""
+        username = request.user.username
+        logger.warning(
+            "[SEGURIDAD_SESIÓN] ALERTA: Acceso post-logout detectado: Usuario '%s' desde IP %s. "
+            "Intento de navegación usando botón 'atrás' bloqueado. URL: %s [Demostración de Seguridad]",
+            username, get_client_ip(request), request.path,
+        )
+        logout(request)
+        # Crear una nueva sesión para almacenar banderas post-logout
+        request.session['is_logged_out'] = True
+        request.session['last_username'] = username
+        request.session['last_activity'] = None
+        request.session.modified = True
+        messages.warning(
+            request,
+            "¡Sesión inválida detectada! Posible uso del botón 'atrás'. "
+            "Inicia sesión nuevamente para continuar. [Demostración de Seguridad]"
+        )
+        return redirect(settings.LOGIN_URL)
+
+    def _check_route(self, request, user, path):
+        """
+        Aplicar las reglas de ruta.
+
+        Returns:
+            La respuesta de rechazo, o None si la solicitud puede continuar.
+
+        Raises:
+            Http404: Ante fuzzing de rutas administrativas o manipulación de URL.
+        """
+        path_clean = path.strip('/')
+        if path_clean != 'admin' and path_clean.lower() in ADMIN_VARIATIONS:
+            logger.warning(
+                "[SEGURIDAD] ALERTA: Posible intento de fuzzing admin detectado! URL: %s desde IP: %s "
+                "[Demostración de Seguridad]",
+                path, get_client_ip(request),
+            )
+            raise Http404("Página no encontrada")
+
+        route_classes = get_route_classes(request)
+
+        if UNSAFE_PATH in route_classes:
+            logger.warning(
+                "[SEGURIDAD] ALERTA: Posible intento de bypass de seguridad detectado! URL: %s desde IP: %s "
+                "[Demostración de Seguridad]",
+                path, get_client_ip(request),
+            )
+            raise Http404("Página no encontrada")
+
+        if not user.is_authenticated:
+            if ADMIN_AREA in route_classes:
+                logger.warning(
+                    "[SEGURIDAD_ADMIN] ALERTA: Intento de acceso no autenticado a ruta administrativa: "
+                    "URL: %s desde IP: %s [Demostración de Seguridad]",
+                    path, get_client_ip(request),
+                )
+            if route_classes & {LOGIN_REQUIRED, ADMIN_AREA}:
+                return redirect(f"{settings.LOGIN_URL}?next={path}")
+            return None
+
+        if user.is_superuser:
+            return None
+
+        user_role = getattr(user, 'role', 'desconocido')
+        if SUPPORT_API in route_classes and user_role not in SUPPORT_API_ROLES:
+            logger.warning(
+                "[SEGURIDAD] ALERTA: Intento de acceso no autorizado: Usuario %s con rol '%s' "
+                "intentó acceder a %s [Demostración de Seguridad]",
+                user.username, user_role, path,
+            )
+            return redirect('rooms:room_list')
+
+        return None
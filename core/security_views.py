@@ -7,11 +7,15 @@ y estadísticas de seguridad para administradores.
 
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.utils import timezone
 from django.db.models import Count, Q
-from datetime import datetime, timedelta
+from django.db.models.functions import TruncDate
+from datetime import datetime, timedelta, timezone as dt_timezone
 import json
+import os
 
 from core.reservation_security import ReservationSecurityRule, ReservationUsageLog, SecurityManager
 from rooms.models import Reservation
@@ -20,6 +24,15 @@ from django.contrib.auth import get_user_model
 User = get_user_model()
 
 
+# Campo de security_stats_api -> acción registrada en ReservationUsageLog
+DAILY_STAT_ACTIONS = {
+    'successful_reservations': 'create',
+    'blocked_attempts': 'attempt_blocked',
+    'warnings_sent': 'warning_sent',
+    'users_blocked': 'user_blocked',
+}
+
+
 def is_admin_or_staff(user):
     """Verificar si el usuario es admin o staff."""
     return user.is_authenticated and (user.is_staff or user.is_superuser)
@@ -110,44 +123,39 @@ def security_dashboard(request):
 
 @login_required
 @user_passes_test(is_admin_or_staff)
-def security_stats_api(request):
-    """API para obtener estadísticas de seguridad en formato JSON."""
+async def security_stats_api(request):
+    """
+    API para obtener estadísticas de seguridad en formato JSON.
+
+    Vista asíncrona: los conteos diarios salen de una sola consulta agrupada
+    por día (UTC) y acción, recorrida con iteración asíncrona.
+    """
     
     days = int(request.GET.get('days', 7))
     
     now = timezone.now()
     start_date = now - timedelta(days=days)
+    first_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # Conteos por (día, acción) en el período
+    counts = {}
+    rows = ReservationUsageLog.objects.filter(
+        timestamp__gte=first_day,
+        timestamp__lt=first_day + timedelta(days=days),
+        action__in=list(DAILY_STAT_ACTIONS.values()),
+    ).annotate(
+        day=TruncDate('timestamp', tzinfo=dt_timezone.utc)
+    ).values('day', 'action').annotate(total=Count('id'))
+    async for row in rows:
+        counts[(row['day'], row['action'])] = row['total']
     
     # Datos por día
     daily_stats = []
     for i in range(days):
         day = start_date + timedelta(days=i)
-        day_start = day.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        day_data = {
-            'date': day.strftime('%Y-%m-%d'),
-            'successful_reservations': ReservationUsageLog.objects.filter(
-                timestamp__gte=day_start,
-                timestamp__lt=day_end,
-                action='create'
-            ).count(),
-            'blocked_attempts': ReservationUsageLog.objects.filter(
-                timestamp__gte=day_start,
-                timestamp__lt=day_end,
-                action='attempt_blocked'
-            ).count(),
-            'warnings_sent': ReservationUsageLog.objects.filter(
-                timestamp__gte=day_start,
-                timestamp__lt=day_end,
-                action='warning_sent'
-            ).count(),
-            'users_blocked': ReservationUsageLog.objects.filter(
-                timestamp__gte=day_start,
-                timestamp__lt=day_end,
-                action='user_blocked'
-            ).count(),
-        }
+        day_data = {'date': day.strftime('%Y-%m-%d')}
+        for field, action in DAILY_STAT_ACTIONS.items():
+            day_data[field] = counts.get((day.date(), action), 0)
         daily_stats.append(day_data)
     
     # Violaciones por tipo
@@ -157,7 +165,7 @@ def security_stats_api(request):
     ).values('additional_data').distinct()
     
     violation_counts = {}
-    for log in violation_types:
+    async for log in violation_types:
         try:
             data = log['additional_data']
             if isinstance(data, str):
@@ -232,3 +240,60 @@ def user_security_detail(request, user_id):
     }
     
     return render(request, 'admin/user_security_detail.html', context)
+
+
+@login_required
+@user_passes_test(is_admin_or_staff)
+def performance_dashboard(request):
+    """
+    Latencia por vista de todos los procesos y detalle de este proceso.
+
+    La latencia agregada sale del almacén de métricas compartido; consultas,
+    plantillas, caché y la ventana móvil solo existen en el proceso que
+    atiende la solicitud, por lo que con varios workers ese detalle cambia
+    según a cuál llegue y la página lo indica con su PID.
+    """
+    from core.instrumentation import (
+        LATENCY_BUCKETS_MS, SLOT_SECONDS, WINDOW_SLOTS, shared_view_summary, view_histograms,
+    )
+
+    views = view_histograms.snapshot()
+    shared_views = shared_view_summary()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'all_processes': shared_views,
+            'pid': os.getpid(),
+            'window_seconds': SLOT_SECONDS * WINDOW_SLOTS,
+            'buckets_ms': list(LATENCY_BUCKETS_MS),
+            'views': views,
+        })
+
+    context = {
+        'shared_views': shared_views,
+        'pid': os.getpid(),
+        'views': views,
+        'bucket_labels': [f'≤{bound}' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}'],
+        'window_minutes': SLOT_SECONDS * WINDOW_SLOTS // 60,
+    }
+    return render(request, 'core/performance_dashboard.html', context)
+
+
+def metrics_endpoint(request):
+    """
+    Métricas en formato de exposición de Prometheus.
+
+    Acceso para sesiones staff o, si settings.METRICS_TOKEN está definido,
+    con la cabecera "Authorization: Bearer <token>" (para el scraper).
+    """
+    from core.metrics import registry
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    allowed = is_admin_or_staff(request.user) or (
+        token and authorization.startswith('Bearer ')
+        and constant_time_compare(authorization[len('Bearer '):], token)
+    )
+    if not allowed:
+        return HttpResponse('Acceso denegado\n', status=403, content_type='text/plain; charset=utf-8')
+
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,30 @@
+"""
+Almacén de sesiones con escritura coalescida.
+
+Basado en el backend cached_db de Django: las lecturas se sirven desde la
+caché y las escrituras van a la caché y a la base de datos. Además, asignar
+a una clave el mismo valor escalar que ya tiene no marca la sesión como
+modificada, de modo que los middlewares que reescriben valores en cada
+solicitud (last_username, last_activity) no provocan un UPDATE por página.
+
+Configuración:
+    SESSION_ENGINE = 'core.session_backend'
+"""
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+
+# Tipos cuya igualdad garantiza que el valor almacenado no cambió. Los
+# valores mutables (listas, diccionarios) siempre marcan la sesión como
+# modificada, porque pueden haberse alterado en el lugar.
+IMMUTABLE_TYPES = (str, int, float, bool, type(None))
+
+
+class SessionStore(CachedDBSessionStore):
+    """Sesión cached_db que ignora asignaciones sin cambios."""
+
+    def __setitem__(self, key, value):
+        if isinstance(value, IMMUTABLE_TYPES):
+            current = self._session.get(key, self)  # self como centinela de "sin valor"
+            if type(current) is type(value) and current == value:
+                return
+        super().__setitem__(key, value)
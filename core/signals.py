@@ -0,0 +1,29 @@
+"""
+Señales de la app core.
+
+Mantienen sincronizado el servicio de configuración (ver core/config.py):
+cada cambio en SystemConfig incrementa el sello de versión compartido, y al
+inicio de cada solicitud el proceso recarga la configuración si el sello
+cambió.
+"""
+
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .config import bump_config_version, config
+from .models import SystemConfig
+
+
+@receiver(post_save, sender=SystemConfig)
+@receiver(post_delete, sender=SystemConfig)
+def system_config_changed(sender, instance, **kwargs):
+    """Invalidar la configuración cargada en todos los procesos."""
+    bump_config_version()
+    config.check_version()
+
+
+@receiver(request_started)
+def refresh_config(sender, **kwargs):
+    """Recargar la configuración si otro proceso la modificó."""
+    config.check_version()
@@ -0,0 +1,154 @@
+"""
+Registro de consultas SQL lentas.
+
+RequestTimingMiddleware (core/instrumentation.py) cronometra cada consulta
+con connection.execute_wrapper. Las que superan el umbral
+'diagnostics.slow_query_threshold' se guardan en memoria durante la
+solicitud y, una vez enviada la respuesta de la vista, se escriben en el
+modelo SlowQuery con:
+
+- La huella de la consulta: el SQL normalizado (literales y parámetros
+  reemplazados por ?, listas IN y filas de VALUES colapsadas) y su hash,
+  para agrupar todas las ejecuciones de una misma consulta.
+- La vista que la originó y la ruta solicitada.
+- Una muestra de la pila de llamadas (solo frames del proyecto) en una
+  fracción 'diagnostics.slow_query_stack_sample' de los registros.
+
+La tabla se mantiene acotada a 'diagnostics.slow_query_max_rows' filas
+(se borran las más antiguas). El informe por huella (cantidad, p95 y
+tiempo total) está en el admin: Core > Consultas lentas > Informe.
+"""
+
+from collections import defaultdict
+import hashlib
+import logging
+import math
+import os
+import random
+import re
+import traceback
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Frames más recientes que se conservan de la pila
+STACK_LIMIT = 12
+
+_NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                    # Literales de texto
+    (re.compile(r'%s|\b\d+(?:\.\d+)?\b'), '?'),              # Parámetros y números
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),     # IN (?, ?, ?) y filas de VALUES
+    (re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+'), '(...), ...'),  # INSERT de varias filas
+    (re.compile(r'\s+'), ' '),
+)
+
+# Frames que no interesan en la pila: esta instrumentación y dependencias
+_IGNORED_FILES = (
+    os.path.join('core', 'instrumentation.py'),
+    os.path.join('core', 'slow_queries.py'),
+)
+
+
+def normalize_sql(sql):
+    """SQL con los valores concretos reemplazados, igual para todas las ejecuciones de la consulta."""
+    for pattern, replacement in _NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint_sql(sql):
+    """(SQL normalizado, hash corto) de una consulta."""
+    normalized = normalize_sql(sql)
+    return normalized, hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def capture_stack(limit=STACK_LIMIT):
+    """Frames del proyecto de la pila actual (el más reciente al final)."""
+    base_dir = str(settings.BASE_DIR) + os.sep
+    frames = []
+    for frame in traceback.extract_stack()[:-1]:
+        filename = frame.filename
+        if not filename.startswith(base_dir) or 'site-packages' in filename:
+            continue
+        relative = filename[len(base_dir):]
+        if relative.endswith(_IGNORED_FILES):
+            continue
+        frames.append(f'{relative}:{frame.lineno} en {frame.name}\n    {frame.line or ""}'.rstrip())
+    return '\n'.join(frames[-limit:])
+
+
+def slow_query_record(sql, elapsed, stack_sample):
+    """Datos de una consulta lenta, tomados dentro del execute_wrapper."""
+    normalized, fingerprint = fingerprint_sql(sql)
+    return {
+        'fingerprint': fingerprint,
+        'sql': normalized,
+        'duration_ms': round(elapsed * 1000, 3),
+        'stack': capture_stack() if random.random() < stack_sample else '',
+    }
+
+
+def save_slow_queries(records, view_name, path):
+    """Guardar las consultas lentas de una solicitud y recortar la tabla."""
+    from .models import SlowQuery
+
+    try:
+        created = SlowQuery.objects.bulk_create([
+            SlowQuery(view_name=view_name or '', path=path[:500], **record)
+            for record in records
+        ])
+        last_id = max((row.pk for row in created if row.pk is not None), default=None)
+        max_rows = config.get('diagnostics.slow_query_max_rows')
+        if last_id is not None and last_id > max_rows:
+            SlowQuery.objects.filter(pk__lte=last_id - max_rows).delete()
+    except DatabaseError as e:
+        # El registro de diagnóstico nunca debe afectar a la respuesta
+        logger.warning("No se pudieron guardar %d consultas lentas: %s", len(records), e)
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def fingerprint_report(queryset):
+    """
+    Consultas lentas agrupadas por huella, ordenadas por tiempo total.
+
+    Returns:
+        list: dicts con fingerprint, sql, count, total_ms, p95_ms, max_ms,
+        views (vistas que la ejecutaron) y last_seen.
+    """
+    groups = defaultdict(lambda: {'durations': [], 'views': set(), 'sql': '', 'last_seen': None})
+    rows = queryset.values_list('fingerprint', 'sql', 'duration_ms', 'view_name', 'created_at')
+    for fingerprint, sql, duration_ms, view_name, created_at in rows.iterator():
+        group = groups[fingerprint]
+        group['durations'].append(duration_ms)
+        group['sql'] = group['sql'] or sql
+        if view_name:
+            group['views'].add(view_name)
+        if group['last_seen'] is None or created_at > group['last_seen']:
+            group['last_seen'] = created_at
+
+    report = []
+    for fingerprint, group in groups.items():
+        durations = sorted(group['durations'])
+        report.append({
+            'fingerprint': fingerprint,
+            'sql': group['sql'],
+            'count': len(durations),
+            'total_ms': round(sum(durations), 1),
+            'p95_ms': round(percentile(durations, 0.95), 1),
+            'max_ms': round(durations[-1], 1),
+            'views': sorted(group['views']),
+            'last_seen': group['last_seen'],
+        })
+    report.sort(key=lambda row: row['total_ms'], reverse=True)
+    return report
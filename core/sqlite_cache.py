@@ -0,0 +1,266 @@
+"""
+Backend de caché compartido sobre SQLite en modo WAL.
+
+Todos los procesos del servidor (workers de gunicorn, comandos de gestión)
+abren el mismo archivo, por lo que los bloqueos temporales, los contadores
+de rate limiting y las versiones de calendario se comparten entre procesos
+y sobreviven a un reinicio, sin depender de un servicio externo.
+
+- Los enteros se guardan como INTEGER de SQLite: incr/decr son un único
+  UPDATE ... RETURNING, atómico entre procesos.
+- add es un INSERT ... ON CONFLICT que solo reemplaza entradas expiradas.
+- El resto de valores se guarda serializado con pickle.
+- Las entradas expiradas se ignoran al leer y se eliminan en un barrido
+  periódico (SWEEP_INTERVAL), que además aplica MAX_ENTRIES/CULL_FREQUENCY.
+
+Uso en settings.CACHES:
+
+    'BACKEND': 'core.sqlite_cache.SQLiteCache',
+    'LOCATION': BASE_DIR / 'cache.sqlite3',
+"""
+
+from contextlib import contextmanager
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .instrumentation import record_cache_lookup
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache_entries ("
+    " key TEXT PRIMARY KEY,"
+    " value BLOB NOT NULL,"
+    " expires REAL"
+    ") WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)",
+)
+
+
+def _encode(value):
+    # bool es subclase de int, pero debe conservar su tipo al leerse
+    if type(value) is int:
+        return value
+    return sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Caché compartida entre procesos del mismo servidor.
+
+    OPTIONS admitidas (además de MAX_ENTRIES y CULL_FREQUENCY):
+        SWEEP_INTERVAL (int): Segundos entre barridos de expirados (default: 60)
+        BUSY_TIMEOUT (float): Segundos de espera ante el bloqueo de otro proceso (default: 5)
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = str(location)
+        options = params.get('OPTIONS', {})
+        self._sweep_interval = int(options.get('SWEEP_INTERVAL', 60))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._next_sweep = 0
+
+    # Conexiones
+
+    def _connection(self):
+        """Conexión del hilo actual (se reabre tras un fork)."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=self._busy_timeout, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Transacción de escritura (BEGIN IMMEDIATE toma el bloqueo al inicio)."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    # API de BaseCache
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO cache_entries (key, value, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires "
+            "WHERE cache_entries.expires IS NOT NULL AND cache_entries.expires <= ?",
+            (key, _encode(value), self.get_backend_timeout(timeout), now),
+        )
+        self._maybe_sweep(now)
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            record_cache_lookup(0, 1)
+            return default
+        record_cache_lookup(1)
+        return _decode(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)",
+            (key, _encode(value), self.get_backend_timeout(timeout)),
+        )
+        self._maybe_sweep(now)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute(
+            "UPDATE cache_entries SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            "UPDATE cache_entries SET value = value + ? "
+            "WHERE key = ? AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, key, time.time()),
+        ).fetchone()
+        if row is not None:
+            return row[0]
+
+        # El valor no existe, expiró o no es un entero (p. ej. un float)
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = _decode(row[0]) + delta
+            connection.execute(
+                "UPDATE cache_entries SET value = ? WHERE key = ?", (_encode(new_value), key)
+            )
+        return new_value
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+        found = {}
+        connection = self._connection()
+        now = time.time()
+        stored_keys = list(key_map)
+        # Límite de parámetros de SQLite
+        for offset in range(0, len(stored_keys), 500):
+            chunk = stored_keys[offset:offset + 500]
+            rows = connection.execute(
+                f"SELECT key, value FROM cache_entries WHERE key IN ({', '.join('?' * len(chunk))}) "
+                "AND (expires IS NULL OR expires > ?)",
+                (*chunk, now),
+            )
+            for key, value in rows:
+                found[key_map[key]] = _decode(value)
+        record_cache_lookup(len(found), len(key_map) - len(found))
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), _encode(value), expires)
+            for key, value in data.items()
+        ]
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires) VALUES (?, ?, ?)", rows
+            )
+        self._maybe_sweep(time.time())
+        return []
+
+    def delete_many(self, keys, version=None):
+        stored_keys = [(self.make_and_validate_key(key, version=version),) for key in keys]
+        with self._transaction() as connection:
+            connection.executemany("DELETE FROM cache_entries WHERE key = ?", stored_keys)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache_entries")
+
+    def close(self, **kwargs):
+        # Django llama a close() al final de cada solicitud; la conexión
+        # por hilo se reutiliza entre solicitudes.
+        pass
+
+    # Mantenimiento
+
+    def _maybe_sweep(self, now):
+        if now >= self._next_sweep:
+            self._next_sweep = now + self._sweep_interval
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """
+        Eliminar las entradas expiradas y, si se supera MAX_ENTRIES,
+        descartar 1/CULL_FREQUENCY de las entradas (las que expiran antes).
+
+        Returns:
+            int: Entradas eliminadas
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as connection:
+            removed = connection.execute(
+                "DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?", (now,)
+            ).rowcount
+            count = connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            if self._max_entries and count > self._max_entries:
+                if self._cull_frequency == 0:
+                    removed += connection.execute("DELETE FROM cache_entries").rowcount
+                else:
+                    removed += connection.execute(
+                        "DELETE FROM cache_entries WHERE key IN ("
+                        " SELECT key FROM cache_entries ORDER BY expires IS NULL, expires LIMIT ?"
+                        ")",
+                        (count // self._cull_frequency,),
+                    ).rowcount
+        return removed
@@ -0,0 +1,51 @@
+"""
+Ejecutor de pruebas del proyecto.
+
+Igual que el DiscoverRunner de Django, pero los archivos compartidos que
+los procesos del servidor usan fuera de la base de datos (métricas en
+settings.METRICS_DB y la caché SQLite de settings.CACHES) se redirigen a
+un directorio temporal, para que `manage.py test` no lea ni escriba los
+del entorno de desarrollo.
+"""
+
+from pathlib import Path
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class IsolatedStorageRunner(DiscoverRunner):
+    """DiscoverRunner con almacenamiento auxiliar en un directorio temporal."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._storage_dir = tempfile.TemporaryDirectory(prefix='proyecto_calidad-test-')
+        self._storage_settings = override_settings(**self.storage_settings(Path(self._storage_dir.name)))
+        self._storage_settings.enable()
+
+    def storage_settings(self, directory):
+        """Settings a reemplazar durante las pruebas."""
+        caches = {}
+        for alias, options in settings.CACHES.items():
+            options = dict(options)
+            if options['BACKEND'] == 'core.sqlite_cache.SQLiteCache':
+                options['LOCATION'] = directory / f'cache-{alias}.sqlite3'
+            caches[alias] = options
+        return {
+            'METRICS_DB': directory / 'metrics.sqlite3',
+            'CACHES': caches,
+        }
+
+    def teardown_test_environment(self, **kwargs):
+        from core.metrics import registry
+
+        # Lo pendiente no debe escribirse al salir, ya con los settings reales
+        registry.reset()
+        registry.close()
+        caches.close_all()
+        self._storage_settings.disable()
+        self._storage_dir.cleanup()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,781 @@
-from django.test import TestCase
+"""
+Pruebas de regresión de rendimiento de las vistas principales.
 
-# Create your tests here.
+Cada vista se mide sobre un conjunto de datos sintético fijo en dos
+escalas (pequeña y el triple de salas y reservas):
+
+- La cantidad de consultas SQL no debe superar su presupuesto
+  (QUERY_BUDGETS) y debe ser la misma en ambas escalas: si cambia, la
+  vista hace consultas por sala o por reserva (N+1).
+- Opcionalmente (PERF_CHECK_LATENCY=1), el tiempo de respuesta (mediana de
+  varias solicitudes) se compara con la línea base de
+  core/perf_baseline.json, con una tolerancia amplia (PERF_TOLERANCE, por
+  defecto 3x). La línea base depende de la máquina, por lo que no se
+  verifica en una ejecución normal:
+
+    PERF_CHECK_LATENCY=1 python manage.py test core
+
+Para regenerar la línea base tras un cambio intencional:
+
+    PERF_UPDATE_BASELINE=1 python manage.py test core
+"""
+
+from datetime import time, timedelta
+import json
+import logging
+import os
+import queue
+import statistics
+import tempfile
+import threading
+import time as time_module
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.config import CONFIG_SCHEMA, ConfigService, config
+from core.logging_pipeline import AsyncRotatingFileHandler
+from core.models import SystemConfig
+from core.reservation_security import ReservationUsageLog
+from core.route_policy import RoutePolicyMiddleware, get_client_ip, keep_cache_control
+from core.session_middleware import SESSION_REFRESHED_AT_KEY, CoalescingSessionMiddleware
+from core.sqlite_cache import SQLiteCache
+from rooms.models import Reservation, Review, Room
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'perf_baseline.json'
+
+# Máximo de consultas por solicitud con la caché vacía (incluye sesión, usuario
+# y la recarga de SystemConfig). Bajar el número al optimizar una vista.
+QUERY_BUDGETS = {
+    'room_list': 9,
+    'room_detail': 12,
+    'room_reviews': 20,
+    'calendar_view': 7,
+    'dashboard': 12,
+    'security_dashboard': 15,
+}
+
+SMALL_SCALE = {'rooms': 3, 'reservations_per_room': 6, 'users': 4}
+LARGE_SCALE = {'rooms': 9, 'reservations_per_room': 18, 'users': 4}
+
+TIMING_RUNS = 5
+# Margen absoluto para que las vistas muy rápidas no fallen por ruido
+TIMING_SLACK = 0.05
+
+
+def build_dataset(rooms, reservations_per_room, users):
+    """
+    Crear salas, usuarios, reservas pasadas con reseñas, reservas futuras y
+    registros de uso. Devuelve (profesor, administrador, primera sala).
+    """
+    admin = User.objects.create(username='perf_admin', role='admin', is_staff=True, is_superuser=True)
+    members = [
+        User.objects.create(username=f'perf_profesor{index}', role='profesor')
+        for index in range(users)
+    ]
+    teacher = members[0]
+
+    created_rooms = Room.objects.bulk_create([
+        Room(
+            name=f'Sala rendimiento {index:02d}',
+            capacity=30,
+            location=f'Piso {index % 4}',
+            equipment='Proyector, Pizarra',
+            opening_time=time(8, 0),
+            closing_time=time(22, 0),
+            popularity_score=float(index),
+        )
+        for index in range(rooms)
+    ])
+
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    reservations = []
+    for room in created_rooms:
+        for index in range(reservations_per_room):
+            owner = members[index % len(members)]
+            # Mitad en el pasado (completadas), mitad en el futuro; franjas de 1 hora sin solaparse
+            offset = timedelta(hours=2 * (index // 2) + 1)
+            start = now - offset - timedelta(days=1) if index % 2 == 0 else now + offset
+            reservations.append(Reservation(
+                room=room,
+                user=owner,
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                purpose='Clase de rendimiento',
+                attendees_count=10,
+                status='completed' if index % 2 == 0 else 'confirmed',
+            ))
+    Reservation.objects.bulk_create(reservations)
+
+    Review.objects.bulk_create([
+        Review(
+            reservation=reservation,
+            rating=4, cleanliness_rating=4, equipment_rating=3, comfort_rating=5,
+            comment='Buena sala', comment_type='positive',
+        )
+        for reservation in Reservation.objects.filter(status='completed')
+    ])
+
+    ReservationUsageLog.objects.bulk_create([
+        ReservationUsageLog(
+            user=reservation.user,
+            action='create',
+            room_name=reservation.room.name,
+            reservation_id=reservation.id,
+            ip_address='127.0.0.1',
+            user_agent='tests',
+            additional_data={},
+        )
+        for reservation in Reservation.objects.select_related('room', 'user')
+    ])
+    return teacher, admin, created_rooms[0]
+
+
+def render_without_template(request, template_name, context=None, **kwargs):
+    """
+    Evaluar el contexto como lo haría la plantilla. room_reviews y
+    security_dashboard renderizan plantillas que no existen en el repositorio.
+    """
+    for value in (context or {}).values():
+        if hasattr(value, '__iter__') and not isinstance(value, (str, dict)):
+            list(value)
+        elif isinstance(value, dict):
+            list(value.values())
+    return HttpResponse('ok')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ViewPerformanceBudgetTests(TestCase):
+    """Presupuesto de consultas y de tiempo de las vistas más visitadas."""
+
+    baseline = {}
+    measured = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if BASELINE_PATH.exists():
+            cls.baseline = json.loads(BASELINE_PATH.read_text(encoding='utf-8'))
+        cls.measured = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('PERF_UPDATE_BASELINE') and cls.measured:
+            baseline = dict(cls.baseline, **cls.measured)
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n', encoding='utf-8')
+        super().tearDownClass()
+
+    def views(self, teacher, admin, room):
+        """Vista -> función que ejecuta una solicitud y devuelve el código de estado."""
+        def client_get(user, path, missing_template_in=None):
+            def run():
+                if missing_template_in is None:
+                    return self.client.get(path).status_code
+                with mock.patch(f'{missing_template_in}.render', render_without_template):
+                    return self.client.get(path).status_code
+            run.user = user
+            return run
+
+        def security_dashboard():
+            from core.security_views import security_dashboard as view
+            request = RequestFactory().get('/seguridad/')
+            request.user = admin
+            request.session = self.client.session
+            request._messages = FallbackStorage(request)
+            with mock.patch('core.security_views.render', render_without_template):
+                return view(request).status_code
+        security_dashboard.user = admin
+
+        return {
+            'room_list': client_get(teacher, '/salas/'),
+            'room_detail': client_get(teacher, f'/salas/sala/{room.id}/'),
+            'room_reviews': client_get(teacher, f'/salas/sala/{room.id}/reseñas/', 'rooms.views'),
+            'calendar_view': client_get(teacher, '/salas/calendario/'),
+            'dashboard': client_get(teacher, '/usuarios/dashboard/'),
+            'security_dashboard': security_dashboard,
+        }
+
+    def login(self, user):
+        self.client.force_login(user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+
+    def measure(self, scale, timed=True):
+        """Consultas (caché vacía) y mediana de tiempo (caché caliente, si timed) por vista."""
+        teacher, admin, room = build_dataset(**scale)
+
+        results = {}
+        for name, run in self.views(teacher, admin, room).items():
+            self.login(run.user)
+            self.assertEqual(run(), 200, name)
+
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                run()
+            # Leer antes de la próxima solicitud: request_started reinicia el registro de consultas
+            captured = [query['sql'] for query in queries.captured_queries]
+
+            timings = []
+            for _ in range(TIMING_RUNS if timed else 0):
+                started = time_module.perf_counter()
+                run()
+                timings.append(time_module.perf_counter() - started)
+            results[name] = (len(captured), statistics.median(timings) if timings else None, captured)
+
+        Reservation.objects.all().delete()
+        Room.objects.all().delete()
+        ReservationUsageLog.objects.all().delete()
+        User.objects.all().delete()
+        return results
+
+    def test_views_stay_within_query_budget_and_do_not_scale(self):
+        small = self.measure(SMALL_SCALE, timed=False)
+        large = self.measure(LARGE_SCALE, timed=False)
+
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                small_count, _, _ = small[name]
+                large_count, _, large_queries = large[name]
+                self.assertLessEqual(
+                    large_count, budget,
+                    f"{name} hizo {large_count} consultas (presupuesto {budget}):\n"
+                    + '\n'.join(large_queries),
+                )
+                self.assertEqual(
+                    small_count, large_count,
+                    f"{name} pasó de {small_count} a {large_count} consultas al triplicar "
+                    f"salas y reservas (¿consultas por fila?)",
+                )
+
+    @skipUnless(
+        os.environ.get('PERF_CHECK_LATENCY') or os.environ.get('PERF_UPDATE_BASELINE'),
+        'comparación de latencia opcional: PERF_CHECK_LATENCY=1',
+    )
+    def test_views_stay_within_latency_baseline(self):
+        tolerance = float(os.environ.get('PERF_TOLERANCE', 3))
+        large = self.measure(LARGE_SCALE)
+
+        for name, (_, elapsed, _) in large.items():
+            self.measured[name] = round(elapsed, 4)
+            baseline = self.baseline.get(name)
+            if baseline is None or os.environ.get('PERF_UPDATE_BASELINE'):
+                continue
+            with self.subTest(view=name):
+                self.assertLessEqual(
+                    elapsed, baseline * tolerance + TIMING_SLACK,
+                    f"{name} tardó {elapsed * 1000:.1f}ms (línea base {baseline * 1000:.1f}ms, "
+                    f"tolerancia {tolerance}x)",
+                )
+
+
+class ServerTimingTests(TestCase):
+    """Cabecera Server-Timing e histogramas por vista (ver core/instrumentation.py)."""
+
+    def get_as(self, user, path):
+        self.client.force_login(user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+        return self.client.get(path)
+
+    def test_staff_receive_server_timing(self):
+        from core.instrumentation import view_histograms
+
+        staff = User.objects.create(username='perf_staff', role='admin', is_staff=True)
+        response = self.get_as(staff, '/salas/calendario/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ consultas"')
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertIn('rooms:calendar', [row['view'] for row in view_histograms.snapshot()])
+
+    def test_other_users_do_not(self):
+        teacher = User.objects.create(username='perf_teacher', role='profesor')
+        response = self.get_as(teacher, '/salas/calendario/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class MetricsEndpointTests(TestCase):
+    """Registro de métricas compartido y endpoint /metrics (ver core/metrics.py)."""
+
+    def setUp(self):
+        import tempfile
+        from core.metrics import MetricsRegistry
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.registry = MetricsRegistry(path=Path(directory.name) / 'metrics.sqlite3')
+        self.addCleanup(self.registry.close)
+
+    def test_counters_and_histograms_are_shared_through_the_store(self):
+        from core.metrics import MetricsRegistry
+
+        counter = self.registry.counter('demo_total', 'Demo', ['kind'])
+        histogram = self.registry.histogram('demo_seconds', 'Demo', ['view'], buckets=(0.1, 1))
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+        histogram.observe(0.05, view='v')
+        histogram.observe(0.5, view='v')
+        self.registry.flush()
+
+        # Otro proceso (otra instancia con el mismo archivo) ve los mismos valores
+        other = MetricsRegistry(path=self.registry.path)
+        self.addCleanup(other.close)
+        other.counter('demo_total', 'Demo', ['kind'])
+        other.histogram('demo_seconds', 'Demo', ['view'], buckets=(0.1, 1))
+        text = other.exposition()
+
+        self.assertIn('# TYPE demo_total counter', text)
+        self.assertIn('demo_total{kind="a"} 3', text)
+        self.assertIn('demo_seconds_bucket{view="v",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{view="v",le="1"} 2', text)
+        self.assertIn('demo_seconds_bucket{view="v",le="+Inf"} 2', text)
+        self.assertIn('demo_seconds_count{view="v"} 2', text)
+
+    def test_endpoint_requires_staff_or_token(self):
+        staff = User.objects.create(username='metrics_staff', role='admin', is_staff=True)
+        teacher = User.objects.create(username='metrics_teacher', role='profesor')
+        self.registry.counter('demo_total', 'Demo').inc()
+
+        with mock.patch('core.metrics.registry', self.registry), \
+                override_settings(METRICS_TOKEN='secreto-de-prueba'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 403,
+            )
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto-de-prueba')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+            self.assertIn('demo_total 1', response.content.decode())
+
+            for user, expected in ((teacher, 403), (staff, 200)):
+                self.client.force_login(user)
+                session = self.client.session
+                session['last_activity'] = True
+                session.save()
+                self.assertEqual(self.client.get('/metrics').status_code, expected, user.username)
+
+
+    def test_performance_dashboard_aggregates_every_process(self):
+        from core.metrics import HTTP_REQUEST_DURATION, MetricsRegistry, registry
+
+        # Otro worker escribe en el mismo almacén compartido
+        other = MetricsRegistry(path=registry.path)
+        self.addCleanup(other.close)
+        duration = other.histogram(
+            HTTP_REQUEST_DURATION.name, 'Demo', ['view'], buckets=HTTP_REQUEST_DURATION.buckets,
+        )
+        duration.observe(0.2, view='otro_worker:vista')
+        duration.observe(0.4, view='otro_worker:vista')
+        other.flush()
+
+        staff = User.objects.create(username='perf_staff', role='admin', is_staff=True)
+        self.client.force_login(staff)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+
+        data = self.client.get('/sistema/rendimiento/', {'format': 'json'}).json()
+        row = next(row for row in data['all_processes'] if row['view'] == 'otro_worker:vista')
+        self.assertEqual((row['count'], row['mean_ms'], row['p50_ms'], row['p99_ms']), (2, 300.0, 250, 500))
+        self.assertEqual(data['pid'], os.getpid())
+
+        page = self.client.get('/sistema/rendimiento/').content.decode()
+        self.assertIn('otro_worker:vista', page)
+        self.assertIn(f'Este proceso (PID {os.getpid()})', page)
+        # Enlazado desde el menú de administración
+        self.assertIn('href="/sistema/rendimiento/"', self.client.get('/salas/').content.decode())
+
+class SlowQueryCaptureTests(TestCase):
+    """Registro de consultas lentas e informe por huella (ver core/slow_queries.py)."""
+
+    def login(self, user):
+        self.client.force_login(user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+
+    def test_fingerprint_ignores_literal_values(self):
+        from core.slow_queries import fingerprint_sql
+
+        first = fingerprint_sql(
+            "SELECT * FROM rooms_reservation WHERE room_id IN (1, 2, 3) AND status = 'confirmed'"
+        )
+        second = fingerprint_sql(
+            "SELECT *  FROM rooms_reservation\nWHERE room_id IN (%s, %s) AND status = 'pending'"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], "SELECT * FROM rooms_reservation WHERE room_id IN (...) AND status = ?")
+
+    def test_slow_queries_are_recorded_bounded_and_reported(self):
+        from core.config import config
+        from core.models import SlowQuery
+
+        staff = User.objects.create(username='slow_admin', role='admin', is_staff=True, is_superuser=True)
+        self.login(staff)
+
+        values = {
+            'diagnostics.slow_query_threshold': timedelta(0),
+            'diagnostics.slow_query_stack_sample': 1.0,
+            'diagnostics.slow_query_max_rows': 10,
+        }
+        original_get = config.get
+        with mock.patch.object(config, 'get', lambda key, default=None: values.get(key, original_get(key, default))):
+            self.assertEqual(self.client.get('/salas/calendario/').status_code, 200)
+            recorded = list(SlowQuery.objects.all())
+            self.assertTrue(recorded)
+            self.assertLessEqual(len(recorded), 10)
+            self.assertEqual({row.view_name for row in recorded}, {'rooms:calendar'})
+            self.assertTrue(all(row.stack for row in recorded))
+
+            for _ in range(3):
+                self.client.get('/salas/calendario/')
+            self.assertLessEqual(SlowQuery.objects.count(), 10)
+
+        self.assertContains(self.client.get('/admin/core/slowquery/'), 'Informe por huella')
+        response = self.client.get('/admin/core/slowquery/informe/')
+        self.assertEqual(response.status_code, 200)
+        report = response.context['report']
+        self.assertTrue(report)
+        self.assertEqual(sum(row['count'] for row in report), SlowQuery.objects.count())
+        self.assertTrue(all(row['p95_ms'] <= row['max_ms'] for row in report))
+
+
+class SecurityStatsApiTests(TestCase):
+    """security_stats_api (vista asíncrona) bajo ASGI."""
+
+    async def test_daily_counts_and_violations(self):
+        from asgiref.sync import sync_to_async
+
+        def setup():
+            staff = User.objects.create(username='stats_admin', role='admin', is_staff=True)
+            two_days_ago = timezone.now() - timedelta(days=2)
+            logs = ReservationUsageLog.objects.bulk_create([
+                ReservationUsageLog(user=staff, action='create', room_name='Sala A'),
+                ReservationUsageLog(user=staff, action='create', room_name='Sala A'),
+                ReservationUsageLog(
+                    user=staff, action='attempt_blocked', room_name='Sala A',
+                    additional_data={'violations': ['max_per_hour', 'max_per_day']},
+                ),
+            ])
+            ReservationUsageLog.objects.filter(pk__in=[log.pk for log in logs]).update(timestamp=two_days_ago)
+            self.client.force_login(staff)
+            session = self.client.session
+            session['last_activity'] = True
+            session.save()
+            return two_days_ago
+
+        two_days_ago = await sync_to_async(setup)()
+        self.async_client.cookies = self.client.cookies
+        response = await self.async_client.get('/sistema/seguridad/estadisticas/', {'days': 7})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['daily_stats']), 7)
+        by_date = {row['date']: row for row in data['daily_stats']}
+        day = by_date[two_days_ago.strftime('%Y-%m-%d')]
+        self.assertEqual((day['successful_reservations'], day['blocked_attempts']), (2, 1))
+        self.assertEqual(data['violation_types'], {'max_per_hour': 1, 'max_per_day': 1})
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    """Handler de archivo asíncrono (ver core/logging_pipeline.py)."""
+
+    def test_creates_directory_and_reports_dropped_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'nuevo', 'app.log')
+            handler = AsyncRotatingFileHandler(filename)
+            handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+            record = logging.makeLogRecord({'msg': 'registro', 'levelno': logging.INFO, 'levelname': 'INFO'})
+            # Cola llena: los dos primeros registros se descartan
+            with mock.patch.object(handler.queue, 'put_nowait', side_effect=queue.Full):
+                handler.handle(record)
+                handler.handle(record)
+            handler.handle(record)
+            handler.close()
+
+            with open(filename, encoding='utf-8') as log:
+                lines = log.read().splitlines()
+
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(len(lines), 2)
+        self.assertIn('se descartaron 2 registros', lines[0])
+        self.assertEqual(lines[1], 'INFO registro')
+
+
+class RoutePolicyMiddlewareTests(TestCase):
+    """Decisiones de RoutePolicyMiddleware (permitir, redirigir o 404)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RoutePolicyMiddleware(lambda request: HttpResponse('vista'))
+        self.student = User.objects.create(username='policy_estudiante', role='estudiante')
+
+    def request(self, path, user=None, **session):
+        request = self.factory.get(path)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        request.session.update(session)
+        request._messages = FallbackStorage(request)
+        return request
+
+    def get(self, path, user=None, **session):
+        return self.middleware(self.request(path, user, **session))
+
+    def test_anonymous_protected_paths_redirect_to_login_with_next(self):
+        for path in ('/rooms/api/salas/', '/rooms/admin/reportes/', '/panel/admin/'):
+            with self.subTest(path=path):
+                response = self.get(path)
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(response['Location'], f'/usuarios/login/?next={path}')
+        self.assertEqual(self.get('/salas/').status_code, 200)
+
+    def test_admin_variations_are_not_found_except_exact_admin(self):
+        for path in ('/Admin/', '/ADMIN', '/administrator/', '/admin.php', '/panel/', '/adm'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path, self.student, last_activity=True).status_code, 404)
+        self.assertEqual(self.get('/admin/', self.student, last_activity=True).status_code, 200)
+
+    def test_unsafe_paths_are_not_found(self):
+        # RequestFactory decodifica la URL: %252e llega como %2e en request.path
+        for path in ('/salas//sala/1/', '/salas/./sala/1/', '/salas/../admin/', '/salas/%252e%252e/admin/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path, self.student, last_activity=True).status_code, 404)
+
+    def test_support_api_requires_admin_or_support_role(self):
+        response = self.get('/rooms/api/salas/', self.student, last_activity=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/salas/')
+
+        support = User.objects.create(username='policy_soporte', role='soporte')
+        self.assertEqual(self.get('/rooms/api/salas/', support, last_activity=True).status_code, 200)
+
+    def test_session_without_activity_mark_is_logged_out(self):
+        request = self.request('/salas/', self.student)
+        response = self.middleware(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/usuarios/login/')
+        self.assertFalse(request.user.is_authenticated)
+        self.assertTrue(request.session['is_logged_out'])
+        self.assertEqual(request.session['last_username'], self.student.username)
+
+    def test_logged_out_session_is_flushed(self):
+        request = self.request('/salas/', is_logged_out=True, last_username='policy_estudiante')
+        response = self.middleware(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], '/usuarios/login/')
+        self.assertNotIn('is_logged_out', request.session)
+        self.assertNotIn('last_username', request.session)
+
+    def test_authenticated_pages_are_not_stored_by_the_browser(self):
+        response = self.get('/salas/', self.student, last_activity=True)
+        self.assertEqual(response['Cache-Control'], 'no-cache, no-store, must-revalidate, max-age=0')
+        self.assertEqual(response['Pragma'], 'no-cache')
+
+    def test_only_marked_views_keep_their_cache_control(self):
+        def conditional_api(request):
+            keep_cache_control(request)
+            response = HttpResponse('[]', content_type='application/json')
+            response['ETag'] = '"abc"'
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        def page_with_etag(request):
+            response = HttpResponse('vista')
+            response['ETag'] = '"abc"'
+            return response
+
+        api = RoutePolicyMiddleware(conditional_api)(
+            self.request('/salas/api/calendario/eventos/', self.student, last_activity=True)
+        )
+        page = RoutePolicyMiddleware(page_with_etag)(self.request('/salas/', self.student, last_activity=True))
+
+        self.assertEqual(api['Cache-Control'], 'private, no-cache')
+        self.assertFalse(api.has_header('Pragma'))
+        self.assertEqual(page['Cache-Control'], 'no-cache, no-store, must-revalidate, max-age=0')
+
+
+class ClientIpTests(SimpleTestCase):
+    """IP del cliente para los límites por IP (ver core.route_policy.get_client_ip)."""
+
+    def ip(self, remote_addr, forwarded=None):
+        headers = {'X-Forwarded-For': forwarded} if forwarded else {}
+        return get_client_ip(RequestFactory().get('/', REMOTE_ADDR=remote_addr, headers=headers))
+
+    def test_forwarded_header_is_ignored_without_trusted_proxy(self):
+        self.assertEqual(self.ip('203.0.113.7', '198.51.100.1'), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_trusted_proxy_forwards_the_client_address(self):
+        # El cliente antepuso una dirección falsa; el proxy agregó la real
+        self.assertEqual(self.ip('10.0.0.2', '1.2.3.4, 198.51.100.1, 10.0.0.5'), '198.51.100.1')
+        self.assertEqual(self.ip('10.0.0.2'), '10.0.0.2')
+        self.assertEqual(self.ip('203.0.113.7', '198.51.100.1'), '203.0.113.7')
+
+
+class SessionCoalescingTests(SimpleTestCase):
+    """Escrituras de sesión coalescidas (ver core/session_middleware.py)."""
+
+    def respond(self, refreshed_ago, modify=False):
+        stored = SessionStore()
+        stored['usuario'] = 'profesor'
+        stored[SESSION_REFRESHED_AT_KEY] = int(time_module.time()) - refreshed_ago
+        stored.save()
+
+        request = RequestFactory().get('/')
+        request.session = SessionStore(session_key=stored.session_key)
+        request.session['usuario']
+        if modify:
+            request.session['filtro'] = 'laboratorios'
+        middleware = CoalescingSessionMiddleware(lambda request: HttpResponse())
+        return request.session, middleware.process_response(request, HttpResponse())
+
+    def test_reads_within_the_interval_do_not_write(self):
+        session, response = self.respond(refreshed_ago=10)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(session.modified)
+
+    def test_expired_interval_refreshes_the_session(self):
+        session, response = self.respond(refreshed_ago=settings.SESSION_REFRESH_INTERVAL + 1)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertAlmostEqual(session[SESSION_REFRESHED_AT_KEY], time_module.time(), delta=2)
+
+    def test_modified_session_is_written_within_the_interval(self):
+        session, response = self.respond(refreshed_ago=10, modify=True)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(session['filtro'], 'laboratorios')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    """Semántica del backend de caché compartido (ver core/sqlite_cache.py)."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SQLiteCache(Path(directory.name) / 'cache.sqlite3', {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'SWEEP_INTERVAL': 3600},
+        })
+
+    def later(self, seconds):
+        """Adelantar el reloj del backend."""
+        return mock.patch('core.sqlite_cache.time.time', return_value=time_module.time() + seconds)
+
+    def test_add_only_replaces_missing_or_expired_entries(self):
+        self.assertTrue(self.cache.add('bloqueo', 'primero', timeout=60))
+        self.assertFalse(self.cache.add('bloqueo', 'segundo', timeout=60))
+        self.assertEqual(self.cache.get('bloqueo'), 'primero')
+        with self.later(61):
+            self.assertTrue(self.cache.add('bloqueo', 'tercero', timeout=None))
+        self.assertEqual(self.cache.get('bloqueo'), 'tercero')
+
+    def test_incr_keeps_types_and_is_atomic_across_threads(self):
+        self.cache.set('contador', 0)
+        self.cache.set('promedio', 1.5)
+        self.cache.set('activo', True)
+
+        def worker():
+            for _ in range(50):
+                self.cache.incr('contador')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.cache.get('contador'), 400)
+        self.assertEqual(self.cache.incr('promedio', 2), 3.5)
+        self.assertIs(self.cache.get('activo'), True)
+        with self.assertRaises(ValueError):
+            self.cache.incr('inexistente')
+
+    def test_expired_entries_are_invisible(self):
+        self.cache.set('version', 7, timeout=60)
+        self.cache.set('permanente', 'sí', timeout=None)
+        self.assertTrue(self.cache.touch('version', timeout=120))
+        with self.later(90):
+            self.assertEqual(self.cache.get('version'), 7)
+        with self.later(121):
+            self.assertIsNone(self.cache.get('version'))
+            self.assertFalse(self.cache.has_key('version'))
+            self.assertEqual(self.cache.get_many(['version', 'permanente']), {'permanente': 'sí'})
+            with self.assertRaises(ValueError):
+                self.cache.incr('version')
+            self.assertFalse(self.cache.touch('version'))
+
+    def test_sweep_culls_the_entries_that_expire_first(self):
+        for index in range(12):
+            self.cache.set(f'clave{index}', index, timeout=100 + index)
+        self.cache.set('permanente', 'sí', timeout=None)
+        self.cache.set('expirada', 'no', timeout=1)
+
+        with self.later(2):
+            # 1 expirada + 13 restantes > MAX_ENTRIES: se descarta 13 // 2
+            self.assertEqual(self.cache.sweep(), 1 + 6)
+            self.assertEqual(
+                sorted(self.cache.get_many([f'clave{index}' for index in range(12)]).values()),
+                list(range(6, 12)),
+            )
+            self.assertEqual(self.cache.get('permanente'), 'sí')
+
+
+class ConfigServiceTests(TestCase):
+    """Configuración tipada sobre SystemConfig (ver core/config.py)."""
+
+    def setUp(self):
+        # Revertir la transacción de la prueba no emite señales: borrar las filas
+        # devuelve la configuración global a sus valores por defecto
+        self.addCleanup(lambda: SystemConfig.objects.all().delete())
+
+    def test_values_are_parsed_by_schema_and_invalid_ones_fall_back(self):
+        SystemConfig.objects.create(key='reservations.cancel_window', value='1.5h')
+        SystemConfig.objects.create(key='security.rate_limits', value='{"rate_reserve": {"limit": 3}}')
+        with self.assertLogs('core.config', 'WARNING') as logs:
+            SystemConfig.objects.create(key='booking.max_concurrent_per_room', value='dos')
+            SystemConfig.objects.create(key='site.timezone', value='Marte/Olympus')
+        SystemConfig.objects.create(key='ui.banner', value='Mantenimiento el sábado')
+
+        self.assertIn("'site.timezone' = 'Marte/Olympus'", logs.output[-1])
+        self.assertEqual(config.get('reservations.cancel_window'), timedelta(minutes=90))
+        self.assertEqual(config.get('security.rate_limits'), {'rate_reserve': {'limit': 3}})
+        self.assertEqual(config.get('booking.max_concurrent_per_room'), 2)
+        self.assertEqual(config.get('site.timezone').zone, 'America/Santiago')
+        self.assertEqual(config.get('ui.banner'), 'Mantenimiento el sábado')
+
+    def test_save_and_delete_invalidate_every_process(self):
+        other_process = ConfigService(CONFIG_SCHEMA)
+        other_process.reload()
+        self.assertEqual(other_process.get('availability.continuous_gap'), timedelta(minutes=15))
+
+        entry = SystemConfig.objects.create(key='availability.continuous_gap', value='5m')
+        self.assertEqual(config.get('availability.continuous_gap'), timedelta(minutes=5))
+        # Hasta la siguiente solicitud el otro proceso conserva su copia
+        self.assertEqual(other_process.get('availability.continuous_gap'), timedelta(minutes=15))
+        other_process.check_version()
+        self.assertEqual(other_process.get('availability.continuous_gap'), timedelta(minutes=5))
+        with CaptureQueriesContext(connection) as unchanged:
+            other_process.check_version()
+        self.assertEqual(len(unchanged), 0)
+
+        entry.delete()
+        other_process.check_version()
+        self.assertEqual(config.get('availability.continuous_gap'), timedelta(minutes=15))
+        self.assertEqual(other_process.get('availability.continuous_gap'), timedelta(minutes=15))
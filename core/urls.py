@@ -0,0 +1,14 @@
+"""
+URLs del módulo core (paneles de sistema para administradores).
+"""
+
+from django.urls import path
+
+from . import security_views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('rendimiento/', security_views.performance_dashboard, name='performance_dashboard'),
+    path('seguridad/estadisticas/', security_views.security_stats_api, name='security_stats_api'),
+]
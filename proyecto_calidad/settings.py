@@ -50,16 +50,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.RequestTimingMiddleware',  # Server-Timing e histogramas por vista
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.session_middleware.CoalescingSessionMiddleware',  # Sesiones con escritura coalescida
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'core.session_middleware.SessionSecurityMiddleware',  # Middleware para seguridad de sesiones
-    'core.middleware.SecurityMiddleware',  # Middleware personalizado para seguridad general
-    'core.admin_middleware.AdminSecurityMiddleware',  # Middleware específico para panel admin
+    'core.route_policy.RoutePolicyMiddleware',  # Seguridad de sesiones y políticas de rutas
     'core.reservation_security_middleware.ReservationSecurityMiddleware',  # Sistema de seguridad de reservas
     'core.reservation_security_middleware.RateLimitMiddleware',  # Rate limiting por IP
 ]
@@ -68,7 +67,8 @@ ROOT_URLCONF = 'proyecto_calidad.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que informa el tiempo de renderizado (core/instrumentation.py)
+        'BACKEND': 'core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -76,6 +76,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'rooms.context_processors.live_status',
             ],
         },
     },
@@ -91,6 +92,18 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Transacciones diferidas: solo las reservas abren con BEGIN IMMEDIATE
+            # (rooms.booking.write_transaction), así las escrituras de sesión,
+            # caché o métricas no se serializan tras un bloqueo de escritura
+            'timeout': 5,
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+        },
+        # Base de pruebas en archivo: las pruebas de concurrencia usan varias
+        # conexiones con el mismo modo de bloqueo que en producción
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -146,6 +159,11 @@ AUTH_USER_MODEL = 'usuarios.CustomUser'
 # Logging Configuration for Quality Assurance
 import os
 
+# Los archivos de log se escriben desde un hilo de fondo (ver core/logging_pipeline.py)
+# Con varios procesos escribiendo los logs (gunicorn) la rotación queda a
+# cargo de logrotate (ver core/logging_pipeline.py)
+LOG_EXTERNAL_ROTATION = os.environ.get('LOG_EXTERNAL_ROTATION') == '1'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -158,14 +176,36 @@ LOGGING = {
             'format': '{levelname} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'core.logging_pipeline.JsonFormatter',
+        },
+    },
+    'filters': {
+        # Mensajes de alta frecuencia del middleware de rutas (uno por solicitud)
+        'route_policy_sampling': {
+            '()': 'core.logging_pipeline.SamplingFilter',
+            'rates': {'DEBUG': 0.01, 'INFO': 0.1},
+        },
     },
     'handlers': {
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.FileHandler',
+            'class': 'core.logging_pipeline.AsyncRotatingFileHandler',
             'filename': BASE_DIR / 'logs' / 'debug.log',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'watched': LOG_EXTERNAL_ROTATION,
             'formatter': 'verbose',
         },
+        'json_file': {
+            'level': 'INFO',
+            'class': 'core.logging_pipeline.AsyncRotatingFileHandler',
+            'filename': BASE_DIR / 'logs' / 'app.jsonl',
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'watched': LOG_EXTERNAL_ROTATION,
+            'formatter': 'json',
+        },
         'console': {
             'level': 'WARNING',  # Cambiado a WARNING para destacar mensajes relevantes
             'class': 'logging.StreamHandler',
@@ -173,34 +213,38 @@ LOGGING = {
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['console', 'file', 'json_file'],
         'level': 'DEBUG',
-    },    'loggers': {
+    },
+    'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'json_file'],
             'level': 'INFO',
             'propagate': False,
         },
         'django.request': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'json_file'],
             'level': 'ERROR',  # Solo errores reales, no PermissionDenied
             'propagate': False,
         },
         'usuarios': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'json_file'],
             'level': 'INFO',
             'propagate': False,
         },
         'rooms': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'json_file'],
             'level': 'INFO',
             'propagate': False,
         },
         'core': {
-            'handlers': ['console', 'file'],
+            'handlers': ['console', 'file', 'json_file'],
             'level': 'DEBUG',  # DEBUG para capturar todos los mensajes del middleware
             'propagate': False,
         },
+        'core.route_policy': {
+            'filters': ['route_policy_sampling'],
+        },
     },
 }
 
@@ -217,6 +261,47 @@ CSRF_USE_SESSIONS = True
 SESSION_COOKIE_SAMESITE = 'None' if not DEBUG else 'Lax'
 CSRF_COOKIE_SAMESITE = 'None' if not DEBUG else 'Lax'
 
+# Caché compartida entre procesos (bloqueos de seguridad, rate limiting,
+# sesiones y versiones de calendario); ver core/sqlite_cache.py. Durante
+# `manage.py test` se usa un archivo temporal (core/test_runner.py).
+CACHES = {
+    'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 4,
+            'SWEEP_INTERVAL': 60,
+        },
+    }
+}
+
+# Métricas de Prometheus compartidas entre procesos (core/metrics.py), expuestas
+# en /metrics. Sin sesión staff, el scraper se autentica con
+# "Authorization: Bearer $METRICS_TOKEN" (vacío: solo staff). Durante
+# `manage.py test` se usa un archivo temporal (core/test_runner.py).
+METRICS_DB = BASE_DIR / 'metrics.sqlite3'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+TEST_RUNNER = 'core.test_runner.IsolatedStorageRunner'
+
+# Proxies inversos de confianza (IPs o redes CIDR, separadas por coma). Solo
+# si la conexión viene de uno de ellos se usa X-Forwarded-For como IP del
+# cliente (core.route_policy.get_client_ip); sin proxies, REMOTE_ADDR.
+TRUSTED_PROXIES = [
+    proxy.strip() for proxy in os.environ.get('TRUSTED_PROXIES', '').split(',') if proxy.strip()
+]
+
+# Límites de solicitudes por clase de ruta (core.rate_limit): por usuario si hay
+# sesión, por IP si no. rate_reserve cuenta solo los intentos de reserva que
+# llegan a escribir (room_reserve); login y registro, en RateLimitMiddleware
+RATE_LIMITS = {
+    'rate_reserve': {'limit': 10, 'window': 3600, 'methods': ['POST']},
+    'rate_login': {'limit': 20, 'window': 3600, 'methods': ['POST']},
+    'rate_register': {'limit': 5, 'window': 3600, 'methods': ['POST']},
+}
+
 # Login URLs
 LOGIN_URL = '/usuarios/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -225,4 +310,6 @@ LOGOUT_REDIRECT_URL = '/usuarios/login/'
 # Configuraciones de seguridad de sesión
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # La sesión expira al cerrar el navegador
 SESSION_COOKIE_AGE = 3600  # 1 hora en segundos
-SESSION_SAVE_EVERY_REQUEST = True  # Guardar la sesión en cada solicitud
+SESSION_ENGINE = 'core.session_backend'  # cached_db sin escrituras redundantes
+SESSION_SAVE_EVERY_REQUEST = False  # Se guarda solo si cambió o cada SESSION_REFRESH_INTERVAL
+SESSION_REFRESH_INTERVAL = 300  # Renovación de la expiración como máximo cada 5 minutos
@@ -23,6 +23,8 @@ from django.http import HttpResponse
 from django.views.decorators.http import require_GET
 import os
 
+from core.security_views import metrics_endpoint
+
 # Configurar manejadores de errores personalizados
 handler404 = 'usuarios.views.custom_404'
 handler500 = 'usuarios.views.custom_500' 
@@ -93,10 +95,14 @@ urlpatterns = [
     
     # SEO y Seguridad
     path('robots.txt', robots_txt, name='robots_txt'),
+
+    # Métricas para Prometheus (staff o token en settings.METRICS_TOKEN)
+    path('metrics', metrics_endpoint, name='metrics'),
       # Aplicaciones
     path('usuarios/', include('usuarios.urls')),
     path('salas/', include('rooms.urls')),
     path('rooms/', include('rooms.urls')),  # Agregar también la ruta 'rooms' para compatibilidad
+    path('sistema/', include('core.urls')),  # Paneles de sistema para staff
       # CORRECCIÓN: Redirigir URLs de sala mal formadas a la URL correcta
     path('salas/<int:room_id>/', redirect_room_detail),
     
@@ -0,0 +1,151 @@
+"""
+Control de admisión para la creación de reservas.
+
+Cuando se abren las reservas de laboratorios, cientos de solicitudes
+llegan a room_reserve en pocos segundos. En lugar de dejar que todas
+compitan por el bloqueo de escritura de la base de datos (y terminen en
+timeouts), cada proceso admite a lo sumo
+'booking.max_concurrent_per_process' reservas en curso, y
+'booking.max_concurrent_per_room' por sala. El resto espera turno en
+una cola acotada ('booking.max_queue') durante como máximo
+'booking.queue_timeout'; pasado ese límite se responde 503 con
+Retry-After, de modo que el sitio se degrada de forma predecible.
+
+Los límites se leen del servicio de configuración (core/config.py) en
+cada admisión, por lo que pueden ajustarse sin reiniciar.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+import logging
+import math
+import threading
+import time
+
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from core.config import config
+from core.metrics import BOOKINGS_OVERLOADED
+
+logger = logging.getLogger(__name__)
+
+
+class BookingOverloaded(Exception):
+    """No hay capacidad para procesar la reserva ahora."""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__("Sistema de reservas saturado")
+
+
+def get_retry_after():
+    """Segundos sugeridos para reintentar (Retry-After)."""
+    return max(1, math.ceil(config.get('booking.retry_after').total_seconds()))
+
+
+class AdmissionController:
+    """Cupos de reservas en curso por proceso y por sala, con cola acotada."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._active_by_room = defaultdict(int)
+        self._waiting = 0
+
+    def _has_capacity(self, room_id):
+        return (
+            self._active < config.get('booking.max_concurrent_per_process')
+            and self._active_by_room[room_id] < config.get('booking.max_concurrent_per_room')
+        )
+
+    def stats(self):
+        """Reservas en curso y en espera en este proceso."""
+        with self._condition:
+            return {'active': self._active, 'waiting': self._waiting}
+
+    @contextmanager
+    def admit(self, room_id):
+        """
+        Ocupar un cupo para reservar en la sala, esperando turno si es necesario.
+
+        Raises:
+            BookingOverloaded: Si la cola está llena o la espera supera el límite
+        """
+        with self._condition:
+            if not self._has_capacity(room_id):
+                if self._waiting >= config.get('booking.max_queue'):
+                    raise BookingOverloaded(get_retry_after())
+
+                deadline = time.monotonic() + config.get('booking.queue_timeout').total_seconds()
+                self._waiting += 1
+                try:
+                    while not self._has_capacity(room_id):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise BookingOverloaded(get_retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._active += 1
+            self._active_by_room[room_id] += 1
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._active_by_room[room_id] -= 1
+                if not self._active_by_room[room_id]:
+                    del self._active_by_room[room_id]
+                self._condition.notify_all()
+
+
+booking_admission = AdmissionController()
+
+
+def overloaded_response(request, retry_after):
+    """Respuesta 503 con Retry-After (JSON o página de error)."""
+    message = (
+        "El sistema de reservas está recibiendo muchas solicitudes. "
+        f"Intenta nuevamente en {retry_after} segundos."
+    )
+    if request.headers.get('Accept', '').startswith('application/json'):
+        response = JsonResponse({
+            'error': True,
+            'message': message,
+            'type': 'booking_overloaded',
+            'retry_after': retry_after,
+        }, status=503)
+    else:
+        response = render(request, 'errors/503.html', {'error_message': message}, status=503)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def admission_controlled(view_func):
+    """
+    Decorador: las solicitudes POST de la vista pasan por el control de admisión.
+
+    La vista debe recibir room_id; si lanza BookingOverloaded (p. ej. porque
+    la base de datos siguió bloqueada tras los reintentos) también se
+    responde 503.
+    """
+    @wraps(view_func)
+    def wrapper(request, room_id, *args, **kwargs):
+        if request.method != 'POST':
+            return view_func(request, room_id, *args, **kwargs)
+        try:
+            with booking_admission.admit(room_id):
+                return view_func(request, room_id, *args, **kwargs)
+        except BookingOverloaded as e:
+            BOOKINGS_OVERLOADED.inc()
+            stats = booking_admission.stats()
+            logger.warning(
+                "Reserva rechazada por sobrecarga: sala %s, usuario %s (en curso: %s, en espera: %s)",
+                room_id, request.user.username, stats['active'], stats['waiting'],
+            )
+            return overloaded_response(request, e.retry_after)
+    return wrapper
@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RoomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rooms'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.restore_overlap_triggers, sender=self)
@@ -0,0 +1,163 @@
+"""
+Búsqueda de horarios libres en múltiples salas.
+
+Calcula los primeros N bloques libres de una duración dada entre todas
+las salas elegibles usando un barrido (sweep-line) sobre una única
+consulta masiva de reservas, en lugar de consultar sala por sala.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+import heapq
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import Reservation
+
+# Estados que bloquean una sala (mismo criterio que Room.is_available_at)
+BLOCKING_STATUSES = ['confirmed', 'in_progress']
+
+# Los inicios de bloque se alinean a esta granularidad (en minutos)
+SLOT_GRANULARITY_MINUTES = 5
+
+
+def _ceil_to_granularity(moment):
+    """Redondear un datetime hacia arriba a la granularidad de bloques."""
+    floored = moment.replace(
+        minute=moment.minute - moment.minute % SLOT_GRANULARITY_MINUTES,
+        second=0,
+        microsecond=0,
+    )
+    if floored == moment:
+        return moment
+    return floored + timedelta(minutes=SLOT_GRANULARITY_MINUTES)
+
+
+def load_busy_intervals(room_ids, range_start, range_end):
+    """
+    Obtener los intervalos ocupados de varias salas con una sola consulta.
+
+    Returns:
+        dict: room_id -> lista de (inicio, fin) ordenada por inicio
+    """
+    busy = defaultdict(list)
+    rows = Reservation.objects.filter(
+        room_id__in=room_ids,
+        status__in=BLOCKING_STATUSES,
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).values_list('room_id', 'start_time', 'end_time').order_by('room_id', 'start_time')
+
+    for room_id, start, end in rows:
+        busy[room_id].append((start, end))
+    return busy
+
+
+def match_overlaps(candidates, busy):
+    """
+    Cruzar intervalos candidatos contra intervalos ocupados con dos punteros.
+
+    Ambas listas deben estar ordenadas por inicio; los intervalos ocupados
+    no se solapan entre sí (reservas confirmadas), por lo que al estar
+    ordenados por inicio también lo están por fin. Los dos últimos elementos
+    de cada tupla deben ser (inicio, fin).
+
+    Returns:
+        dict: índice del candidato -> primer intervalo ocupado que lo solapa
+    """
+    overlaps = {}
+    pointer = 0
+    for index, candidate in enumerate(candidates):
+        start, end = candidate[-2], candidate[-1]
+        while pointer < len(busy) and busy[pointer][-1] <= start:
+            pointer += 1
+        if pointer < len(busy) and busy[pointer][-2] < end:
+            overlaps[index] = busy[pointer]
+    return overlaps
+
+
+def _room_free_slots(room, intervals, range_start, range_end, duration):
+    """
+    Generar los bloques libres de una sala en orden cronológico.
+
+    Recorre día a día la ventana de apertura de la sala y avanza un único
+    puntero sobre los intervalos ocupados (ordenados), por lo que el costo
+    es lineal en días + reservas.
+    """
+    index = 0
+    day = timezone.localtime(range_start).date()
+    last_day = timezone.localtime(range_end).date()
+
+    while day <= last_day:
+        window_start = max(
+            timezone.make_aware(datetime.combine(day, room.opening_time)),
+            range_start,
+        )
+        window_end = min(
+            timezone.make_aware(datetime.combine(day, room.closing_time)),
+            range_end,
+        )
+        day += timedelta(days=1)
+
+        if window_end - window_start < duration:
+            continue
+
+        # Descartar intervalos que terminaron antes de la ventana
+        while index < len(intervals) and intervals[index][1] <= window_start:
+            index += 1
+
+        cursor = _ceil_to_granularity(window_start)
+        scan = index
+        while scan < len(intervals) and intervals[scan][0] < window_end:
+            busy_start, busy_end = intervals[scan]
+            if busy_start - cursor >= duration:
+                yield _slot(room, cursor, duration, busy_start)
+            cursor = max(cursor, _ceil_to_granularity(busy_end))
+            scan += 1
+
+        if window_end - cursor >= duration:
+            yield _slot(room, cursor, duration, window_end)
+
+
+def _slot(room, start, duration, free_until):
+    """Construir la representación de un bloque libre."""
+    return {
+        'room_id': room.id,
+        'room_name': room.name,
+        'room_type': room.room_type,
+        'capacity': room.capacity,
+        'start': start,
+        'end': start + duration,
+        'free_until': free_until,
+    }
+
+
+def find_free_slots(rooms, range_start, range_end, duration, limit=10, now=None):
+    """
+    Buscar los primeros `limit` bloques libres entre varias salas.
+
+    Args:
+        rooms (iterable): Salas elegibles (ya filtradas por permisos)
+        range_start (datetime): Inicio del rango de búsqueda
+        range_end (datetime): Fin del rango de búsqueda
+        duration (timedelta): Duración requerida del bloque
+        limit (int): Número máximo de bloques a retornar
+        now (datetime): No se ofrecen bloques anteriores a este instante
+
+    Returns:
+        list: Bloques libres ordenados por inicio (y sala en caso de empate)
+    """
+    rooms = list(rooms)
+    now = now or timezone.now()
+    range_start = max(range_start, now)
+    if not rooms or range_end - range_start < duration:
+        return []
+
+    busy = load_busy_intervals([room.id for room in rooms], range_start, range_end)
+    generators = [
+        _room_free_slots(room, busy.get(room.id, []), range_start, range_end, duration)
+        for room in rooms
+    ]
+    merged = heapq.merge(*generators, key=lambda slot: (slot['start'], slot['room_id']))
+    return list(islice(merged, limit))
@@ -0,0 +1,226 @@
+"""
+Motor de reservas sin condiciones de carrera.
+
+La verificación de solapamientos y la inserción ocurren en la misma
+transacción, serializada por sala:
+
+- En PostgreSQL (u otros motores con SELECT ... FOR UPDATE) se bloquea la
+  fila de la sala con select_for_update; las reservas de salas distintas
+  siguen en paralelo.
+- En SQLite la transacción de la reserva (y solo esa, ver
+  write_transaction) se abre con BEGIN IMMEDIATE, que toma el bloqueo de
+  escritura al inicio. Si otro proceso lo retiene más allá del timeout, la
+  transacción se reintenta un número acotado de veces.
+
+Detrás queda la garantía de la base de datos (migración
+0007_reservation_no_overlap): un trigger en SQLite o una restricción de
+exclusión en PostgreSQL rechazan cualquier solapamiento que llegue a
+escribirse por otro camino. Si una migración posterior reconstruye la tabla
+rooms_reservation, SQLite descarta los triggers sin avisar;
+ensure_overlap_triggers los vuelve a crear después de cada migrate.
+"""
+
+import logging
+import random
+import time
+from contextlib import contextmanager
+from importlib import import_module
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from core.metrics import BOOKINGS_CREATED
+
+from .availability import BLOCKING_STATUSES
+from .models import Reservation, Room
+
+logger = logging.getLogger(__name__)
+
+BOOKING_MAX_ATTEMPTS = 4
+BOOKING_RETRY_BASE_DELAY = 0.05  # segundos, se duplica en cada intento
+
+# Mensaje del trigger de SQLite / nombre de la restricción en PostgreSQL
+OVERLAP_CONSTRAINT = 'reservation_no_overlap'
+
+# Migración que crea la garantía y triggers que instala en SQLite
+OVERLAP_MIGRATION = ('rooms', '0007_reservation_no_overlap')
+OVERLAP_TRIGGERS = ('reservation_no_overlap_insert', 'reservation_no_overlap_update')
+
+
+class BookingConflict(Exception):
+    """La franja solicitada se solapa con una reserva confirmada o en curso."""
+
+    def __init__(self, conflict=None):
+        self.conflict = conflict
+        super().__init__("La sala ya está reservada en ese horario")
+
+
+def is_lock_error(error):
+    """Indica si un OperationalError se debe a un bloqueo de SQLite."""
+    return 'is locked' in str(error)
+
+
+def is_overlap_error(error):
+    """Indica si un IntegrityError proviene de la garantía de no solapamiento."""
+    return OVERLAP_CONSTRAINT in str(error)
+
+
+def missing_overlap_triggers(using=DEFAULT_DB_ALIAS):
+    """Triggers de no solapamiento ausentes en una base SQLite."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s",
+            [Reservation._meta.db_table],
+        )
+        existing = {name for name, in cursor.fetchall()}
+    return [name for name in OVERLAP_TRIGGERS if name not in existing]
+
+
+def ensure_overlap_triggers(using=DEFAULT_DB_ALIAS):
+    """
+    Volver a crear en SQLite los triggers de no solapamiento que falten.
+
+    Solo actúa si la migración que los instala está aplicada (tras revertirla
+    no deben volver). Las sentencias son las de la propia migración.
+
+    Returns:
+        list: Nombres de los triggers recreados
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    if OVERLAP_MIGRATION not in MigrationRecorder(connection).applied_migrations():
+        return []
+    missing = missing_overlap_triggers(using)
+    if missing:
+        migration = import_module('.'.join((OVERLAP_MIGRATION[0], 'migrations', OVERLAP_MIGRATION[1])))
+        with connection.cursor() as cursor:
+            for statement in migration.SQLITE_FORWARD:
+                cursor.execute(statement)
+        logger.warning("Triggers de no solapamiento ausentes, recreados: %s", ', '.join(missing))
+    return missing
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    Bloque atomic() que en SQLite toma el bloqueo de escritura al inicio.
+
+    Una transacción diferida que lee y luego escribe falla al instante con
+    "database is locked" si otro escritor confirmó entretanto (SQLite no
+    espera el timeout en ese caso). BEGIN IMMEDIATE espera el bloqueo antes
+    de la primera lectura. Se limita a este bloque: el resto de atomic() del
+    proyecto sigue en modo diferido y no serializa a otros escritores.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            yield
+        return
+    # Conectar antes: al abrir la conexión Django restablece transaction_mode
+    connection.ensure_connection()
+    previous = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            connection.transaction_mode = previous
+            yield
+    finally:
+        connection.transaction_mode = previous
+
+
+def lock_room(room_id):
+    """Bloquear la fila de la sala hasta el fin de la transacción actual."""
+    Room.objects.select_for_update().only('id').get(pk=room_id)
+
+
+def lock_rooms(room_ids):
+    """Bloquear varias salas, siempre en el mismo orden para evitar interbloqueos."""
+    list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def run_locked(room_id, operation):
+    """
+    Ejecutar operation() en una transacción que serializa las reservas de una sala.
+
+    Reintenta con espera exponencial si la base de datos está bloqueada por
+    otra escritura. Debe llamarse fuera de un bloque atomic(): dentro de una
+    transacción externa el bloqueo no podría reintentarse.
+
+    Raises:
+        BookingConflict: Si la operación o la base de datos detectan un solapamiento
+        OperationalError: Si la base de datos sigue bloqueada tras los reintentos
+    """
+    return run_locked_rooms([room_id], operation)
+
+
+def run_locked_rooms(room_ids, operation):
+    """Como run_locked, pero bloqueando todas las salas indicadas (p. ej. una importación)."""
+    room_ids = sorted(set(room_ids))
+    for attempt in range(1, BOOKING_MAX_ATTEMPTS + 1):
+        try:
+            with write_transaction():
+                if len(room_ids) == 1:
+                    lock_room(room_ids[0])
+                else:
+                    lock_rooms(room_ids)
+                return operation()
+        except OperationalError as e:
+            if not is_lock_error(e) or attempt == BOOKING_MAX_ATTEMPTS:
+                raise
+            delay = BOOKING_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                "Base de datos bloqueada al reservar las salas %s (intento %s/%s), reintentando en %.2fs",
+                ', '.join(map(str, room_ids)), attempt, BOOKING_MAX_ATTEMPTS, delay,
+            )
+            time.sleep(delay * (1 + random.random()))
+        except IntegrityError as e:
+            if is_overlap_error(e):
+                raise BookingConflict() from e
+            raise
+
+
+def find_overlap(room_id, start_time, end_time, exclude_id=None):
+    """Primera reserva bloqueante de la sala que se solapa con la franja (o None)."""
+    overlapping = Reservation.objects.filter(
+        room_id=room_id,
+        status__in=BLOCKING_STATUSES,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+    if exclude_id is not None:
+        overlapping = overlapping.exclude(pk=exclude_id)
+    return overlapping.order_by('start_time').first()
+
+
+def book_reservation(reservation):
+    """
+    Guardar una reserva verificando solapamientos bajo el bloqueo de su sala.
+
+    Args:
+        reservation (Reservation): Instancia sin guardar (o editada) con sala,
+                                   usuario, horario y estado asignados
+
+    Returns:
+        Reservation: La misma instancia, ya guardada
+
+    Raises:
+        BookingConflict: Si la franja ya está ocupada
+    """
+    creating = reservation.pk is None
+
+    def operation():
+        if reservation.status in BLOCKING_STATUSES:
+            conflict = find_overlap(
+                reservation.room_id, reservation.start_time, reservation.end_time,
+                exclude_id=reservation.pk,
+            )
+            if conflict is not None:
+                raise BookingConflict(conflict)
+        reservation.save()
+        return reservation
+
+    run_locked(reservation.room_id, operation)
+    if creating:
+        BOOKINGS_CREATED.inc(kind='single')
+    return reservation
@@ -0,0 +1,188 @@
+"""
+Soporte de caché para la API de eventos del calendario (FullCalendar).
+
+FullCalendar consulta la API en cada cambio de vista. Para abaratar esas
+llamadas:
+
+- La lista de salas visibles depende solo del rol del usuario, por lo que
+  se calcula una vez por rol y se guarda en caché.
+- Cada consulta calcula una huella barata (máximo updated_at de las
+  reservas del conjunto, de sus salas y de sus usuarios, y cantidad de
+  reservas) que sirve como ETag: si no cambió, la vista responde 304. Así
+  renombrar una sala o cambiar el nombre de un usuario, que aparecen en
+  los títulos, también cambia el ETag.
+- Las filas se obtienen con una proyección `.values()` (sin instanciar
+  Reservation, Room ni User) y se guardan en caché por
+  (rol, rango, sala, huella) con un TTL corto.
+
+La API es una vista asíncrona, por lo que las funciones que consultan la
+base de datos o la caché usan el ORM y la caché asíncronos (prefijo "a").
+"""
+
+from datetime import datetime, time, timedelta
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Room, Reservation
+
+# Las filas cacheadas se indexan por la huella; el TTL solo acota cuánto
+# sobreviven en la caché las de huellas antiguas
+EVENTS_CACHE_TIMEOUT = 60
+
+ROOMS_KEY = 'rooms:calendar_events:rooms:{scope}'
+ROWS_KEY = 'rooms:calendar_events:rows:{digest}'
+
+EVENT_STATUSES = ['confirmed', 'in_progress', 'pending']
+
+EVENT_FIELDS = (
+    'id',
+    'room_id',
+    'room__name',
+    'user_id',
+    'user__username',
+    'user__first_name',
+    'user__last_name',
+    'start_time',
+    'end_time',
+    'status',
+    'purpose',
+    'attendees_count',
+)
+
+STATUS_COLORS = {
+    'confirmed': '#28a745',    # Verde
+    'in_progress': '#dc3545',  # Rojo
+    'pending': '#ffc107',      # Amarillo
+}
+DEFAULT_COLOR = '#6c757d'
+
+
+def viewer_scope(user):
+    """
+    Alcance de visibilidad de salas de un usuario.
+
+    Administradores, personal y superusuarios ven todas las salas activas;
+    el resto depende únicamente de su rol (ver Room.can_be_reserved_by).
+    """
+    if user.is_superuser or user.is_staff or user.is_admin():
+        return 'all'
+    return user.role
+
+
+async def avisible_room_ids(user):
+    """Obtener (desde caché) los IDs de las salas que el usuario puede ver."""
+    scope = viewer_scope(user)
+    key = ROOMS_KEY.format(scope=scope)
+    room_ids = await cache.aget(key)
+    if room_ids is None:
+        rooms = Room.objects.filter(is_active=True)
+        if scope == 'all':
+            room_ids = frozenset([room_id async for room_id in rooms.values_list('id', flat=True)])
+        else:
+            room_ids = frozenset([room.id async for room in rooms if room.can_be_reserved_by(user)])
+        await cache.aset(key, room_ids, EVENTS_CACHE_TIMEOUT)
+    return room_ids
+
+
+def invalidate_visible_rooms():
+    """Descartar las listas de salas por rol (tras crear o editar una sala)."""
+    scopes = ['all'] + [role for role, _ in get_user_model().ROLE_CHOICES]
+    cache.delete_many([ROOMS_KEY.format(scope=scope) for scope in scopes])
+
+
+def events_queryset(room_ids, start_date, end_date, room_id=None, user=None):
+    """
+    Reservas visibles en el calendario para un rango de días locales.
+
+    El rango se expresa sobre start_time (en lugar de start_time__date) para
+    que la consulta pueda usar el índice.
+    """
+    queryset = Reservation.objects.filter(
+        start_time__gte=timezone.make_aware(datetime.combine(start_date, time.min)),
+        start_time__lt=timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)),
+        status__in=EVENT_STATUSES,
+        room_id__in=room_ids,
+    )
+    if room_id is not None:
+        queryset = queryset.filter(room_id=room_id)
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    return queryset
+
+
+async def aevents_fingerprint(queryset):
+    """
+    Huella del conjunto de reservas: máximos updated_at de las reservas y
+    de las salas y usuarios que muestran sus eventos, y cantidad.
+    """
+    summary = await queryset.aaggregate(
+        last_update=Max('updated_at'),
+        room_update=Max('room__updated_at'),
+        user_update=Max('user__updated_at'),
+        total=Count('id'),
+    )
+    stamps = [
+        summary[field].timestamp() if summary[field] else 0
+        for field in ('last_update', 'room_update', 'user_update')
+    ]
+    return ':'.join(map(str, stamps + [summary['total']]))
+
+
+def cache_digest(*parts):
+    """Resumir los componentes de una clave de caché o ETag."""
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+async def aload_event_rows(queryset, digest):
+    """Obtener las filas proyectadas del calendario, usando la caché si es posible."""
+    key = ROWS_KEY.format(digest=digest)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in queryset.order_by('-start_time').values(*EVENT_FIELDS)]
+        await cache.aset(key, rows, EVENTS_CACHE_TIMEOUT)
+    return rows
+
+
+def build_events(rows, viewer):
+    """
+    Convertir las filas proyectadas al formato de eventos de FullCalendar.
+
+    Los campos que dependen de quién consulta (título con el nombre del
+    usuario y can_edit) se calculan aquí, fuera de la caché.
+    """
+    events = []
+    for row in rows:
+        color = STATUS_COLORS.get(row['status'], DEFAULT_COLOR)
+        user_name = (
+            f"{row['user__first_name']} {row['user__last_name']}".strip()
+            or row['user__username']
+        )
+        is_owner = row['user_id'] == viewer.id
+
+        title = row['room__name']
+        if viewer.is_staff or is_owner:
+            title += f" - {user_name}"
+
+        events.append({
+            'id': row['id'],
+            'title': title,
+            'start': row['start_time'].isoformat(),
+            'end': row['end_time'].isoformat(),
+            'backgroundColor': color,
+            'borderColor': color,
+            'textColor': '#ffffff',
+            'extendedProps': {
+                'status': row['status'],
+                'room_id': row['room_id'],
+                'room_name': row['room__name'],
+                'user_name': user_name,
+                'purpose': row['purpose'],
+                'attendees': row['attendees_count'],
+                'can_edit': is_owner or viewer.is_staff,
+            },
+        })
+    return events
@@ -0,0 +1,157 @@
+"""
+Feeds iCalendar suscribibles por sala y por usuario.
+
+Los clientes de calendario consultan los feeds cada pocos minutos. Para que
+esas consultas sean baratas, cada sala y cada usuario tienen una "versión
+de horario" en caché que se incrementa cuando cambia alguna de sus reservas
+(ver rooms/signals.py). La versión determina:
+
+- el ETag y el Last-Modified del feed, de modo que una consulta sin cambios
+  responde 304 sin tocar la tabla de reservas, y
+- la clave de la representación ya generada del feed.
+
+Las versiones viven en la caché por defecto; en despliegues con varios
+procesos debe configurarse una caché compartida para que todos vean los
+mismos incrementos.
+
+Los clientes de calendario no envían la cookie de sesión, por lo que la URL
+del feed incluye un token firmado por usuario. El token depende del hash de
+la contraseña: cambiarla revoca las suscripciones anteriores.
+"""
+
+from datetime import datetime, time, timedelta
+import time as time_module
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .export import iter_ics
+from .models import Reservation
+
+VERSION_KEY = 'rooms:schedule_version:{scope}:{pk}'
+FEED_KEY = 'rooms:feed:{scope}:{pk}:{version}:{day}:{domain}'
+
+# Las representaciones cacheadas se invalidan por versión; este TTL solo
+# limita cuánto tiempo ocupan memoria las versiones antiguas.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Ventana de reservas incluidas en los feeds
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 180
+
+TOKEN_SALT = 'rooms.calendar_feeds.token'
+
+
+def _now_ms():
+    return int(time_module.time() * 1000)
+
+
+def get_schedule_version(scope, pk):
+    """
+    Obtener la versión de horario de una sala ('room') o usuario ('user').
+
+    Si la versión no está en caché (arranque o desalojo) se inicializa con
+    la hora actual en milisegundos, que siempre es mayor que cualquier
+    versión anterior: los clientes reciben un feed nuevo en lugar de uno
+    obsoleto.
+    """
+    key = VERSION_KEY.format(scope=scope, pk=pk)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _now_ms(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_schedule_versions(room_ids=(), user_ids=()):
+    """Incrementar la versión de horario de las salas y usuarios indicados."""
+    keys = [VERSION_KEY.format(scope='room', pk=pk) for pk in set(room_ids)]
+    keys += [VERSION_KEY.format(scope='user', pk=pk) for pk in set(user_ids)]
+    if not keys:
+        return
+
+    now = _now_ms()
+    current = cache.get_many(keys)
+    cache.set_many(
+        {key: max(now, current.get(key, 0) + 1) for key in keys},
+        timeout=None,
+    )
+
+
+def feed_token(user):
+    """Generar el token de suscripción de un usuario."""
+    signature = salted_hmac(TOKEN_SALT, f'{user.pk}:{user.password}').hexdigest()[:32]
+    return f'{user.pk}-{signature}'
+
+
+def user_from_feed_token(token):
+    """
+    Resolver el usuario de un token de suscripción.
+
+    Returns:
+        El usuario activo dueño del token, o None si el token no es válido
+    """
+    pk, _, signature = token.partition('-')
+    if not pk.isdigit() or not signature:
+        return None
+
+    user = get_user_model().objects.filter(pk=int(pk), is_active=True).first()
+    if user is None or not constant_time_compare(feed_token(user), token):
+        return None
+    return user
+
+
+def can_subscribe_to_room(user, room):
+    """Los feeds por sala están disponibles para personal, administradores y profesores."""
+    return user.is_staff or user.is_admin() or user.is_profesor()
+
+
+def feed_window():
+    """Rango de fechas (inicio, fin) incluido en los feeds."""
+    today = timezone.localdate()
+    return (
+        timezone.make_aware(datetime.combine(today - timedelta(days=FEED_PAST_DAYS), time.min)),
+        timezone.make_aware(datetime.combine(today + timedelta(days=FEED_FUTURE_DAYS), time.min)),
+    )
+
+
+def feed_validators(scope, pk):
+    """
+    Calcular el ETag y la fecha de última modificación de un feed.
+
+    Solo consulta la caché. El ETag incluye el día actual porque la ventana
+    del feed se desplaza diariamente aunque no cambien las reservas.
+    """
+    version = get_schedule_version(scope, pk)
+    etag = f'"{scope}-{pk}-{version}-{timezone.localdate():%Y%m%d}"'
+    last_modified = version // 1000
+    return version, etag, last_modified
+
+
+def render_feed(scope, pk, version, calendar_name, domain):
+    """
+    Obtener el contenido del feed, generándolo solo si cambió la versión.
+
+    Returns:
+        str: Documento iCalendar completo
+    """
+    key = FEED_KEY.format(
+        scope=scope,
+        pk=pk,
+        version=version,
+        day=f'{timezone.localdate():%Y%m%d}',
+        domain=domain,
+    )
+    content = cache.get(key)
+    if content is None:
+        window_start, window_end = feed_window()
+        queryset = Reservation.objects.filter(
+            **{f'{scope}_id': pk},
+            start_time__gte=window_start,
+            start_time__lt=window_end,
+        )
+        content = ''.join(iter_ics(queryset, calendar_name=calendar_name, uid_domain=domain))
+        cache.set(key, content, FEED_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,25 @@
+"""
+Procesadores de contexto de la app rooms.
+"""
+
+from django.core.handlers.asgi import ASGIRequest
+
+from core.config import config
+
+
+def live_status(request):
+    """
+    Cómo las páginas reciben el estado en vivo de las salas
+    (templates/rooms/_live_status.html).
+
+    - live_status_streaming: bajo ASGI se abre el flujo SSE; bajo WSGI se
+      consulta room_status_api para no retener un hilo por pestaña.
+    - live_status_poll_ms: intervalo de esas consultas, en milisegundos.
+    """
+    streaming = isinstance(request, ASGIRequest)
+    return {
+        'live_status_streaming': streaming,
+        'live_status_poll_ms': 0 if streaming else int(
+            config.get('live.client_poll_interval').total_seconds() * 1000
+        ),
+    }
@@ -0,0 +1,203 @@
+"""
+Exportación de reservas en CSV e iCalendar (RFC 5545).
+
+Las exportaciones se generan como iteradores sobre una proyección
+`.values()` recorrida con `.iterator(chunk_size=...)`, de modo que exportar
+un año completo usa memoria constante y la respuesta HTTP
+(StreamingHttpResponse) comienza a enviarse de inmediato.
+"""
+
+import csv
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from .models import Reservation
+
+# Filas leídas de la base de datos por bloque
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = (
+    'id',
+    'room__name',
+    'room__location',
+    'user__username',
+    'start_time',
+    'end_time',
+    'status',
+    'purpose',
+    'attendees_count',
+    'created_at',
+    'updated_at',
+)
+
+CSV_HEADER = (
+    'id', 'sala', 'ubicacion', 'usuario', 'inicio', 'fin',
+    'estado', 'proposito', 'asistentes', 'creada',
+)
+
+# Estados de reserva -> STATUS de VEVENT
+ICS_STATUS = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+ICS_PRODID = '-//Proyecto Calidad//Reservas de Salas//ES'
+
+# Caracteres iniciales que Excel y similares interpretan como fórmula
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    """Pseudo-buffer para csv.writer: retorna la línea en lugar de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def filter_reservations(queryset=None, room=None, user=None, date_from=None, date_to=None, status=None):
+    """
+    Aplicar los filtros de exportación.
+
+    Los filtros de fecha se traducen a comparaciones de rango sobre
+    start_time (inicio del día local de date_from hasta el final de date_to)
+    para que la consulta pueda usar el índice de start_time.
+
+    Args:
+        queryset: QuerySet base (por defecto todas las reservas)
+        room: Sala o ID de sala
+        user: Usuario o ID de usuario
+        date_from (date): Primer día incluido
+        date_to (date): Último día incluido
+        status (str): Estado de la reserva
+    """
+    if queryset is None:
+        queryset = Reservation.objects.all()
+    if room:
+        queryset = queryset.filter(room=room)
+    if user:
+        queryset = queryset.filter(user=user)
+    if date_from:
+        queryset = queryset.filter(
+            start_time__gte=timezone.make_aware(datetime.combine(date_from, time.min))
+        )
+    if date_to:
+        queryset = queryset.filter(
+            start_time__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        )
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def csv_text(value):
+    """
+    Neutralizar un texto ingresado por usuarios antes de escribirlo al CSV.
+
+    Un valor que empieza con =, +, -, @, tabulación o retorno de carro se
+    ejecutaría como fórmula al abrir la exportación en una planilla
+    (inyección CSV); se antepone un apóstrofo para que se muestre como texto.
+    """
+    if value and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Recorrer la proyección de exportación en bloques, ordenada por inicio."""
+    return queryset.order_by('start_time', 'id').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Generar la exportación CSV línea por línea.
+
+    Las fechas se expresan en hora local con formato ISO 8601 y los
+    textos ingresados por usuarios pasan por csv_text.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in iter_export_rows(queryset, chunk_size):
+        yield writer.writerow((
+            row['id'],
+            csv_text(row['room__name']),
+            csv_text(row['room__location']),
+            csv_text(row['user__username']),
+            timezone.localtime(row['start_time']).isoformat(),
+            timezone.localtime(row['end_time']).isoformat(),
+            row['status'],
+            csv_text(row['purpose']),
+            row['attendees_count'],
+            timezone.localtime(row['created_at']).isoformat(),
+        ))
+
+
+def _ics_datetime(value):
+    """Formatear un datetime como fecha UTC de iCalendar (AAAAMMDDTHHMMSSZ)."""
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _ics_escape(value):
+    """Escapar texto según RFC 5545 (barra invertida, punto y coma, coma, saltos)."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def _ics_line(content):
+    """Plegar una línea de contenido a 75 octetos y terminarla en CRLF."""
+    encoded = content.encode('utf-8')
+    if len(encoded) <= 75:
+        return content + '\r\n'
+
+    parts = []
+    current = ''
+    limit = 75
+    for char in content:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = char
+            limit = 74  # las líneas de continuación comienzan con un espacio
+        else:
+            current += char
+    parts.append(current)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_event(row, uid_domain='reservas.local'):
+    """Construir el VEVENT de una fila de la proyección de exportación."""
+    summary = f"{row['room__name']}: {row['purpose']}"
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:reserva-{row['id']}@{uid_domain}",
+        f"DTSTAMP:{_ics_datetime(row['updated_at'])}",
+        f"LAST-MODIFIED:{_ics_datetime(row['updated_at'])}",
+        f"DTSTART:{_ics_datetime(row['start_time'])}",
+        f"DTEND:{_ics_datetime(row['end_time'])}",
+        f"SUMMARY:{_ics_escape(summary)}",
+        f"LOCATION:{_ics_escape(row['room__location'])}",
+        f"DESCRIPTION:{_ics_escape('Reservado por ' + row['user__username'])}",
+        f"STATUS:{ICS_STATUS.get(row['status'], 'CONFIRMED')}",
+        'END:VEVENT',
+    ]
+    return ''.join(_ics_line(line) for line in lines)
+
+
+def iter_ics(queryset, calendar_name='Reservas', chunk_size=EXPORT_CHUNK_SIZE, uid_domain='reservas.local'):
+    """Generar un VCALENDAR evento por evento."""
+    yield _ics_line('BEGIN:VCALENDAR')
+    yield _ics_line('VERSION:2.0')
+    yield _ics_line(f'PRODID:{ICS_PRODID}')
+    yield _ics_line('CALSCALE:GREGORIAN')
+    yield _ics_line(f'X-WR-CALNAME:{_ics_escape(calendar_name)}')
+    for row in iter_export_rows(queryset, chunk_size):
+        yield ics_event(row, uid_domain)
+    yield _ics_line('END:VCALENDAR')
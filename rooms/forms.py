@@ -12,6 +12,10 @@ from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Room, Reservation, Review
+from .recurrence import RECURRENCE_CHOICES, MAX_RECURRENCE_DAYS
+
+# Anticipación máxima de una reserva (también acota api_free_slots)
+MAX_ADVANCE_DAYS = 30
 
 
 class MultipleRoleWidget(forms.CheckboxSelectMultiple):
@@ -187,8 +191,38 @@ class ReservationForm(forms.ModelForm):
     
     Incluye validaciones complejas para evitar conflictos
     de horarios y asegurar reservas válidas.
+    
+    Los campos de recurrencia son opcionales: si se indica una frecuencia,
+    los conflictos se evalúan por ocurrencia en la vista (ver
+    rooms/recurrence.py) en lugar de rechazar toda la serie.
     """
     
+    recurrence = forms.ChoiceField(
+        choices=RECURRENCE_CHOICES,
+        required=False,
+        label='Repetir',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    
+    recurrence_until = forms.DateField(
+        required=False,
+        label='Repetir hasta',
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        })
+    )
+    
+    recurrence_exclusions = forms.CharField(
+        required=False,
+        label='Fechas excluidas',
+        help_text='Fechas a omitir en formato AAAA-MM-DD, separadas por comas',
+        widget=forms.TextInput(attrs={
+            'placeholder': 'Ej: 2025-09-18, 2025-09-19',
+            'class': 'form-control'
+        })
+    )
+    
     class Meta:
         model = Reservation
         fields = [
@@ -259,11 +293,11 @@ class ReservationForm(forms.ModelForm):
                     f"Hora actual: {current_time}"
                 )
             
-            # No permitir reservas con más de 30 días de anticipación
-            max_advance = timezone.now() + timedelta(days=30)
+            # No permitir reservas con más de MAX_ADVANCE_DAYS días de anticipación
+            max_advance = timezone.now() + timedelta(days=MAX_ADVANCE_DAYS)
             if start_time > max_advance:
                 raise ValidationError(
-                    "No se pueden hacer reservas con más de 30 días de anticipación"
+                    f"No se pueden hacer reservas con más de {MAX_ADVANCE_DAYS} días de anticipación"
                 )
         
         return start_time
@@ -292,6 +326,22 @@ class ReservationForm(forms.ModelForm):
         
         return end_time
     
+    def clean_recurrence_exclusions(self):
+        """Convertir las fechas excluidas a un conjunto de fechas."""
+        raw_value = self.cleaned_data.get('recurrence_exclusions') or ''
+        exclusions = set()
+        
+        for item in raw_value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                exclusions.add(datetime.strptime(item, '%Y-%m-%d').date())
+            except ValueError:
+                raise ValidationError(f"Fecha excluida inválida: '{item}'. Use el formato AAAA-MM-DD")
+        
+        return exclusions
+    
     def clean_attendees_count(self):
         """Validar número de asistentes."""
         attendees_count = self.cleaned_data.get('attendees_count')
@@ -343,6 +393,8 @@ class ReservationForm(forms.ModelForm):
                 except ImportError:
                     # Si el módulo de seguridad no está disponible, continuar sin validación
                     pass
+                except ValidationError:
+                    raise
                 except Exception as e:
                     # Log del error pero no bloquear la reserva por errores del sistema de seguridad
                     import logging
@@ -380,6 +432,12 @@ class ReservationForm(forms.ModelForm):
                     f"{room.closing_time.strftime('%H:%M')}"
                 )
             
+            # Validar la serie recurrente (los conflictos se reportan por ocurrencia)
+            recurrence = cleaned_data.get('recurrence')
+            if recurrence:
+                self._clean_recurrence(cleaned_data, start_time)
+                return cleaned_data
+            
             # Verificar disponibilidad de la sala
             overlapping_reservations = room.reservations.filter(
                 status__in=['confirmed', 'in_progress'],
@@ -404,6 +462,24 @@ class ReservationForm(forms.ModelForm):
         
         return cleaned_data
     
+    def _clean_recurrence(self, cleaned_data, start_time):
+        """Validar permisos y fecha límite de una serie recurrente."""
+        if self.user and not (self.user.is_staff or self.user.is_admin() or self.user.is_profesor()):
+            raise ValidationError(
+                "Solo profesores y administradores pueden crear reservas recurrentes"
+            )
+        
+        until = cleaned_data.get('recurrence_until')
+        first_day = timezone.localtime(start_time).date()
+        if not until:
+            raise ValidationError("Debe indicar hasta qué fecha se repite la reserva")
+        if until < first_day:
+            raise ValidationError("La fecha de término de la serie debe ser posterior al inicio")
+        if until > first_day + timedelta(days=MAX_RECURRENCE_DAYS):
+            raise ValidationError(
+                f"Una serie recurrente no puede extenderse más de {MAX_RECURRENCE_DAYS} días"
+            )
+    
     def save(self, commit=True):
         """Guardar reserva con usuario asignado."""
         reservation = super().save(commit=False)
@@ -530,6 +606,12 @@ class RoomSearchForm(forms.Form):
         ('auditorio', 'Auditorio'),
     ]
     
+    # Opciones de orden
+    SORT_CHOICES = [
+        ('', 'Nombre'),
+        ('popular', 'Más populares'),
+    ]
+    
     search_query = forms.CharField(
         max_length=100,
         required=False,
@@ -587,6 +669,16 @@ class RoomSearchForm(forms.Form):
         })
     )
 
+    # Orden de los resultados
+    sort_by = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        }),
+        label='Ordenar por'
+    )
+
     def clean(self):
         """Validación de búsqueda por disponibilidad."""
         cleaned_data = super().clean()
@@ -608,3 +700,41 @@ class RoomSearchForm(forms.Form):
                 )
         
         return cleaned_data
+
+
+class TimetableImportForm(forms.Form):
+    """
+    Formulario para importar el horario escolar desde un archivo CSV.
+
+    Columnas esperadas: room, user, start, end, purpose y opcionalmente
+    attendees y notes (ver rooms/timetable_import.py).
+    """
+
+    # Tamaño máximo del archivo (5 MB)
+    MAX_FILE_SIZE = 5 * 1024 * 1024
+
+    csv_file = forms.FileField(
+        label='Archivo CSV',
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,text/csv'
+        }),
+        help_text='Columnas: room, user, start, end, purpose, attendees (opcional)'
+    )
+
+    dry_run = forms.BooleanField(
+        required=False,
+        initial=True,
+        label='Solo validar (no crear reservas)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_csv_file(self):
+        """Validar extensión y tamaño del archivo."""
+        csv_file = self.cleaned_data.get('csv_file')
+        if csv_file:
+            if not csv_file.name.lower().endswith('.csv'):
+                raise ValidationError("El archivo debe tener extensión .csv")
+            if csv_file.size > self.MAX_FILE_SIZE:
+                raise ValidationError("El archivo no puede superar los 5 MB")
+        return csv_file
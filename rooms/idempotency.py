@@ -0,0 +1,174 @@
+"""
+Claves de idempotencia para la creación de reservas.
+
+Con respuestas lentas los usuarios vuelven a enviar el formulario de
+reserva; sin protección, el segundo envío crea un duplicado (o una
+serie recurrente repetida) y además consume los límites de
+SecurityManager.check_rate_limits.
+
+Cada formulario de reserva lleva un token oculto ('idempotency_key')
+generado al mostrarlo; los clientes de la API pueden enviar en su lugar
+la cabecera Idempotency-Key. La primera solicitud con una clave la
+reclama en la caché compartida (cache.add es atómico entre procesos) y,
+al terminar, guarda el resultado: la redirección o la respuesta 201 y el
+ID de la reserva creada. Los reenvíos con la misma clave reciben ese
+resultado sin volver a validar ni escribir. Si el envío original aún se
+está procesando, el reenvío espera brevemente su resultado.
+
+Los formularios inválidos y los errores liberan la clave, de modo que el
+usuario puede corregir los datos y reenviar el mismo formulario.
+"""
+
+from functools import wraps
+import logging
+import re
+import time
+import uuid
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
+from django.shortcuts import redirect
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_FIELD = 'idempotency_key'
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+# El reclamo debe sobrevivir al procesamiento de la solicitud original;
+# si el proceso muere, expira solo y la clave vuelve a estar disponible.
+PENDING_TIMEOUT = 60
+# Espera máxima de un reenvío mientras la solicitud original sigue en curso
+REPLAY_WAIT = 5.0
+REPLAY_POLL_INTERVAL = 0.1
+
+_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,100}$')
+
+_PENDING = 'pending'
+
+
+def new_idempotency_key():
+    """Token nuevo para el campo oculto del formulario de reserva."""
+    return uuid.uuid4().hex
+
+
+def get_idempotency_key(request):
+    """Clave de idempotencia de la solicitud (cabecera o campo oculto), o None si falta o es inválida."""
+    key = request.headers.get(IDEMPOTENCY_HEADER) or request.POST.get(IDEMPOTENCY_FIELD)
+    if key and _KEY_PATTERN.match(key.strip()):
+        return key.strip()
+    return None
+
+
+def _cache_key(request, key):
+    # Por usuario y ruta: la misma clave no puede reutilizar el resultado de otra persona
+    return f'rooms:idempotency:{request.user.pk}:{request.path}:{key}'
+
+
+def remember_reservation(request, reservation_id):
+    """Registrar la reserva creada por la solicitud para guardarla junto a su resultado."""
+    request.idempotent_reservation_id = reservation_id
+
+
+def _outcome_for(request, response):
+    """
+    Resultado reutilizable de la respuesta, o None si el envío puede repetirse.
+
+    Solo se guarda si la vista creó una reserva (remember_reservation): las
+    redirecciones por rol no permitido, límites de SecurityManager o errores
+    no reservaron nada y un reenvío debe procesarse de nuevo.
+    """
+    reservation_id = getattr(request, 'idempotent_reservation_id', None)
+    if reservation_id is None:
+        return None
+    if 300 <= response.status_code < 400 and response.has_header('Location'):
+        return {
+            'status': response.status_code,
+            'location': response['Location'],
+            'reservation_id': reservation_id,
+        }
+    if response.status_code == 201 and not getattr(response, 'streaming', False):
+        return {
+            'status': response.status_code,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'reservation_id': reservation_id,
+        }
+    return None
+
+
+def _replay(request, outcome):
+    """Reconstruir la respuesta original de una solicitud ya procesada."""
+    if 'location' in outcome:
+        messages.info(request, "Esta solicitud de reserva ya había sido procesada.")
+        response = HttpResponseRedirect(outcome['location'], status=outcome['status'])
+    else:
+        response = HttpResponse(outcome['content'], status=outcome['status'],
+                                content_type=outcome['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _wait_for_outcome(cache_key):
+    """Esperar el resultado de la solicitud original que aún está en curso."""
+    deadline = time.monotonic() + REPLAY_WAIT
+    while True:
+        stored = cache.get(cache_key)
+        if stored != _PENDING or time.monotonic() >= deadline:
+            return stored
+        time.sleep(REPLAY_POLL_INTERVAL)
+
+
+def _in_progress_response(request, room_id):
+    message = "Tu solicitud de reserva anterior aún se está procesando. Revisa tus reservas en unos segundos."
+    if request.headers.get('Accept', '').startswith('application/json'):
+        return JsonResponse({'error': True, 'message': message, 'type': 'request_in_progress'}, status=409)
+    messages.info(request, message)
+    return redirect('rooms:room_detail', room_id=room_id)
+
+
+def idempotent_post(view_func):
+    """
+    Decorador: los POST con clave de idempotencia se procesan una sola vez.
+
+    Las solicitudes sin clave (o que no son POST) pasan sin cambios. Debe
+    ir antes que admission_controlled, para que los reenvíos no ocupen
+    cupos de reserva.
+    """
+    @wraps(view_func)
+    def wrapper(request, room_id, *args, **kwargs):
+        key = get_idempotency_key(request) if request.method == 'POST' else None
+        if key is None:
+            return view_func(request, room_id, *args, **kwargs)
+
+        cache_key = _cache_key(request, key)
+        if not cache.add(cache_key, _PENDING, PENDING_TIMEOUT):
+            stored = _wait_for_outcome(cache_key)
+            if isinstance(stored, dict):
+                logger.info(
+                    "Reenvío de reserva respondido desde la clave de idempotencia: usuario %s, reserva %s",
+                    request.user.username, stored.get('reservation_id'),
+                )
+                return _replay(request, stored)
+            if stored == _PENDING:
+                return _in_progress_response(request, room_id)
+            # El reclamo expiró o fue liberado mientras esperábamos: reintentar
+            if not cache.add(cache_key, _PENDING, PENDING_TIMEOUT):
+                return _in_progress_response(request, room_id)
+
+        try:
+            response = view_func(request, room_id, *args, **kwargs)
+        except BaseException:
+            cache.delete(cache_key)
+            raise
+
+        outcome = _outcome_for(request, response)
+        if outcome is None:
+            cache.delete(cache_key)
+        else:
+            ttl = config.get('booking.idempotency_ttl').total_seconds()
+            cache.set(cache_key, outcome, ttl)
+        return response
+    return wrapper
@@ -0,0 +1,397 @@
+"""
+Estado en vivo de las salas: bus de cambios y flujo Server-Sent Events.
+
+room_list, room_detail, dashboard y calendar_view muestran si cada sala
+está disponible u ocupada "ahora". En lugar de recargar la página, el
+navegador abre un EventSource contra room_status_stream (rooms/views.py) y
+actualiza las insignias con los eventos de este módulo
+(templates/rooms/_live_status.html).
+
+Cada proceso tiene un solo RoomStatusBus, compartido por todas las
+conexiones abiertas en él, con un hilo monitor que:
+
+- Guarda el último estado de cada sala activa, calculado con
+  load_availability (rooms/room_cards.py, una consulta para todas las
+  salas), y al recalcular publica solo las salas cuyo estado cambió.
+- Se despierta de inmediato cuando se confirma en la base una reserva
+  creada, cancelada o modificada en este proceso (rooms/signals.py).
+- Cada 'live.poll_interval' compara las versiones de horario de la caché
+  compartida (rooms/calendar_feeds.py) para detectar reservas hechas en
+  otros procesos o con bulk_create.
+- Recalcula en cada cambio de minuto, cuando comienzan y terminan las
+  reservas y cambian mensajes como "Disponible por N minutos".
+
+El hilo arranca con la primera suscripción del proceso y termina cuando
+no quedan suscripciones.
+
+El flujo solo se usa bajo ASGI, donde una conexión en espera no ocupa un
+hilo. Bajo WSGI (gunicorn con workers síncronos) cada conexión retendría
+un hilo del servidor, así que las páginas consultan en su lugar la API
+room_status_api cada 'live.client_poll_interval'; si algún cliente abre
+igualmente el flujo, se admiten a lo más 'live.wsgi_max_streams'
+conexiones por proceso y el resto recibe 503. Motivos de los eventos: booking_created,
+booking_cancelled (reserva cancelada o eliminada), started, ended y
+changed (cualquier otro cambio).
+"""
+
+from collections import deque
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from core.config import config
+
+from .calendar_feeds import VERSION_KEY
+from .models import Room
+from .room_cards import load_availability
+
+logger = logging.getLogger(__name__)
+
+BOOKING_CREATED = 'booking_created'
+BOOKING_CANCELLED = 'booking_cancelled'
+STARTED = 'started'
+ENDED = 'ended'
+CHANGED = 'changed'
+
+# Eventos pendientes por conexión; si un cliente lento los acumula se
+# descartan y recibe una instantánea completa
+MAX_PENDING_EVENTS = 256
+
+# Espera sugerida al navegador antes de reconectar (campo retry: de SSE)
+RETRY_MS = 3000
+
+
+def sse_message(event, data, event_id=None):
+    """Mensaje SSE con el evento y sus datos en JSON."""
+    lines = [] if event_id is None else [f'id: {event_id}']
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def active_room_statuses(now=None):
+    """Estado actual de las salas activas, calculado con una consulta: {id: estado}."""
+    rooms = list(Room.objects.filter(is_active=True).only('id', 'opening_time', 'closing_time'))
+    return load_availability(rooms, now or timezone.now())
+
+
+def transition_reason(previous, current):
+    """Motivo de un cambio de estado que no proviene de una reserva de este proceso."""
+    was_occupied = previous is not None and previous['status'] == 'occupied'
+    if current['status'] == 'occupied' and not was_occupied:
+        return STARTED
+    if was_occupied and current['status'] != 'occupied':
+        return ENDED
+    return CHANGED
+
+
+class Subscription:
+    """Cola acotada de eventos de una conexión, consumible desde hilos o corrutinas."""
+
+    def __init__(self, max_pending=MAX_PENDING_EVENTS):
+        self.max_pending = max_pending
+        self._events = deque()
+        self._overflowed = False
+        self._condition = threading.Condition()
+        self._waker = None
+
+    def put(self, event):
+        with self._condition:
+            if len(self._events) >= self.max_pending:
+                self._events.clear()
+                self._overflowed = True
+            else:
+                self._events.append(event)
+            self._condition.notify_all()
+            waker = self._waker
+        if waker is not None:
+            loop, ready = waker
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # El bucle de la conexión ya se cerró
+                pass
+
+    def drain(self):
+        """(eventos pendientes, si se descartaron eventos por desborde)."""
+        with self._condition:
+            events = list(self._events)
+            self._events.clear()
+            overflowed, self._overflowed = self._overflowed, False
+        return events, overflowed
+
+    def wait(self, timeout):
+        """Esperar eventos hasta timeout segundos (bloquea el hilo)."""
+        with self._condition:
+            if not self._events and not self._overflowed:
+                self._condition.wait(timeout)
+        return self.drain()
+
+    async def await_events(self, timeout):
+        """Esperar eventos hasta timeout segundos sin bloquear el bucle de eventos."""
+        ready = asyncio.Event()
+        with self._condition:
+            if self._events or self._overflowed:
+                ready.set()
+            else:
+                self._waker = (asyncio.get_running_loop(), ready)
+        try:
+            await asyncio.wait_for(ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._waker = None
+        return self.drain()
+
+
+class RoomStatusBus:
+    """Estado actual de las salas activas y difusión de sus cambios a las suscripciones."""
+
+    def __init__(self, monitor=True):
+        self.monitor = monitor
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._subscribers = set()
+        self._statuses = {}
+        self._hints = {}
+        self._versions = {}
+        self._minute = None
+        self._sequence = 0
+
+    # Suscripciones
+
+    def subscribe(self):
+        """
+        Registrar una conexión. Consulta la base de datos si el monitor no
+        está en marcha (el estado guardado puede estar desactualizado).
+        """
+        with self._lock:
+            stale = self._thread is None
+        if stale:
+            self.refresh()
+        subscription = Subscription()
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self.monitor and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='room-status-monitor', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            idle = not self._subscribers
+        if idle:
+            # El monitor termina en cuanto ve que no quedan suscripciones
+            self._wake.set()
+
+    def snapshot(self):
+        """Estado de todas las salas: {'id': secuencia, 'rooms': {id: estado}}."""
+        with self._lock:
+            return {
+                'id': self._sequence,
+                'rooms': {str(room_id): dict(status) for room_id, status in self._statuses.items()},
+            }
+
+    # Cambios
+
+    def notify(self, room_id, reason):
+        """Marcar una sala como modificada por una reserva de este proceso."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._hints[room_id] = reason
+        self._wake.set()
+
+    def refresh(self, hints=None):
+        """
+        Recalcular el estado de las salas activas y publicar los cambios.
+
+        Returns:
+            list: eventos publicados
+        """
+        hints = hints or {}
+        with self._refresh_lock:
+            now = timezone.now()
+            statuses = active_room_statuses(now)
+            with self._lock:
+                previous, self._statuses = self._statuses, statuses
+                self._minute = int(now.timestamp() // 60)
+                changes = []
+                for room_id, status in statuses.items():
+                    before = previous.get(room_id)
+                    if before == status:
+                        continue
+                    self._sequence += 1
+                    changes.append({
+                        'id': self._sequence,
+                        'room_id': room_id,
+                        'previous': before['status'] if before else None,
+                        'reason': hints.get(room_id) or transition_reason(before, status),
+                        **status,
+                    })
+                subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            for change in changes:
+                subscription.put(change)
+        return changes
+
+    def poll_versions(self):
+        """Salas cuya versión de horario cambió desde la última consulta a la caché."""
+        with self._lock:
+            room_ids = list(self._statuses)
+        keys = {VERSION_KEY.format(scope='room', pk=pk): pk for pk in room_ids}
+        versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+        changed = {pk for pk, version in versions.items() if self._versions.get(pk, version) != version}
+        self._versions = versions
+        return changed
+
+    def _run(self):
+        try:
+            while True:
+                poll = config.get('live.poll_interval').total_seconds()
+                until_next_minute = 60 - time.time() % 60
+                self._wake.wait(min(poll, until_next_minute + 0.05))
+                self._wake.clear()
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                    hints, self._hints = self._hints, {}
+                try:
+                    close_old_connections()
+                    changed = self.poll_versions()
+                    new_minute = int(time.time() // 60) != self._minute
+                    if hints or changed or new_minute:
+                        self.refresh(hints)
+                except Exception as e:
+                    # El monitor sigue en marcha: el próximo ciclo lo reintenta
+                    logger.warning("No se pudo actualizar el estado en vivo de las salas: %s", e)
+        finally:
+            connections.close_all()
+
+
+room_status_bus = RoomStatusBus()
+
+
+def notify_room_change(room_id, reason):
+    """Avisar al bus del cambio de una sala cuando la transacción actual se confirme."""
+    transaction.on_commit(lambda: room_status_bus.notify(room_id, reason))
+
+
+def _render(bus, events, overflowed):
+    if overflowed:
+        yield sse_message('snapshot', bus.snapshot())
+        return
+    for event in events:
+        yield sse_message('status', event, event_id=event['id'])
+
+
+def iter_stream(bus, max_age):
+    """Flujo SSE síncrono (WSGI): cada conexión ocupa un hilo del servidor hasta max_age."""
+    subscription = bus.subscribe()
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        yield sse_message('snapshot', bus.snapshot())
+        heartbeat = config.get('live.heartbeat_interval').total_seconds()
+        deadline = time.monotonic() + max_age
+        while (remaining := deadline - time.monotonic()) > 0:
+            events, overflowed = subscription.wait(min(heartbeat, remaining))
+            if not events and not overflowed:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ': ping\n\n'
+            yield from _render(bus, events, overflowed)
+    finally:
+        bus.unsubscribe(subscription)
+
+
+class StreamSlots:
+    """Cupo de conexiones SSE síncronas abiertas en este proceso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+
+    def acquire(self, limit):
+        with self._lock:
+            if self.open >= limit:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+wsgi_stream_slots = StreamSlots()
+
+
+class SyncEventStream:
+    """
+    Flujo SSE síncrono que ocupa un cupo de wsgi_stream_slots.
+
+    El cupo se libera en close(), que StreamingHttpResponse llama al
+    terminar la respuesta aunque el flujo nunca haya empezado a leerse.
+    """
+
+    def __init__(self, bus, max_age, slots=wsgi_stream_slots):
+        self.slots = slots
+        self.stream = iter_stream(bus, max_age)
+        self.closed = False
+
+    def __iter__(self):
+        return self.stream
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.stream.close()
+            self.slots.release()
+
+
+class AsyncEventStream:
+    """
+    Flujo SSE asíncrono (ASGI): las conexiones en espera no ocupan hilos.
+
+    Es un objeto con close() (y no un generador asíncrono) para que
+    StreamingHttpResponse lo cierre al terminar la respuesta; si el cliente
+    se desconecta, Django cancela la espera y también se cierra.
+    """
+
+    def __init__(self, bus, max_age):
+        self.bus = bus
+        self.max_age = max_age
+        self.subscription = None
+
+    async def __aiter__(self):
+        from asgiref.sync import sync_to_async
+
+        self.subscription = await sync_to_async(self.bus.subscribe)()
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            yield sse_message('snapshot', self.bus.snapshot())
+            heartbeat = config.get('live.heartbeat_interval').total_seconds()
+            deadline = time.monotonic() + self.max_age
+            while (remaining := deadline - time.monotonic()) > 0:
+                events, overflowed = await self.subscription.await_events(min(heartbeat, remaining))
+                if not events and not overflowed:
+                    yield ': ping\n\n'
+                for message in _render(self.bus, events, overflowed):
+                    yield message
+        finally:
+            self.close()
+
+    def close(self):
+        if self.subscription is not None:
+            self.bus.unsubscribe(self.subscription)
+            self.subscription = None
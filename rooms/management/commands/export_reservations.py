@@ -0,0 +1,72 @@
+"""
+Comando para exportar reservas en CSV o iCalendar.
+
+Uso:
+    python manage.py export_reservations --format csv --output reservas.csv
+    python manage.py export_reservations --format ics --room 3 --from 2025-03-01 --to 2025-07-31
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms.export import EXPORT_CHUNK_SIZE, filter_reservations, iter_csv, iter_ics
+from rooms.models import Reservation
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida '{value}' (use AAAA-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = 'Exporta reservas en CSV o iCalendar usando memoria constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'ics'], default='csv', help='Formato de salida')
+        parser.add_argument('--output', help='Archivo de salida (por defecto, salida estándar)')
+        parser.add_argument('--room', type=int, help='ID de la sala')
+        parser.add_argument('--user', help='Nombre de usuario')
+        parser.add_argument('--from', dest='date_from', help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Último día (AAAA-MM-DD)')
+        parser.add_argument(
+            '--status',
+            choices=[choice for choice, _ in Reservation.STATUS_CHOICES],
+            help='Estado de la reserva',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Filas leídas por bloque (default: {EXPORT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Reservation.objects.all()
+        if options['user']:
+            queryset = queryset.filter(user__username=options['user'])
+        queryset = filter_reservations(
+            queryset,
+            room=options['room'],
+            date_from=_parse_date(options['date_from']) if options['date_from'] else None,
+            date_to=_parse_date(options['date_to']) if options['date_to'] else None,
+            status=options['status'],
+        )
+
+        if options['format'] == 'ics':
+            chunks = iter_ics(queryset, chunk_size=options['chunk_size'])
+        else:
+            chunks = iter_csv(queryset, chunk_size=options['chunk_size'])
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(chunks)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Exportación {options['format'].upper()} guardada en {options['output']}")
+        )
@@ -0,0 +1,89 @@
+"""
+Comando para importar el horario escolar desde un archivo CSV.
+
+Uso:
+    python manage.py import_timetable horario.csv --dry-run
+    python manage.py import_timetable horario.csv --rejected-report rechazadas.csv
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from rooms.booking import BookingConflict, is_lock_error
+from rooms.timetable_import import (
+    DEFAULT_CHUNK_SIZE,
+    TimetableImportError,
+    import_timetable,
+    rejected_rows_csv,
+)
+
+
+class Command(BaseCommand):
+    help = 'Importa reservas masivas (horario escolar) desde un CSV, validando en lote'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Ruta del archivo CSV a importar')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo validar, sin crear reservas',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Filas por sentencia INSERT (default: {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--rejected-report',
+            help='Ruta donde guardar las filas rechazadas (CSV)',
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Codificación del archivo (default: utf-8-sig)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que 0')
+
+        self.stdout.write(f"📥 Importando horario desde {options['csv_path']}...")
+
+        try:
+            with open(options['csv_path'], newline='', encoding=options['encoding']) as stream:
+                result = import_timetable(
+                    stream,
+                    dry_run=options['dry_run'],
+                    chunk_size=options['chunk_size'],
+                )
+        except OSError as e:
+            raise CommandError(f"No se pudo leer el archivo: {e}")
+        except (TimetableImportError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+        except BookingConflict:
+            raise CommandError('Otra reserva ocupó una franja durante la importación; no se guardó ninguna fila')
+        except OperationalError as e:
+            if not is_lock_error(e):
+                raise
+            raise CommandError('La base de datos está ocupada; no se guardó ninguna fila, intente de nuevo')
+
+        rejected = result['rejected']
+        self.stdout.write(f"📄 Filas procesadas: {result['total']}")
+        self.stdout.write(f"✔️  Filas válidas: {result['valid']}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING("🧪 Simulación: no se creó ninguna reserva"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Reservas creadas: {result['created']}"))
+
+        if rejected:
+            self.stdout.write(self.style.ERROR(f"❌ Filas rechazadas: {len(rejected)}"))
+            for row in rejected[:10]:
+                self.stdout.write(f"   Línea {row['line']}: {row['reason']}")
+            if len(rejected) > 10:
+                self.stdout.write(f"   ... y {len(rejected) - 10} más")
+
+            if options['rejected_report']:
+                with open(options['rejected_report'], 'w', newline='', encoding='utf-8') as report:
+                    rejected_rows_csv(rejected, report)
+                self.stdout.write(f"📝 Reporte de rechazos guardado en {options['rejected_report']}")
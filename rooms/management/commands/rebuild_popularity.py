@@ -0,0 +1,38 @@
+"""
+Comando para recalcular el ranking de popularidad de las salas.
+
+Las reservas actualizan el puntaje de forma incremental; este comando
+reconstruye todos los puntajes desde el historial (por ejemplo, tras
+cambiar ROOM_POPULARITY_HALF_LIFE_DAYS o cargar datos masivos).
+"""
+
+from django.core.management.base import BaseCommand
+
+from rooms.models import Room
+from rooms.popularity import current_score, get_half_life_days, rebuild_scores, top_rooms
+
+
+class Command(BaseCommand):
+    help = 'Recalcula en lote el ranking de popularidad (con decaimiento temporal) de las salas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Cantidad de salas a mostrar en el ranking (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"📈 Recalculando popularidad (vida media: {get_half_life_days()} días)..."
+        )
+
+        updated = rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(f"✅ Puntajes recalculados para {updated} salas"))
+
+        ranking = top_rooms(Room.objects.filter(is_active=True), limit=options['top'])
+        if ranking:
+            self.stdout.write("\n🏆 RANKING DE POPULARIDAD:")
+            for position, room in enumerate(ranking, start=1):
+                self.stdout.write(f"   {position}. {room.name}: {current_score(room)}")
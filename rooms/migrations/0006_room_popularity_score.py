@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:43
+
+from collections import defaultdict
+from datetime import datetime, timezone
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Copias congeladas de rooms/popularity.py al momento de esta migración
+COUNTED_STATUSES = ['pending', 'confirmed', 'in_progress', 'completed']
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def booking_weight(when):
+    decay_rate = math.log(2) / (getattr(settings, 'ROOM_POPULARITY_HALF_LIFE_DAYS', 14) * 86400)
+    return math.exp(decay_rate * (when - POPULARITY_EPOCH).total_seconds())
+
+
+def backfill_popularity(apps, schema_editor):
+    """Calcular el puntaje inicial de popularidad a partir del historial."""
+    Room = apps.get_model('rooms', 'Room')
+    Reservation = apps.get_model('rooms', 'Reservation')
+
+    scores = defaultdict(float)
+    history = Reservation.objects.filter(
+        status__in=COUNTED_STATUSES
+    ).values_list('room_id', 'created_at').order_by()
+    for room_id, created_at in history.iterator(chunk_size=5000):
+        scores[room_id] += booking_weight(created_at)
+
+    for room_id, score in scores.items():
+        Room.objects.filter(pk=room_id).update(popularity_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0005_alter_room_room_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='popularity_score',
+            field=models.FloatField(db_index=True, default=0, help_text='Puntaje de popularidad con decaimiento temporal (normalizado)'),
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+    ]
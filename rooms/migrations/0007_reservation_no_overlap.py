@@ -0,0 +1,92 @@
+"""
+Garantía en la base de datos de que dos reservas bloqueantes (confirmadas o
+en curso) de la misma sala no se solapan.
+
+- SQLite: triggers BEFORE INSERT / BEFORE UPDATE que abortan con el
+  mensaje 'reservation_no_overlap'. Solo revisan las filas cuyo horario,
+  sala o estado bloqueante cambian, por lo que los solapamientos
+  históricos no impiden actualizar otras columnas.
+- PostgreSQL: restricción de exclusión con btree_gist. La tabla no debe
+  contener solapamientos previos para poder crearla.
+"""
+
+from django.db import migrations
+
+BLOCKING = "('confirmed', 'in_progress')"
+
+OVERLAP_EXISTS = f"""
+    EXISTS (
+        SELECT 1 FROM rooms_reservation AS other
+        WHERE other.room_id = NEW.room_id
+          AND other.id IS NOT NEW.id
+          AND other.status IN {BLOCKING}
+          AND other.start_time < NEW.end_time
+          AND other.end_time > NEW.start_time
+    )
+"""
+
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_insert
+    BEFORE INSERT ON rooms_reservation
+    WHEN NEW.status IN {BLOCKING} AND {OVERLAP_EXISTS}
+    BEGIN
+        SELECT RAISE(ABORT, 'reservation_no_overlap');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_update
+    BEFORE UPDATE OF room_id, start_time, end_time, status ON rooms_reservation
+    WHEN NEW.status IN {BLOCKING}
+     AND (
+        OLD.status NOT IN {BLOCKING}
+        OR NEW.room_id != OLD.room_id
+        OR NEW.start_time != OLD.start_time
+        OR NEW.end_time != OLD.end_time
+     )
+     AND {OVERLAP_EXISTS}
+    BEGIN
+        SELECT RAISE(ABORT, 'reservation_no_overlap');
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS reservation_no_overlap_insert",
+    "DROP TRIGGER IF EXISTS reservation_no_overlap_update",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    f"""
+    ALTER TABLE rooms_reservation
+    ADD CONSTRAINT reservation_no_overlap
+    EXCLUDE USING gist (room_id WITH =, tstzrange(start_time, end_time) WITH &&)
+    WHERE (status IN {BLOCKING})
+    """,
+]
+
+POSTGRESQL_BACKWARD = [
+    "ALTER TABLE rooms_reservation DROP CONSTRAINT IF EXISTS reservation_no_overlap",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0006_room_popularity_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
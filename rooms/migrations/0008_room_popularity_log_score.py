@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Copias congeladas de rooms/popularity.py al momento de esta migración
+COUNTED_STATUSES = ['pending', 'confirmed', 'in_progress', 'completed']
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def rebuild_log_scores(apps, schema_editor):
+    """
+    Recalcular los puntajes en escala logarítmica desde el historial.
+
+    No se convierten los valores anteriores: con una vida media corta
+    pueden haber desbordado.
+    """
+    Room = apps.get_model('rooms', 'Room')
+    Reservation = apps.get_model('rooms', 'Reservation')
+
+    decay_rate = math.log(2) / (getattr(settings, 'ROOM_POPULARITY_HALF_LIFE_DAYS', 14) * 86400)
+    scores = {}
+    history = Reservation.objects.filter(
+        status__in=COUNTED_STATUSES
+    ).values_list('room_id', 'created_at').order_by()
+    for room_id, created_at in history.iterator(chunk_size=5000):
+        x = decay_rate * (created_at - POPULARITY_EPOCH).total_seconds()
+        top, total = scores.get(room_id, (x, 0.0))
+        if x > top:
+            total *= math.exp(top - x)
+            top = x
+        scores[room_id] = (top, total + math.exp(x - top))
+
+    Room.objects.update(popularity_score=None)
+    for room_id, (top, total) in scores.items():
+        Room.objects.filter(pk=room_id).update(popularity_score=top + math.log(total))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms', '0007_reservation_no_overlap'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='room',
+            name='popularity_score',
+            field=models.FloatField(blank=True, db_index=True, help_text='Logaritmo del puntaje de popularidad con decaimiento temporal (normalizado)', null=True),
+        ),
+        migrations.RunPython(rebuild_log_scores, migrations.RunPython.noop),
+    ]
@@ -16,7 +16,8 @@ from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import datetime, time, timedelta
 import logging
-import pytz
+
+from core.config import config
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -108,7 +109,15 @@ class Room(models.Model):
         default='admin,profesor,estudiante',
         help_text="Roles permitidos para reservar esta sala (separados por comas)"
     )
-    
+
+    # Ranking de popularidad precalculado (ver rooms/popularity.py)
+    popularity_score = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Logaritmo del puntaje de popularidad con decaimiento temporal (normalizado)"
+    )
+
     # Metadatos
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -162,7 +171,7 @@ class Room(models.Model):
         now_utc = timezone.now()
         
         # Convertir a hora de Chile
-        chile_tz = pytz.timezone('America/Santiago')
+        chile_tz = config.get('site.timezone')
         now_chile = now_utc.astimezone(chile_tz)
         
         # Verificar si está dentro del horario de operación usando hora de Chile
@@ -189,22 +198,32 @@ class Room(models.Model):
         Returns:
             bool: True si está disponible
         """
-        if not self.is_active:
-            return False
-        
-        # Verificar horarios de operación
-        if (start_time.time() < self.opening_time or 
-            end_time.time() > self.closing_time):
+        if not self._within_operating_hours(start_time, end_time):
             return False
         
         # Verificar conflictos con reservas existentes
-        overlapping_reservations = self.reservations.filter(
+        return not self.overlapping_reservations(start_time, end_time).exists()
+    
+    async def ais_available_at(self, start_time, end_time):
+        """Versión asíncrona de is_available_at (para vistas ASGI)."""
+        if not self._within_operating_hours(start_time, end_time):
+            return False
+        return not await self.overlapping_reservations(start_time, end_time).aexists()
+    
+    def _within_operating_hours(self, start_time, end_time):
+        """La sala está activa y el horario cae dentro de su apertura."""
+        if not self.is_active:
+            return False
+        return not (start_time.time() < self.opening_time or
+                    end_time.time() > self.closing_time)
+    
+    def overlapping_reservations(self, start_time, end_time):
+        """Reservas confirmadas o en curso que se solapan con el horario."""
+        return self.reservations.filter(
             status__in=['confirmed', 'in_progress'],
             start_time__lt=end_time,
             end_time__gt=start_time
         )
-        
-        return not overlapping_reservations.exists()
     
     def get_detailed_availability_status(self):
         """
@@ -242,7 +261,7 @@ class Room(models.Model):
                 next_reservation = next_reservations.first()
                 gap_duration = next_reservation.start_time - current_reservation.end_time
                 # Si hay menos de 15 minutos entre reservas, considerarlo como ocupado continuo
-                if gap_duration.total_seconds() < 900:  # 15 minutos
+                if gap_duration < config.get('availability.continuous_gap'):
                     message = f"Ocupada hasta las {next_reservation.end_time.strftime('%H:%M')}"
                 else:
                     message = f"Ocupada hasta las {current_reservation.end_time.strftime('%H:%M')}, luego disponible"
@@ -350,7 +369,7 @@ class Room(models.Model):
     def is_open_now(self):
         """Verifica si la sala está abierta en este momento."""
         now = timezone.now()
-        chile_tz = pytz.timezone('America/Santiago')
+        chile_tz = config.get('site.timezone')
         now_chile = now.astimezone(chile_tz)
         current_time = now_chile.time()
         return self.opening_time <= current_time <= self.closing_time
@@ -493,6 +512,15 @@ class Reservation(models.Model):
         verbose_name_plural = "Reservas"
         ordering = ['-start_time']
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Recordar la sala y el estado cargados (ver rooms/popularity.py)."""
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'room_id' in loaded and 'status' in loaded:
+            instance._loaded_popularity = (loaded['room_id'], loaded['status'])
+        return instance
+    
     def __str__(self):
         """Representación string de la reserva."""
         return f"{self.room.name} - {self.user.username} ({self.start_time.strftime('%d/%m/%Y %H:%M')})"
@@ -518,9 +546,9 @@ class Reservation(models.Model):
             return False
         
         now = timezone.now()
-        # Permitir cancelación hasta 30 minutos antes del inicio
+        # Permitir cancelación hasta 30 minutos antes del inicio (configurable)
         time_before_start = self.start_time - now
-        return time_before_start.total_seconds() > 1800  # 30 minutos
+        return time_before_start > config.get('reservations.cancel_window')
     
     def get_status_color(self):
         """Retorna la clase de color Bootstrap para el estado de la reserva."""
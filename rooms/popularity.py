@@ -0,0 +1,237 @@
+"""
+Ranking de popularidad de salas con decaimiento temporal.
+
+Cada reserva aporta un peso que decae exponencialmente con el tiempo
+(vida media configurable con ROOM_POPULARITY_HALF_LIFE_DAYS). Para poder
+ordenar por una columna indexada sin recalcular el historial, el puntaje
+se normaliza a una época fija: una reserva hecha en el instante t aporta
+exp(λ·(t - época)). Así todas las salas comparten la misma escala y el
+orden relativo es idéntico al de los puntajes decaídos al momento actual.
+
+Ese factor crece sin límite (con una vida media de 1 día supera el máximo
+de un float en menos de 3 años), por lo que la columna guarda su
+logaritmo: popularity_score = ln(Σ exp(λ·(t_i - época))), o NULL si la
+sala no tiene reservas que cuenten. Sumar o restar una reserva es un
+"log-sum-exp" que se calcula en la base de datos sin salir de rangos
+representables.
+
+- track_reservation(): actualización incremental desde las señales de
+  Reservation (creación, cambio de estado o de sala, eliminación).
+- record_bookings(): lotes insertados con bulk_create, que no disparan señales.
+- rebuild_scores(): recálculo completo en lote (comando rebuild_popularity).
+- top_rooms(): lectura del top-k usando el índice de popularity_score.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+import logging
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Época de referencia para normalizar los puntajes (en escala logarítmica
+# no hay que re-normalizar al pasar el tiempo)
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+DEFAULT_HALF_LIFE_DAYS = 14
+
+# Estados de reserva que cuentan para la popularidad
+COUNTED_STATUSES = ['pending', 'confirmed', 'in_progress', 'completed']
+
+# Al restar, diferencias menores se consideran la última reserva de la sala
+_REMOVE_TOLERANCE = 1e-9
+
+
+def get_half_life_days():
+    """Retorna la vida media configurada (en días) del puntaje de popularidad."""
+    return getattr(settings, 'ROOM_POPULARITY_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS)
+
+
+def booking_log_weight(when=None):
+    """
+    Calcula el logaritmo del peso normalizado de una reserva realizada en `when`.
+
+    Args:
+        when (datetime): Instante de la reserva (por defecto, ahora)
+
+    Returns:
+        float: λ·(when - época)
+    """
+    when = when or timezone.now()
+    decay_rate = math.log(2) / (get_half_life_days() * 86400)
+    return decay_rate * (when - POPULARITY_EPOCH).total_seconds()
+
+
+def log_sum(log_weights):
+    """ln(Σ exp(x)) sin desbordes, o None si no hay pesos."""
+    log_weights = list(log_weights)
+    if not log_weights:
+        return None
+    top = max(log_weights)
+    return top + math.log(sum(math.exp(x - top) for x in log_weights))
+
+
+def _added(log_weight):
+    """Expresión de popularity_score tras sumar exp(log_weight)."""
+    score = F('popularity_score')
+    return Case(
+        When(popularity_score__isnull=True, then=Value(log_weight)),
+        default=Greatest(score, Value(log_weight)) + Ln(1 + Exp(-Abs(score - Value(log_weight)))),
+        output_field=FloatField(),
+    )
+
+
+def _removed(log_weight):
+    """Expresión de popularity_score tras restar exp(log_weight) (NULL si no queda nada)."""
+    score = F('popularity_score')
+    return Case(
+        When(
+            popularity_score__gt=log_weight + _REMOVE_TOLERANCE,
+            then=score + Ln(1 - Exp(Value(log_weight) - score)),
+        ),
+        default=Value(None),
+        output_field=FloatField(),
+    )
+
+
+def record_booking(room_id, when=None, weight=1):
+    """
+    Actualiza incrementalmente el puntaje de una sala.
+
+    Usa una expresión en la base de datos para que la actualización sea
+    atómica y no dependa del valor cargado en memoria.
+
+    Args:
+        room_id (int): ID de la sala
+        when (datetime): Instante de la reserva (por defecto, ahora)
+        weight (int): 1 al sumar una reserva, -1 al retirarla
+    """
+    from .models import Room
+
+    log_weight = booking_log_weight(when)
+    expression = _added(log_weight) if weight > 0 else _removed(log_weight)
+    Room.objects.filter(pk=room_id).update(popularity_score=expression)
+
+
+def _popularity_key(room_id, status):
+    """Sala a la que aporta una reserva con ese estado (o None si no cuenta)."""
+    return room_id if status in COUNTED_STATUSES else None
+
+
+def track_reservation(reservation, created=False, deleted=False):
+    """
+    Ajustar los puntajes según el cambio de una reserva (ver rooms/signals.py).
+
+    Compara la sala y el estado con los cargados desde la base de datos
+    (Reservation.from_db), de modo que las cancelaciones hechas desde el
+    admin, los cambios de estado y las eliminaciones también descuentan.
+    """
+    loaded = getattr(reservation, '_loaded_popularity', None)
+    current = (reservation.room_id, reservation.status)
+    # Sin estado cargado (instancia creada a mano) se asume que no cambió
+    before = None if created else _popularity_key(*(loaded or current))
+    after = None if deleted else _popularity_key(*current)
+    if before != after:
+        if before is not None:
+            record_booking(before, reservation.created_at, weight=-1)
+        if after is not None:
+            record_booking(after, reservation.created_at)
+    reservation._loaded_popularity = current
+
+
+def record_bookings(bookings):
+    """
+    Actualiza los puntajes para un lote de reservas.
+
+    Agrupa los pesos por sala para emitir un único UPDATE por sala,
+    independiente del número de reservas del lote.
+
+    Args:
+        bookings (iterable): Pares (room_id, when)
+    """
+    from .models import Room
+
+    log_weights = defaultdict(list)
+    for room_id, when in bookings:
+        log_weights[room_id].append(booking_log_weight(when))
+
+    with transaction.atomic():
+        for room_id, weights in log_weights.items():
+            Room.objects.filter(pk=room_id).update(popularity_score=_added(log_sum(weights)))
+
+
+def current_score(room, now=None):
+    """
+    Retorna el puntaje decaído de una sala expresado en "reservas equivalentes".
+
+    Args:
+        room (Room): Sala a consultar
+        now (datetime): Instante de referencia (por defecto, ahora)
+
+    Returns:
+        float: Puntaje de popularidad al instante `now`
+    """
+    if room.popularity_score is None:
+        return 0.0
+    return round(math.exp(room.popularity_score - booking_log_weight(now)), 2)
+
+
+def top_rooms(queryset=None, limit=5):
+    """
+    Retorna las `limit` salas más populares sin agregar el historial de reservas.
+
+    Args:
+        queryset (QuerySet): Salas candidatas (por defecto, salas activas)
+        limit (int): Número de salas a retornar
+
+    Returns:
+        QuerySet: Salas ordenadas por popularidad descendente
+    """
+    from .models import Room
+
+    if queryset is None:
+        queryset = Room.objects.filter(is_active=True)
+    return queryset.filter(popularity_score__isnull=False).order_by('-popularity_score', 'name')[:limit]
+
+
+def rebuild_scores():
+    """
+    Recalcula en lote los puntajes de todas las salas desde el historial.
+
+    Recorre las reservas con un iterador sobre una proyección de dos columnas,
+    por lo que la memoria usada es proporcional al número de salas y no al
+    de reservas.
+
+    Returns:
+        int: Número de salas actualizadas
+    """
+    from .models import Room, Reservation
+
+    # Log-sum-exp en línea por sala: (máximo visto, Σ exp(x - máximo))
+    scores = {}
+    history = Reservation.objects.filter(
+        status__in=COUNTED_STATUSES
+    ).values_list('room_id', 'created_at').order_by()
+
+    for room_id, created_at in history.iterator(chunk_size=5000):
+        x = booking_log_weight(created_at)
+        top, total = scores.get(room_id, (x, 0.0))
+        if x > top:
+            total *= math.exp(top - x)
+            top = x
+        scores[room_id] = (top, total + math.exp(x - top))
+
+    rooms = list(Room.objects.only('id', 'popularity_score'))
+    for room in rooms:
+        top, total = scores.get(room.id, (None, 0.0))
+        room.popularity_score = top + math.log(total) if total else None
+
+    with transaction.atomic():
+        Room.objects.bulk_update(rooms, ['popularity_score'], batch_size=500)
+    return len(rooms)
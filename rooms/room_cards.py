@@ -0,0 +1,200 @@
+"""
+Capa de renderizado de las tarjetas de salas (room_list).
+
+Cada tarjeta se guarda como fragmento de plantilla en caché, con una clave
+formada por:
+
+- updated_at de la sala (cambia al editarla),
+- la versión de calificaciones de la sala (se incrementa al crear, editar
+  o borrar una reseña; ver rooms/signals.py), y
+- un "bucket" de disponibilidad: el estado, contexto y mensaje mostrados
+  en el pie de la tarjeta.
+
+La vista calcula la disponibilidad de toda la página con una consulta y
+las calificaciones con otra (solo para las tarjetas que no están en
+caché), por lo que la plantilla ya no llama a propiedades del modelo que
+consultan la base de datos por cada sala.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+import hashlib
+import time as time_module
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+from core.config import config
+
+from .availability import BLOCKING_STATUSES
+from .models import Reservation, Review
+
+CARD_FRAGMENT_NAME = 'room_card'
+CARD_CACHE_TIMEOUT = 60 * 10
+
+RATING_VERSION_KEY = 'rooms:rating_version:{pk}'
+
+
+def get_rating_versions(room_ids):
+    """
+    Obtener las versiones de calificaciones de varias salas desde caché.
+
+    Las versiones ausentes se inicializan con la hora actual en
+    milisegundos, siempre mayor que cualquier versión anterior.
+    """
+    keys = {RATING_VERSION_KEY.format(pk=pk): pk for pk in room_ids}
+    found = cache.get_many(keys)
+    missing = {key: int(time_module.time() * 1000) for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_rating_version(room_id):
+    """Invalidar las tarjetas de una sala tras un cambio en sus reseñas."""
+    key = RATING_VERSION_KEY.format(pk=room_id)
+    current = cache.get(key, 0)
+    cache.set(key, max(int(time_module.time() * 1000), current + 1), timeout=None)
+
+
+def load_ratings(room_ids):
+    """
+    Calcular promedio y cantidad de reseñas de varias salas en una consulta.
+
+    Returns:
+        dict: room_id -> (promedio redondeado a 1 decimal o 0, cantidad)
+    """
+    rows = (
+        Review.objects.filter(reservation__room_id__in=room_ids)
+        .values('reservation__room_id')
+        .annotate(avg_rating=Avg('rating'), total=Count('id'))
+    )
+    return {
+        row['reservation__room_id']: (round(row['avg_rating'], 1) if row['avg_rating'] else 0, row['total'])
+        for row in rows
+    }
+
+
+def load_availability(rooms, now=None):
+    """
+    Calcular el estado de disponibilidad de varias salas con una consulta.
+
+    Reproduce Room.get_detailed_availability_status sobre las reservas ya
+    cargadas: reservas activas ahora y reservas que comienzan hoy.
+
+    Returns:
+        dict: room_id -> {'status', 'message', 'context'}
+    """
+    now = now or timezone.now()
+    local_time = timezone.localtime(now).time()
+    # Mismo criterio de "hoy" que get_detailed_availability_status (start_time__date=now_utc.date())
+    day_start = timezone.make_aware(datetime.combine(now.date(), time.min))
+    day_end = day_start + timedelta(days=1)
+
+    by_room = defaultdict(list)
+    rows = Reservation.objects.filter(
+        room_id__in=[room.id for room in rooms],
+        status__in=BLOCKING_STATUSES,
+    ).filter(
+        Q(start_time__lte=now, end_time__gt=now) |
+        Q(start_time__gte=day_start, start_time__lt=day_end)
+    ).values_list('room_id', 'start_time', 'end_time').order_by('start_time')
+    for room_id, start, end in rows:
+        by_room[room_id].append((start, end))
+
+    continuous_gap = config.get('availability.continuous_gap')
+    availability = {}
+    for room in rooms:
+        if not room.opening_time <= local_time <= room.closing_time:
+            availability[room.id] = {
+                'status': 'closed',
+                'message': 'Sala cerrada por horario',
+                'context': 'closed',
+            }
+            continue
+
+        intervals = by_room.get(room.id, [])
+        today = [(start, end) for start, end in intervals if day_start <= start < day_end]
+        active = [(start, end) for start, end in intervals if start <= now < end]
+
+        if active:
+            current_end = max(end for _, end in active)
+            following = [(start, end) for start, end in today if start > current_end]
+            message = f"Ocupada hasta las {current_end.strftime('%H:%M')}, luego disponible"
+            if following:
+                next_start, next_end = following[0]
+                # Si hay menos de 15 minutos entre reservas, considerarlo como ocupado continuo
+                if next_start - current_end < continuous_gap:
+                    message = f"Ocupada hasta las {next_end.strftime('%H:%M')}"
+            availability[room.id] = {
+                'status': 'occupied',
+                'message': message,
+                'context': 'partial_occupied',
+            }
+            continue
+
+        upcoming = [start for start, _ in today if start > now]
+        if upcoming:
+            next_start = upcoming[0]
+            time_until_next = next_start - now
+            if time_until_next.total_seconds() < 3600:
+                minutes_until = int(time_until_next.total_seconds() / 60)
+                message = f"Disponible por {minutes_until} minutos (próxima reserva a las {next_start.strftime('%H:%M')})"
+            else:
+                message = f"Disponible hasta las {next_start.strftime('%H:%M')}"
+            availability[room.id] = {
+                'status': 'available',
+                'message': message,
+                'context': 'available_with_upcoming',
+            }
+        else:
+            availability[room.id] = {
+                'status': 'available',
+                'message': 'Disponible por el resto del día',
+                'context': 'fully_available',
+            }
+    return availability
+
+
+def prepare_room_cards(rooms, user, now=None):
+    """
+    Adjuntar a cada sala los datos precalculados de su tarjeta.
+
+    Define en cada sala availability_status, availability_message,
+    availability_context, card_cache_key y, si la tarjeta no está en
+    caché, card_rating y card_review_count.
+    """
+    rooms = list(rooms)
+    if not rooms:
+        return rooms
+
+    availability = load_availability(rooms, now)
+    versions = get_rating_versions([room.id for room in rooms])
+
+    fragment_keys = {}
+    for room in rooms:
+        info = availability[room.id]
+        room.availability_status = info['status']
+        room.availability_message = info['message']
+        room.availability_context = info['context']
+
+        bucket = hashlib.md5(
+            f"{info['status']}|{info['context']}|{info['message']}".encode()
+        ).hexdigest()[:12]
+        room.card_cache_key = (
+            f"{room.id}:{room.updated_at.timestamp()}:{versions[room.id]}:"
+            f"{bucket}:{int(user.is_authenticated)}"
+        )
+        fragment_keys[make_template_fragment_key(CARD_FRAGMENT_NAME, [room.card_cache_key])] = room
+
+    cached = cache.get_many(list(fragment_keys))
+    pending = [room for key, room in fragment_keys.items() if key not in cached]
+    if pending:
+        ratings = load_ratings([room.id for room in pending])
+        for room in pending:
+            room.card_rating, room.card_review_count = ratings.get(room.id, (0, 0))
+
+    return rooms
@@ -0,0 +1,72 @@
+"""
+Señales de la app de salas.
+
+Mantienen al día las versiones de horario usadas por los feeds iCalendar
+(ver rooms/calendar_feeds.py), la caché de salas visibles del calendario
+(ver rooms/calendar_events.py), las versiones de calificaciones de las
+tarjetas de room_list (ver rooms/room_cards.py) y el estado en vivo de las
+salas (ver rooms/live_status.py), además del ranking de popularidad (ver
+rooms/popularity.py). Las inserciones masivas con bulk_create no disparan
+señales, por lo que esos caminos llaman directamente a
+bump_schedule_versions y record_bookings.
+
+Tras cada migrate se recrean, si faltan, los triggers de no solapamiento de
+SQLite (ver rooms/booking.py); RoomsConfig.ready conecta ese receptor.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .booking import ensure_overlap_triggers
+from .calendar_events import invalidate_visible_rooms
+from .calendar_feeds import bump_schedule_versions
+from .live_status import BOOKING_CANCELLED, BOOKING_CREATED, CHANGED, notify_room_change
+from .models import Reservation, Review, Room
+from .popularity import track_reservation
+from .room_cards import bump_rating_version
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def reservation_changed(sender, instance, signal, created=False, **kwargs):
+    """
+    Invalidar los feeds de la sala y del usuario de la reserva, ajustar la
+    popularidad y avisar al estado en vivo.
+    """
+    track_reservation(instance, created=created, deleted=signal is post_delete)
+    bump_schedule_versions(room_ids=[instance.room_id], user_ids=[instance.user_id])
+    if created:
+        reason = BOOKING_CREATED
+    elif signal is post_delete or instance.status == 'cancelled':
+        reason = BOOKING_CANCELLED
+    else:
+        reason = CHANGED
+    notify_room_change(instance.room_id, reason)
+
+
+@receiver(post_save, sender=Room)
+def room_changed(sender, instance, created, **kwargs):
+    """
+    Invalidar las salas visibles por rol del calendario y, si la sala ya
+    existía, los feeds (su nombre y ubicación aparecen en los eventos).
+    """
+    invalidate_visible_rooms()
+    notify_room_change(instance.pk, CHANGED)
+    if not created:
+        # Sin order_by() el orden por defecto (-start_time) anula el DISTINCT
+        user_ids = instance.reservations.order_by().values_list('user_id', flat=True).distinct()
+        bump_schedule_versions(room_ids=[instance.pk], user_ids=list(user_ids))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """Invalidar la tarjeta de la sala reseñada (muestra su calificación)."""
+    room_id = Reservation.objects.filter(pk=instance.reservation_id).values_list('room_id', flat=True).first()
+    if room_id is not None:
+        bump_rating_version(room_id)
+
+
+def restore_overlap_triggers(sender, using, **kwargs):
+    """Recrear los triggers de no solapamiento que una migración haya descartado."""
+    ensure_overlap_triggers(using)
@@ -1,3 +1,898 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
+import csv
+import io
+import json
+import threading
+import time as time_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import IntegrityError, OperationalError, close_old_connections, connection, connections, transaction
+from django.http import HttpResponse
+from django.shortcuts import redirect
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.config import config
+from core.reservation_security import ReservationSecurityRule
+
+from .admission import AdmissionController, BookingOverloaded
+from .booking import BookingConflict, book_reservation, missing_overlap_triggers
+from .calendar_feeds import FEED_FUTURE_DAYS, feed_token
+from .export import iter_csv
+from .idempotency import idempotent_post, new_idempotency_key, remember_reservation
+from . import live_status
+from .live_status import BOOKING_CREATED, ENDED, RoomStatusBus
+from .models import Reservation, Review, Room
+from .popularity import current_score, rebuild_scores
+from . import timetable_import
+
+User = get_user_model()
+
+
+def run_concurrently(workers):
+    """Ejecutar las funciones en hilos que parten a la vez; devuelve sus resultados."""
+    barrier = threading.Barrier(len(workers))
+    results = [None] * len(workers)
+
+    def run(index, worker):
+        barrier.wait()
+        try:
+            results[index] = worker()
+        except Exception as e:
+            results[index] = e
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run, args=(index, worker)) for index, worker in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def close_response(response):
+    """Cerrar una respuesta no leída sin que request_finished cierre la conexión de la prueba."""
+    request_finished.disconnect(close_old_connections)
+    try:
+        response.close()
+    finally:
+        request_finished.connect(close_old_connections)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Reservas simultáneas sobre la misma sala (ver rooms/booking.py)."""
+
+    THREADS = 12
+
+    def setUp(self):
+        self.room = Room.objects.create(
+            name='Laboratorio de prueba',
+            capacity=30,
+            opening_time=time(0, 0),
+            closing_time=time(23, 59),
+        )
+        self.users = [
+            User.objects.create(username=f'estudiante_carga{index}', role='estudiante')
+            for index in range(self.THREADS)
+        ]
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=2)
+
+    def book(self, user, start, end):
+        def worker():
+            return book_reservation(Reservation(
+                user=user,
+                room=self.room,
+                start_time=start,
+                end_time=end,
+                purpose='Prueba de concurrencia',
+                status='confirmed',
+            ))
+        return worker
+
+    def assert_no_overlaps(self):
+        intervals = list(
+            Reservation.objects.filter(room=self.room, status__in=['confirmed', 'in_progress'])
+            .order_by('start_time').values_list('start_time', 'end_time')
+        )
+        for (_, previous_end), (next_start, _) in zip(intervals, intervals[1:]):
+            self.assertLessEqual(previous_end, next_start)
+
+    def test_same_slot_is_booked_once(self):
+        end = self.start + timedelta(hours=1)
+        results = run_concurrently([self.book(user, self.start, end) for user in self.users])
+
+        booked = [result for result in results if isinstance(result, Reservation)]
+        conflicts = [result for result in results if isinstance(result, BookingConflict)]
+        self.assertEqual(len(booked), 1, results)
+        self.assertEqual(len(conflicts), self.THREADS - 1, results)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), 1)
+
+    def test_overlapping_slots_never_double_book(self):
+        # Franjas de 60 minutos desplazadas 20 minutos: cada una choca con sus vecinas
+        workers = [
+            self.book(user, self.start + timedelta(minutes=20 * index),
+                      self.start + timedelta(minutes=20 * index + 60))
+            for index, user in enumerate(self.users)
+        ]
+        results = run_concurrently(workers)
+
+        self.assertFalse([result for result in results if not isinstance(result, (Reservation, BookingConflict))])
+        self.assertTrue(any(isinstance(result, Reservation) for result in results))
+        self.assert_no_overlaps()
+
+    def test_only_bookings_take_the_write_lock_upfront(self):
+        end = self.start + timedelta(hours=1)
+        with CaptureQueriesContext(connection) as booking:
+            self.book(self.users[0], self.start, end)()
+        with CaptureQueriesContext(connection) as other:
+            with transaction.atomic():
+                Room.objects.filter(pk=self.room.pk).update(capacity=31)
+
+        self.assertIn('BEGIN IMMEDIATE', [query['sql'] for query in booking.captured_queries])
+        self.assertIn('BEGIN', [query['sql'] for query in other.captured_queries])
+
+    def test_migrate_restores_dropped_overlap_triggers(self):
+        self.assertEqual(missing_overlap_triggers(), [])
+        # Lo que ocurre cuando una migración reconstruye rooms_reservation
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER reservation_no_overlap_insert')
+        self.assertEqual(missing_overlap_triggers(), ['reservation_no_overlap_insert'])
+
+        with self.assertLogs('rooms.booking', 'WARNING'):
+            call_command('migrate', verbosity=0)
+
+        self.assertEqual(missing_overlap_triggers(), [])
+        end = self.start + timedelta(hours=1)
+        Reservation.objects.create(user=self.users[0], room=self.room, start_time=self.start,
+                                   end_time=end, status='confirmed')
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(user=self.users[1], room=self.room, start_time=self.start,
+                                       end_time=end, status='confirmed')
+
+    def test_throughput_of_disjoint_bookings(self):
+        per_thread = 5
+        workers = []
+        for index, user in enumerate(self.users):
+            def worker(user=user, index=index):
+                for offset in range(per_thread):
+                    slot = self.start + timedelta(hours=index * per_thread + offset)
+                    book_reservation(Reservation(
+                        user=user, room=self.room, start_time=slot, end_time=slot + timedelta(hours=1),
+                        purpose='Prueba de rendimiento', status='confirmed',
+                    ))
+                return per_thread
+
+            workers.append(worker)
+
+        results = run_concurrently(workers)
+
+        self.assertEqual(results, [per_thread] * self.THREADS)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), per_thread * self.THREADS)
+
+    def test_database_rejects_overlap_outside_engine(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest("Garantía de no solapamiento solo para SQLite y PostgreSQL")
+        end = self.start + timedelta(hours=1)
+        Reservation.objects.create(
+            user=self.users[0], room=self.room, start_time=self.start, end_time=end,
+            purpose='Original', status='confirmed',
+        )
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(
+                user=self.users[1], room=self.room,
+                start_time=self.start + timedelta(minutes=30), end_time=end + timedelta(minutes=30),
+                purpose='Duplicada', status='confirmed',
+            )
+        # Las reservas no bloqueantes pueden coincidir con el horario
+        Reservation.objects.create(
+            user=self.users[1], room=self.room, start_time=self.start, end_time=end,
+            purpose='Pendiente', status='pending',
+        )
+
+
+class TimetableImportTests(TestCase):
+    """Importación del horario en CSV (ver rooms/timetable_import.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='profesor_horario', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala de horario', capacity=30, opening_time=time(8, 0), closing_time=time(22, 0),
+        )
+        self.day = (timezone.localdate() + timedelta(days=3)).isoformat()
+
+    def csv(self, *rows):
+        lines = ['room,user,start,end,purpose'] + [
+            f'{room},{self.user.username},{self.day} {start},{self.day} {end},Clase importada'
+            for room, start, end in rows
+        ]
+        return io.StringIO('\n'.join(lines) + '\n')
+
+    def test_room_id_wins_over_room_named_like_an_id(self):
+        shadow = Room.objects.create(
+            name=str(self.room.id), capacity=30, opening_time=time(8, 0), closing_time=time(22, 0),
+        )
+        result = timetable_import.import_timetable(self.csv((self.room.id, '10:00', '11:00')))
+
+        self.assertEqual(result['created'], 1)
+        self.assertTrue(Reservation.objects.filter(room=self.room).exists())
+        self.assertFalse(Reservation.objects.filter(room=shadow).exists())
+
+    def test_over_length_purpose_is_rejected_with_its_line(self):
+        stream = io.StringIO(
+            'room,user,start,end,purpose\n'
+            f'{self.room.id},{self.user.username},{self.day} 10:00,{self.day} 11:00,{"x" * 201}\n'
+        )
+        result = timetable_import.import_timetable(stream)
+
+        self.assertEqual(result['created'], 0)
+        self.assertEqual(result['rejected'][0]['line'], 2)
+        self.assertIn('200 caracteres', result['rejected'][0]['reason'])
+
+    def test_files_over_the_row_limit_are_refused_up_front(self):
+        stream = self.csv(*[(self.room.id, f'{8 + hour}:00', f'{8 + hour}:30') for hour in range(3)])
+        values = {'booking.import_max_rows': 2}
+        original_get = config.get
+        with mock.patch.object(config, 'get', lambda key, default=None: values.get(key, original_get(key, default))):
+            with self.assertRaises(timetable_import.TimetableImportError):
+                timetable_import.import_timetable(stream)
+        self.assertFalse(Reservation.objects.filter(room=self.room).exists())
+
+    def test_conflict_during_write_saves_nothing(self):
+        validate_rows = timetable_import.validate_rows
+
+        def validate_then_book(rows, rooms=None):
+            valid, rejected = validate_rows(rows, rooms)
+            # Una reserva que se cuela entre la validación y la inserción
+            Reservation.objects.create(
+                user=self.user, room=self.room, purpose='Concurrente', status='confirmed',
+                start_time=valid[-1]['start_dt'], end_time=valid[-1]['end_dt'],
+            )
+            return valid, rejected
+
+        stream = self.csv((self.room.id, '10:00', '11:00'), (self.room.name, '12:00', '13:00'))
+        with mock.patch.object(timetable_import, 'validate_rows', validate_then_book), \
+                mock.patch.object(timetable_import, 'bump_schedule_versions') as bump:
+            with self.assertRaises(BookingConflict):
+                timetable_import.import_timetable(stream)
+
+        self.assertFalse(Reservation.objects.filter(room=self.room).exists())
+        bump.assert_not_called()
+
+
+@override_settings(ROOM_POPULARITY_HALF_LIFE_DAYS=1)
+class PopularityTests(TestCase):
+    """Puntaje de popularidad en escala logarítmica (ver rooms/popularity.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='popularidad_profesor', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala popular', capacity=20, opening_time=time(0, 0), closing_time=time(23, 59),
+        )
+        # Con vida media de 1 día, exp(λ·t) ya no cabe en un float
+        self.now = timezone.now().replace(year=2035)
+
+    def book(self, hours=0):
+        start = timezone.now() + timedelta(days=1, hours=hours)
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            return Reservation.objects.create(
+                user=self.user, room=self.room, start_time=start, end_time=start + timedelta(hours=1),
+                purpose='Clase', status='confirmed',
+            )
+
+    def score(self):
+        self.room.refresh_from_db()
+        return current_score(self.room, self.now)
+
+    def test_scores_do_not_overflow_far_from_the_epoch(self):
+        self.book()
+        self.book(hours=2)
+        self.assertEqual(self.score(), 2.0)
+
+        self.assertEqual(rebuild_scores(), 1)
+        self.assertEqual(self.score(), 2.0)
+
+    def test_cancellations_and_deletions_outside_the_view_are_discounted(self):
+        first = self.book()
+        second = self.book(hours=2)
+
+        # Cambio de estado desde el admin (sin pasar por reservation_cancel)
+        first = Reservation.objects.get(pk=first.pk)
+        first.status = 'cancelled'
+        first.save()
+        self.assertEqual(self.score(), 1.0)
+
+        Reservation.objects.get(pk=second.pk).delete()
+        self.assertEqual(self.score(), 0.0)
+        self.assertIsNone(self.room.popularity_score)
+
+        # Un estado cancelado que vuelve a contar suma de nuevo
+        first.status = 'pending'
+        first.save()
+        self.assertEqual(self.score(), 1.0)
+
+
+class RoomCardCacheTests(TestCase):
+    """Fragmentos en caché de las tarjetas de room_list (ver rooms/room_cards.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='admin_tarjetas', role='admin')
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+        self.room = Room.objects.create(name='Sala tarjeta', capacity=10, opening_time=time(0, 0), closing_time=time(23, 59))
+
+    def card(self):
+        content = self.client.get('/salas/').content.decode()
+        start = content.index('Sala tarjeta')
+        return content[start:content.index('<!-- Pagination -->', start)]
+
+    def reserve(self, start, end, status='completed'):
+        return Reservation.objects.create(user=self.user, room=self.room, start_time=start, end_time=end,
+                                          purpose='Clase', status=status)
+
+    def test_reviews_invalidate_the_cached_card(self):
+        self.assertIn('Sin calificaciones aún', self.card())
+        past = timezone.now() - timedelta(days=2)
+        review = Review.objects.create(reservation=self.reserve(past, past + timedelta(hours=1)), rating=4)
+        self.assertIn('4,0 (1 reseña)', self.card())
+
+        review.rating = 2
+        review.save()
+        self.assertIn('2,0 (1 reseña)', self.card())
+
+        review.delete()
+        self.assertIn('Sin calificaciones aún', self.card())
+
+    def test_reservations_invalidate_the_cached_card(self):
+        self.assertIn('Disponible ahora', self.card())
+        now = timezone.now()
+        reservation = self.reserve(now - timedelta(minutes=5), now + timedelta(hours=2), status='in_progress')
+        self.assertIn('Ocupada hasta las', self.card())
+
+        reservation.status = 'cancelled'
+        reservation.save()
+        self.assertIn('Disponible ahora', self.card())
+
+
+class ReservationExportTests(TestCase):
+    """Exportación CSV y feeds iCalendar de reservas (ver rooms/export.py y rooms/calendar_feeds.py)."""
+
+    def test_formula_cells_are_neutralized(self):
+        user = User.objects.create(username='@usuario', role='profesor')
+        room = Room.objects.create(
+            name='=HYPERLINK("http://ejemplo.com")', capacity=10, location='-1 subterráneo',
+            opening_time=time(0, 0), closing_time=time(23, 59),
+        )
+        start = timezone.now() + timedelta(days=1)
+        Reservation.objects.create(
+            user=user, room=room, start_time=start, end_time=start + timedelta(hours=1),
+            purpose='+cmd|calc', status='pending',
+        )
+
+        lines = list(csv.reader(''.join(iter_csv(Reservation.objects.all())).splitlines()))
+        row = dict(zip(lines[0], lines[1]))
+
+        self.assertEqual(row['sala'], '\'=HYPERLINK("http://ejemplo.com")')
+        self.assertEqual(row['ubicacion'], "'-1 subterráneo")
+        self.assertEqual(row['usuario'], "'@usuario")
+        self.assertEqual(row['proposito'], "'+cmd|calc")
+
+    def test_feed_urls_require_a_valid_token(self):
+        profesor = User.objects.create(username='profesor_feed', role='profesor')
+        profesor.set_password('clave-original')
+        profesor.save()
+        estudiante = User.objects.create(username='estudiante_feed', role='estudiante')
+        room = Room.objects.create(name='Sala feed', capacity=10, opening_time=time(0, 0), closing_time=time(23, 59))
+        token = feed_token(profesor)
+        pk, _, signature = token.partition('-')
+        tampered = signature[:-1] + ('1' if signature.endswith('0') else '0')
+
+        self.assertEqual(self.client.get(f'/salas/feeds/usuario/{token}.ics').status_code, 200)
+        self.assertEqual(self.client.get(f'/salas/feeds/sala/{room.pk}/{token}.ics').status_code, 200)
+        for bad in (f'{pk}-{tampered}', f'{estudiante.pk}-{signature}', 'sin-firma', pk):
+            response = self.client.get(f'/salas/feeds/usuario/{bad}.ics')
+            self.assertEqual(response.status_code, 404, bad)
+        # Solo personal, administradores y profesores se suscriben a una sala
+        response = self.client.get(f'/salas/feeds/sala/{room.pk}/{feed_token(estudiante)}.ics')
+        self.assertEqual(response.status_code, 404)
+        # Cambiar la contraseña revoca las suscripciones anteriores
+        profesor.set_password('clave-nueva')
+        profesor.save()
+        self.assertEqual(self.client.get(f'/salas/feeds/usuario/{token}.ics').status_code, 404)
+
+    def test_feed_lists_the_window_and_changes_with_the_schedule(self):
+        cache.clear()
+        user = User.objects.create(username='feed_usuario', role='estudiante')
+        room = Room.objects.create(name='Sala feed', capacity=10, opening_time=time(0, 0), closing_time=time(23, 59))
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+        def reserve(when, purpose):
+            return Reservation.objects.create(user=user, room=room, start_time=when, end_time=when + timedelta(hours=1),
+                                              purpose=purpose, status='confirmed')
+
+        inside = reserve(start, 'Dentro de la ventana')
+        outside = reserve(start + timedelta(days=FEED_FUTURE_DAYS + 1), 'Fuera de la ventana')
+        url = f'/salas/feeds/usuario/{feed_token(user)}.ics'
+
+        response = self.client.get(url)
+        content = response.content.decode()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:reserva-{inside.pk}@testserver', content)
+        self.assertIn('SUMMARY:Sala feed: Dentro de la ventana', content)
+        self.assertNotIn(f'UID:reserva-{outside.pk}@', content)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        added = reserve(start + timedelta(hours=3), 'Nueva')
+        refreshed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed['ETag'], response['ETag'])
+        self.assertIn(f'UID:reserva-{added.pk}@testserver', refreshed.content.decode())
+
+
+class IdempotentPostTests(TestCase):
+    """Reenvíos del formulario de reserva con la misma clave (ver rooms/idempotency.py)."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User(pk=987654, username='estudiante_idempotencia')
+        self.calls = []
+
+        @idempotent_post
+        def view(request, room_id):
+            self.calls.append(room_id)
+            if request.POST.get('purpose') == '':
+                return HttpResponse('Formulario inválido')
+            if request.POST.get('purpose') == 'Sin permiso':
+                # Redirección de error: no se creó ninguna reserva
+                return redirect('rooms:room_list')
+            remember_reservation(request, 42)
+            return redirect('rooms:reservation_detail', reservation_id=42)
+
+        self.view = view
+
+    def post(self, data, **headers):
+        request = self.factory.post('/salas/sala/1/reservar/', data, headers=headers)
+        request.user = self.user
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        return self.view(request, 1)
+
+    def test_replay_returns_original_redirect_without_running_view(self):
+        data = {'purpose': 'Clase', 'idempotency_key': new_idempotency_key()}
+        first = self.post(data)
+        second = self.post(data)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.status_code, 302)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_header_key_is_accepted(self):
+        key = new_idempotency_key()
+        self.post({'purpose': 'Clase'}, **{'Idempotency-Key': key})
+        self.post({'purpose': 'Clase'}, **{'Idempotency-Key': key})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_invalid_form_releases_key(self):
+        key = new_idempotency_key()
+        self.post({'purpose': '', 'idempotency_key': key})
+        response = self.post({'purpose': 'Clase', 'idempotency_key': key})
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_failure_redirect_is_not_replayed(self):
+        data = {'purpose': 'Sin permiso', 'idempotency_key': new_idempotency_key()}
+        self.post(data)
+        response = self.post(data)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+
+    def test_requests_without_key_are_not_deduplicated(self):
+        self.post({'purpose': 'Clase'})
+        self.post({'purpose': 'Clase'})
+        self.assertEqual(len(self.calls), 2)
+
+
+class RecurringReservationTests(TestCase):
+    """Series recurrentes creadas desde room_reserve (ver rooms/recurrence.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='profesor_series', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala de series', capacity=20, opening_time=time(8, 0), closing_time=time(22, 0),
+        )
+        ReservationSecurityRule.objects.create(
+            role='profesor', max_reservations_per_hour=10, max_reservations_per_day=10,
+            max_reservations_per_week=3, max_total_hours_per_day=8, max_total_hours_per_week=40,
+        )
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+
+    def post_series(self, weeks):
+        start = (timezone.localtime() + timedelta(days=2)).replace(hour=10, minute=0, second=0, microsecond=0)
+        return self.client.post(f'/salas/sala/{self.room.id}/reservar/', {
+            'room': self.room.id,
+            'start_time': start.strftime('%Y-%m-%dT%H:%M'),
+            'end_time': (start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            'purpose': 'Clase semanal',
+            'attendees_count': 5,
+            'recurrence': 'weekly',
+            'recurrence_until': (start + timedelta(weeks=weeks - 1)).date().isoformat(),
+            'idempotency_key': new_idempotency_key(),
+        })
+
+    def test_each_occurrence_counts_against_the_limits(self):
+        response = self.post_series(weeks=4)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Reservation.objects.filter(room=self.room).exists())
+
+        self.post_series(weeks=3)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), 3)
+
+    def test_lock_timeout_returns_503(self):
+        with mock.patch(
+            'rooms.recurrence.create_recurring_reservations',
+            side_effect=OperationalError('database is locked'),
+        ):
+            response = self.post_series(weeks=2)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+class AdmissionControlTests(SimpleTestCase):
+    """Cola de espera del control de admisión (ver rooms/admission.py)."""
+
+    def setUp(self):
+        self.admission = AdmissionController()
+        values = {
+            'booking.max_concurrent_per_room': 1,
+            'booking.max_concurrent_per_process': 4,
+            'booking.max_queue': 1,
+            'booking.queue_timeout': timedelta(seconds=5),
+            'booking.retry_after': timedelta(seconds=10),
+        }
+        # Sin base de datos: solo las claves que lee el control de admisión
+        patcher = mock.patch.object(config, 'get', lambda key, default=None: values[key])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.values = values
+
+    def wait_in_queue(self, room_id):
+        """Pedir un cupo desde otro hilo; devuelve el hilo y su resultado."""
+        result = {}
+
+        def worker():
+            try:
+                with self.admission.admit(room_id):
+                    result['admitted'] = time_module.monotonic()
+            except BookingOverloaded as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        deadline = time_module.monotonic() + 5
+        while self.admission.stats()['waiting'] == 0 and time_module.monotonic() < deadline:
+            time_module.sleep(0.01)
+        self.assertEqual(self.admission.stats()['waiting'], 1)
+        return thread, result
+
+    def test_queued_booking_is_admitted_when_a_slot_frees(self):
+        with self.admission.admit(1):
+            thread, result = self.wait_in_queue(1)
+            # Otra sala no espera detrás de la cola
+            with self.admission.admit(2):
+                self.assertEqual(self.admission.stats(), {'active': 2, 'waiting': 1})
+            # La cola está llena: la siguiente solicitud se rechaza sin esperar
+            with self.assertRaises(BookingOverloaded):
+                with self.admission.admit(1):
+                    pass
+            released = time_module.monotonic()
+        thread.join(5)
+
+        self.assertNotIn('error', result)
+        self.assertGreaterEqual(result['admitted'], released)
+        self.assertEqual(self.admission.stats(), {'active': 0, 'waiting': 0})
+
+    def test_queued_booking_gives_up_after_the_timeout(self):
+        self.values['booking.queue_timeout'] = timedelta(milliseconds=200)
+        with self.admission.admit(1):
+            thread, result = self.wait_in_queue(1)
+            thread.join(5)
+
+        self.assertIsInstance(result.get('error'), BookingOverloaded)
+        self.assertNotIn('admitted', result)
+        self.assertEqual(self.admission.stats(), {'active': 0, 'waiting': 0})
+
+
+class ReservationRateLimitTests(TestCase):
+    """Límite 'rate_reserve' de room_reserve (ver core.rate_limit.enforce_rate_limit)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='profesor_limite', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala con límite', capacity=20, opening_time=time(7, 0), closing_time=time(23, 0),
+        )
+        ReservationSecurityRule.objects.create(
+            role='profesor', max_reservations_per_hour=100, max_reservations_per_day=100,
+            max_reservations_per_week=100, max_total_hours_per_day=24, max_total_hours_per_week=100,
+        )
+        self.limit = config.get('security.rate_limits')['rate_reserve']['limit']
+        # Los contadores de otras pruebas (mismo pk de usuario) siguen en la caché
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+
+    def post(self, hour, key=None, purpose='Clase', **headers):
+        start = timezone.make_aware(datetime.combine(self.day, time(hour, 0)))
+        return self.client.post(f'/salas/sala/{self.room.id}/reservar/', {
+            'room': self.room.id,
+            'start_time': timezone.localtime(start).strftime('%Y-%m-%dT%H:%M'),
+            'end_time': timezone.localtime(start + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+            'purpose': purpose,
+            'attendees_count': 5,
+            'idempotency_key': key or new_idempotency_key(),
+        }, headers=headers)
+
+    def test_replays_beyond_the_limit_return_the_original_redirect(self):
+        key = new_idempotency_key()
+        first = self.post(8, key=key)
+        self.assertEqual(first.status_code, 302)
+
+        for _ in range(self.limit + 2):
+            replay = self.post(8, key=key)
+            self.assertEqual(replay.status_code, 302)
+            self.assertEqual(replay['Location'], first['Location'])
+            self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), 1)
+
+    def test_only_booking_attempts_consume_the_limit(self):
+        # Formularios inválidos corregidos varias veces y reenvíos con la misma clave
+        for _ in range(self.limit + 2):
+            self.assertEqual(self.post(8, purpose='').status_code, 200)
+        key = new_idempotency_key()
+        for _ in range(self.limit + 2):
+            self.assertEqual(self.post(8, key=key).status_code, 302)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), 1)
+
+        for hour in range(9, 8 + self.limit):
+            self.assertEqual(self.post(hour).status_code, 302)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), self.limit)
+
+        rejected = self.post(8 + self.limit, Accept='application/json')
+        self.assertEqual(rejected.status_code, 429)
+        self.assertIn('Retry-After', rejected)
+        self.assertEqual(Reservation.objects.filter(room=self.room).count(), self.limit)
+
+
+class AsyncApiTests(TestCase):
+    """APIs JSON asíncronas servidas por ASGI (AsyncClient) y por WSGI (Client)."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='async_profesor', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala asíncrona', capacity=20, location='Piso 1',
+            opening_time=time(8, 0), closing_time=time(22, 0),
+        )
+        start = (timezone.now() + timedelta(days=1)).replace(hour=15, minute=0, second=0, microsecond=0)
+        self.reservation = Reservation.objects.create(
+            room=self.room, user=self.user, start_time=start, end_time=start + timedelta(hours=1),
+            purpose='Clase', attendees_count=5, status='confirmed',
+        )
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+        self.async_client.cookies = self.client.cookies
+
+    async def test_calendar_events_api_under_asgi(self):
+        response = await self.async_client.get('/salas/api/calendario/eventos/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event['id'] for event in response.json()], [self.reservation.id])
+        self.assertIn('async_profesor', response.json()[0]['title'])
+        # RoutePolicyMiddleware conserva el Cache-Control de la API
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        # Mismo conjunto de reservas: el cliente conserva su copia
+        repeated = await self.async_client.get(
+            '/salas/api/calendario/eventos/', headers={'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(repeated.status_code, 304)
+
+    def test_renaming_a_room_or_user_changes_the_etag(self):
+        path = '/salas/api/calendario/eventos/'
+        etag = self.client.get(path)['ETag']
+
+        self.room.name = 'Sala renombrada'
+        self.room.save()
+        renamed = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(renamed.status_code, 200)
+        self.assertIn('Sala renombrada', renamed.json()[0]['title'])
+
+        self.user.first_name = 'Ana'
+        self.user.save()
+        retitled = self.client.get(path, headers={'If-None-Match': renamed['ETag']})
+        self.assertEqual(retitled.status_code, 200)
+        self.assertIn('Ana', retitled.json()[0]['title'])
+
+    async def test_room_availability_under_asgi(self):
+        local_start = timezone.localtime(self.reservation.start_time).replace(tzinfo=None)
+        path = f'/salas/api/sala/{self.room.id}/disponibilidad/'
+        params = {'date': local_start.strftime('%Y-%m-%d'), 'end_time': '20:00'}
+
+        busy = await self.async_client.get(path, {**params, 'start_time': local_start.strftime('%H:%M')})
+        free = await self.async_client.get(path, {**params, 'start_time': '19:00'})
+
+        self.assertFalse(busy.json()['available'])
+        self.assertEqual(busy.json()['conflicts'][0]['user__username'], 'async_profesor')
+        self.assertTrue(free.json()['available'])
+
+    def test_free_slots_stay_within_the_booking_window(self):
+        today = timezone.localdate()
+        past = self.client.get('/salas/api/horarios-libres/', {
+            'date_from': (today - timedelta(days=5)).isoformat(), 'date_to': today.isoformat(),
+        })
+        beyond = self.client.get('/salas/api/horarios-libres/', {
+            'date_from': (today + timedelta(days=40)).isoformat(),
+            'date_to': (today + timedelta(days=45)).isoformat(),
+        })
+
+        self.assertEqual(past.status_code, 200)
+        now = timezone.now()
+        for slot in past.json()['slots']:
+            self.assertGreaterEqual(datetime.fromisoformat(slot['start']), now - timedelta(minutes=5))
+        self.assertEqual(beyond.json()['slots'], [])
+
+    def test_async_views_still_work_under_wsgi(self):
+        response = self.client.get('/salas/api/calendario/eventos/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+
+
+def parse_sse(chunk):
+    """(evento, datos) de un mensaje SSE."""
+    fields = dict(line.split(': ', 1) for line in chunk.strip().splitlines())
+    return fields['event'], json.loads(fields['data'])
+
+
+class LiveRoomStatusTests(TestCase):
+    """Bus de estado en vivo de las salas y su flujo Server-Sent Events."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='live_profesor', role='profesor')
+        self.room = Room.objects.create(
+            name='Sala en vivo', capacity=20, location='Piso 2',
+            opening_time=time(0, 0), closing_time=time(23, 59, 59),
+        )
+        # Sin hilo monitor: las pruebas recalculan el estado a mano
+        self.bus = RoomStatusBus(monitor=False)
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['last_activity'] = True
+        session.save()
+        self.async_client.cookies = self.client.cookies
+
+    def occupy_now(self):
+        now = timezone.now()
+        return Reservation.objects.create(
+            room=self.room, user=self.user, start_time=now - timedelta(minutes=10),
+            end_time=now + timedelta(minutes=50), purpose='Clase', attendees_count=5, status='confirmed',
+        )
+
+    def test_refresh_publishes_only_changes_with_reason(self):
+        subscription = self.bus.subscribe()
+        self.assertEqual(self.bus.snapshot()['rooms'][str(self.room.id)]['status'], 'available')
+
+        reservation = self.occupy_now()
+        self.bus.refresh({self.room.id: BOOKING_CREATED})
+        self.bus.refresh()
+
+        events, overflowed = subscription.drain()
+        self.assertFalse(overflowed)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['room_id'], self.room.id)
+        self.assertEqual((events[0]['previous'], events[0]['status']), ('available', 'occupied'))
+        self.assertEqual(events[0]['reason'], BOOKING_CREATED)
+
+        # Sin aviso del proceso, el motivo se deduce de la transición
+        reservation.status = 'cancelled'
+        reservation.save()
+        self.bus.refresh()
+        events, _ = subscription.drain()
+        self.assertEqual([(event['status'], event['reason']) for event in events], [('available', ENDED)])
+
+        self.bus.unsubscribe(subscription)
+        self.bus.refresh()
+        self.assertEqual(subscription.drain(), ([], False))
+
+    def test_slow_subscription_gets_a_new_snapshot(self):
+        subscription = self.bus.subscribe()
+        subscription.max_pending = 1
+        subscription.put({'id': 1})
+        subscription.put({'id': 2})
+        self.assertEqual(subscription.drain(), ([], True))
+
+    def test_stream_under_wsgi(self):
+        original_get = config.get
+        # Conexión corta: el flujo termina solo y libera su suscripción y su cupo
+        values = {'live.wsgi_stream_max_age': timedelta(0)}
+        with mock.patch('rooms.live_status.room_status_bus', self.bus), \
+                mock.patch.object(config, 'get', lambda key, default=None: values.get(key, original_get(key, default))):
+            response = self.client.get('/salas/api/estado/stream/')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+            chunks = list(response.streaming_content)
+
+        self.assertTrue(chunks[0].startswith(b'retry: '))
+        event, data = parse_sse(chunks[1].decode())
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(data['rooms'][str(self.room.id)]['status'], 'available')
+        self.assertEqual(self.bus._subscribers, set())
+        self.assertEqual(live_status.wsgi_stream_slots.open, 0)
+
+    def test_wsgi_streams_are_capped_per_process(self):
+        original_get = config.get
+        values = {'live.wsgi_max_streams': 1}
+        with mock.patch('rooms.live_status.room_status_bus', self.bus), \
+                mock.patch.object(config, 'get', lambda key, default=None: values.get(key, original_get(key, default))):
+            first = self.client.get('/salas/api/estado/stream/')
+            second = self.client.get('/salas/api/estado/stream/')
+            close_response(first)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 503)
+        self.assertIn('Retry-After', second)
+        self.assertEqual(live_status.wsgi_stream_slots.open, 0)
+
+    def test_wsgi_pages_poll_instead_of_streaming(self):
+        self.occupy_now()
+        response = self.client.get('/salas/api/estado/')
+        self.assertEqual(response.json()['rooms'][str(self.room.id)]['status'], 'occupied')
+
+        page = self.client.get('/salas/')
+        self.assertContains(page, '/salas/api/estado/')
+        self.assertNotContains(page, '/salas/api/estado/stream/')
+
+    async def test_stream_under_asgi_receives_changes(self):
+        original_get = config.get
+        # Conexión corta: el flujo termina solo y libera su suscripción
+        values = {'live.stream_max_age': timedelta(seconds=1)}
+        with mock.patch('rooms.live_status.room_status_bus', self.bus), \
+                mock.patch.object(config, 'get', lambda key, default=None: values.get(key, original_get(key, default))):
+            response = await self.async_client.get('/salas/api/estado/stream/')
+            chunks = aiter(response.streaming_content)
+            await anext(chunks)
+            event, _ = parse_sse((await anext(chunks)).decode())
+            self.assertEqual(event, 'snapshot')
+
+            # El cambio se publica desde otro hilo, como lo hace el monitor
+            await sync_to_async(self.occupy_now)()
+            await sync_to_async(self.bus.refresh)({self.room.id: BOOKING_CREATED})
+            event, data = parse_sse((await anext(chunks)).decode())
+            remaining = [chunk async for chunk in chunks]
+
+        self.assertEqual(event, 'status')
+        self.assertEqual((data['status'], data['reason']), ('occupied', BOOKING_CREATED))
+        self.assertEqual(remaining, [b': ping\n\n'])
+        self.assertEqual(self.bus._subscribers, set())
@@ -0,0 +1,337 @@
+"""
+Importación masiva del horario escolar desde CSV.
+
+El archivo debe tener las columnas room, user, start, end, purpose y,
+opcionalmente, attendees y notes. La sala puede indicarse por ID o nombre
+y el usuario por nombre de usuario.
+
+La validación se hace en lote: salas y usuarios se resuelven con una
+consulta cada uno, las reservas existentes del rango con una sola
+consulta, y los solapamientos se detectan ordenando por sala e inicio y
+barriendo los intervalos. La validación y la inserción (bulk_create por
+bloques) ocurren en una sola transacción con las salas bloqueadas, igual
+que una reserva individual (rooms/booking.py): una reserva simultánea no
+puede colarse entre ambas y la importación se guarda completa o no se
+guarda. Las filas rechazadas se reportan con su motivo.
+
+Como esa transacción mantiene bloqueadas las salas (y, con SQLite, la
+base de datos) mientras dura, el archivo se limita a
+'booking.import_max_rows' filas (ver core/config.py); un horario mayor
+se importa en varios archivos.
+"""
+
+from collections import defaultdict
+import csv
+from datetime import datetime
+import io
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+from core.config import config
+
+from .availability import load_busy_intervals, match_overlaps
+from .booking import run_locked_rooms
+from .calendar_feeds import bump_schedule_versions
+from .models import Room, Reservation
+from .popularity import record_bookings
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ('room', 'user', 'start', 'end', 'purpose')
+REPORT_COLUMNS = ('line', 'room', 'user', 'start', 'end', 'purpose', 'reason')
+
+DEFAULT_CHUNK_SIZE = 1000
+
+PURPOSE_MAX_LENGTH = Reservation._meta.get_field('purpose').max_length
+
+
+class TimetableImportError(Exception):
+    """Error que impide procesar el archivo completo (p. ej. columnas faltantes)."""
+
+
+def read_rows(stream):
+    """
+    Leer las filas del CSV detectando el delimitador (coma o punto y coma).
+
+    Args:
+        stream: Archivo de texto abierto
+
+    Returns:
+        list: Filas como diccionarios con la clave adicional 'line'
+
+    Raises:
+        TimetableImportError: Si faltan columnas o hay más de 'booking.import_max_rows' filas
+    """
+    sample = stream.read(4096)
+    stream.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.DictReader(stream, dialect=dialect)
+    columns = [column.strip().lower() for column in reader.fieldnames or []]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise TimetableImportError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+    reader.fieldnames = columns
+
+    max_rows = config.get('booking.import_max_rows')
+    rows = []
+    for line, row in enumerate(reader, start=2):
+        if len(rows) >= max_rows:
+            raise TimetableImportError(
+                f"El archivo supera el máximo de {max_rows} filas: divídalo en varios archivos"
+            )
+        row = {key: (value or '').strip() for key, value in row.items() if key}
+        row['line'] = line
+        rows.append(row)
+    return rows
+
+
+def _parse_datetime(value):
+    """Convertir 'AAAA-MM-DD HH:MM' (o ISO 8601) a un datetime con zona horaria."""
+    parsed = datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _resolve_rooms(rows):
+    """
+    Resolver las salas referenciadas (por ID o nombre) con una sola consulta.
+
+    Si una referencia coincide con el ID de una sala y con el nombre de
+    otra (una sala llamada "12"), gana el ID.
+    """
+    references = {row['room'] for row in rows}
+    ids = {int(reference) for reference in references if reference.isdigit()}
+    rooms = list(Room.objects.filter(is_active=True).filter(
+        Q(id__in=ids) | Q(name__in=references)
+    ))
+
+    by_id = {str(room.id): room for room in rooms}
+    by_name = {room.name: room for room in rooms}
+    by_reference = {}
+    for reference in references:
+        room = by_id.get(reference) or by_name.get(reference)
+        if room is not None:
+            by_reference[reference] = room
+    return by_reference
+
+
+def validate_rows(rows, rooms=None):
+    """
+    Validar todas las filas en lote.
+
+    Args:
+        rows (list): Filas leídas con read_rows
+        rooms (dict): Salas ya resueltas por referencia (por defecto se consultan)
+
+    Returns:
+        tuple: (filas aceptadas, filas rechazadas). Cada fila aceptada
+               incluye las claves room_obj, user_obj, start_dt, end_dt y
+               attendees_count; cada rechazada incluye 'reason'.
+    """
+    if rooms is None:
+        rooms = _resolve_rooms(rows)
+    users = User.objects.filter(is_active=True).in_bulk(
+        {row['user'] for row in rows}, field_name='username'
+    )
+
+    accepted = []
+    rejected = []
+
+    def reject(row, reason):
+        rejected.append(dict(row, reason=reason))
+
+    # 1. Validaciones por fila (sin consultas)
+    for row in rows:
+        room = rooms.get(row['room'])
+        user = users.get(row['user'])
+        if room is None:
+            reject(row, f"Sala inexistente o inactiva: {row['room']}")
+            continue
+        if user is None:
+            reject(row, f"Usuario inexistente o inactivo: {row['user']}")
+            continue
+        if not row['purpose']:
+            reject(row, "El propósito es obligatorio")
+            continue
+        if len(row['purpose']) > PURPOSE_MAX_LENGTH:
+            reject(row, f"El propósito supera los {PURPOSE_MAX_LENGTH} caracteres ({len(row['purpose'])})")
+            continue
+        try:
+            start = _parse_datetime(row['start'])
+            end = _parse_datetime(row['end'])
+        except ValueError:
+            reject(row, "Formato de fecha inválido (use AAAA-MM-DD HH:MM)")
+            continue
+        try:
+            attendees_count = int(row.get('attendees') or 1)
+        except ValueError:
+            reject(row, f"Número de asistentes inválido: {row.get('attendees')}")
+            continue
+
+        local_start = timezone.localtime(start)
+        local_end = timezone.localtime(end)
+        if start >= end:
+            reject(row, "La hora de inicio debe ser anterior a la hora de fin")
+        elif local_start.date() != local_end.date():
+            reject(row, "Las reservas no pueden extenderse más allá de medianoche")
+        elif local_start.time() < room.opening_time or local_end.time() > room.closing_time:
+            reject(
+                row,
+                f"Fuera del horario de la sala ({room.opening_time.strftime('%H:%M')}"
+                f" - {room.closing_time.strftime('%H:%M')})"
+            )
+        elif attendees_count < 1 or attendees_count > room.capacity:
+            reject(row, f"Asistentes ({attendees_count}) fuera de la capacidad de la sala ({room.capacity})")
+        else:
+            accepted.append(dict(
+                row,
+                room_obj=room,
+                user_obj=user,
+                start_dt=start,
+                end_dt=end,
+                attendees_count=attendees_count,
+            ))
+
+    if not accepted:
+        return accepted, rejected
+
+    # 2. Solapamientos: una consulta de reservas existentes y barrido por sala
+    by_room = defaultdict(list)
+    for row in accepted:
+        by_room[row['room_obj'].id].append(row)
+
+    busy = load_busy_intervals(
+        list(by_room),
+        min(row['start_dt'] for row in accepted),
+        max(row['end_dt'] for row in accepted),
+    )
+
+    valid = []
+    for room_id, room_rows in by_room.items():
+        room_rows.sort(key=lambda row: (row['start_dt'], row['line']))
+        candidates = [(row['start_dt'], row['end_dt']) for row in room_rows]
+        overlaps = match_overlaps(candidates, busy.get(room_id, []))
+
+        busy_until = None
+        for index, row in enumerate(room_rows):
+            if index in overlaps:
+                conflict_start, conflict_end = overlaps[index]
+                reject(
+                    row,
+                    "Conflicto con reserva existente "
+                    f"({timezone.localtime(conflict_start).strftime('%d/%m/%Y %H:%M')}"
+                    f" - {timezone.localtime(conflict_end).strftime('%H:%M')})"
+                )
+            elif busy_until is not None and row['start_dt'] < busy_until:
+                reject(row, "Se solapa con otra fila del mismo archivo")
+            else:
+                busy_until = row['end_dt']
+                valid.append(row)
+
+    rejected.sort(key=lambda row: row['line'])
+    return valid, rejected
+
+
+def write_reservations(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insertar las filas válidas por bloques de chunk_size.
+
+    Debe llamarse dentro de la transacción de run_locked_rooms, después de
+    validar las filas con las salas ya bloqueadas.
+
+    Returns:
+        int: Número de reservas creadas
+    """
+    Reservation.objects.bulk_create(
+        [
+            Reservation(
+                user=row['user_obj'],
+                room=row['room_obj'],
+                start_time=row['start_dt'],
+                end_time=row['end_dt'],
+                purpose=row['purpose'],
+                attendees_count=row['attendees_count'],
+                notes=row.get('notes', ''),
+                status='confirmed',
+            )
+            for row in rows
+        ],
+        batch_size=chunk_size,
+    )
+    return len(rows)
+
+
+def import_timetable(stream, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Importar un horario completo desde un archivo CSV.
+
+    Args:
+        stream: Archivo de texto abierto
+        dry_run (bool): Solo validar, sin escribir en la base de datos
+        chunk_size (int): Filas por sentencia INSERT
+
+    Returns:
+        dict: total, created, rejected (lista de filas con 'reason')
+
+    Raises:
+        BookingConflict: Si la base de datos rechaza un solapamiento (no se guarda nada)
+        OperationalError: Si la base de datos sigue bloqueada tras los reintentos
+    """
+    rows = read_rows(stream)
+    rooms = _resolve_rooms(rows)
+
+    if dry_run:
+        valid, rejected = validate_rows(rows, rooms)
+        created = 0
+    else:
+        def operation():
+            valid, rejected = validate_rows(rows, rooms)
+            return valid, rejected, write_reservations(valid, chunk_size=chunk_size)
+
+        valid, rejected, created = run_locked_rooms(
+            [room.id for room in rooms.values()], operation
+        )
+
+    if created:
+        now = timezone.now()
+        record_bookings((row['room_obj'].id, now) for row in valid)
+        # bulk_create no dispara señales
+        bump_schedule_versions(
+            room_ids=[row['room_obj'].id for row in valid],
+            user_ids=[row['user_obj'].id for row in valid],
+        )
+
+    logger.info(
+        f"Importación de horario: {len(rows)} filas, {len(valid)} válidas, "
+        f"{created} creadas, {len(rejected)} rechazadas"
+        f"{' (simulación)' if dry_run else ''}"
+    )
+    return {
+        'total': len(rows),
+        'valid': len(valid),
+        'created': created,
+        'rejected': rejected,
+    }
+
+
+def rejected_rows_csv(rejected, stream=None):
+    """
+    Escribir el reporte de filas rechazadas en formato CSV.
+
+    Returns:
+        El stream utilizado (un StringIO si no se indicó uno)
+    """
+    stream = stream or io.StringIO()
+    writer = csv.DictWriter(stream, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rejected)
+    return stream
@@ -36,6 +36,17 @@ user_urlpatterns = [
     # Calendario de reservas
     path('calendario/', views.calendar_view, name='calendar'),
     path('api/calendario/eventos/', views.calendar_events_api, name='calendar_events_api'),
+
+    # Estado en vivo de las salas (Server-Sent Events)
+    path('api/estado/', views.room_status_api, name='room_status_api'),
+    path('api/estado/stream/', views.room_status_stream, name='room_status_stream'),
+
+    # Búsqueda de horarios libres en múltiples salas
+    path('api/horarios-libres/', views.api_free_slots, name='api_free_slots'),
+
+    # Feeds iCalendar suscribibles (autenticados por token)
+    path('feeds/sala/<int:room_id>/<str:token>.ics', views.room_calendar_feed, name='room_calendar_feed'),
+    path('feeds/usuario/<str:token>.ics', views.user_calendar_feed, name='user_calendar_feed'),
 ]
 
 # URLs específicas para administradores (con prefijo 'admin/' protegido por middleware)
@@ -43,6 +54,8 @@ admin_urlpatterns = [
     path('admin/sala/crear/', views.admin_room_create, name='admin_room_create'),
     path('admin/sala/<int:room_id>/editar/', views.admin_room_edit, name='admin_room_edit'),
     path('admin/reservas/', views.reservation_list, name='reservation_admin'),
+    path('admin/reservas/exportar/', views.admin_reservation_export, name='admin_reservation_export'),
+    path('admin/horario/importar/', views.admin_timetable_import, name='admin_timetable_import'),
 ]
 
 # URLs para API endpoints (protegidas por middleware)
@@ -8,24 +8,61 @@ REQ-008: Manejo de errores y excepciones
 REQ-009: Logging y análisis de errores
 """
 
-from django.shortcuts import render, get_object_or_404, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.core.exceptions import ValidationError, PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db import transaction, IntegrityError
-from django.db.models import Q
-from django.http import JsonResponse, Http404
+from django.db import transaction, IntegrityError, OperationalError
+from django.db.models import F, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils import timezone
 from django.urls import reverse
 from datetime import datetime, timedelta, time
+import csv
+import io
 import logging
 
 from .models import Room, Reservation, Review
-from .forms import RoomForm, ReservationForm, ReviewForm, RoomSearchForm
+from .forms import MAX_ADVANCE_DAYS, RoomForm, ReservationForm, ReviewForm, RoomSearchForm, TimetableImportForm
+from core.config import config
+from core.rate_limit import RateLimitExceeded, enforce_rate_limit, rate_limited
+from core.route_policy import RATE_RESERVE, keep_cache_control
+from core.metrics import BOOKINGS_CANCELLED
+
+from .admission import BookingOverloaded, admission_controlled, get_retry_after
+from .booking import BookingConflict, book_reservation, is_lock_error
+from .idempotency import get_idempotency_key, idempotent_post, new_idempotency_key, remember_reservation
+from .calendar_events import (
+    aevents_fingerprint,
+    aload_event_rows,
+    avisible_room_ids,
+    build_events,
+    cache_digest,
+    events_queryset,
+    viewer_scope,
+)
+from .calendar_feeds import (
+    can_subscribe_to_room,
+    feed_token,
+    feed_validators,
+    render_feed,
+    user_from_feed_token,
+)
+from .export import filter_reservations, iter_csv, iter_ics
+from . import live_status
+from .room_cards import CARD_CACHE_TIMEOUT, prepare_room_cards
+from .timetable_import import import_timetable, TimetableImportError
 
 logger = logging.getLogger(__name__)
 
+# Filas rechazadas que se muestran en pantalla tras una importación
+IMPORT_REJECTED_PREVIEW = 200
+
 
 def is_admin(user):
     """Verificar si el usuario es administrador."""
@@ -229,8 +266,14 @@ def room_list(request):
                     # Si no hay salas permitidas, mostrar queryset vacío
                     rooms_queryset = Room.objects.none()
         
+        # Orden opcional por popularidad (columna indexada, sin agregar historial)
+        if form.is_valid() and form.cleaned_data.get('sort_by') == 'popular':
+            ordering = (F('popularity_score').desc(nulls_last=True), 'name')
+        else:
+            ordering = ('name',)
+        
         # Paginación después del filtrado
-        paginator = Paginator(rooms_queryset.order_by('name'), 12)
+        paginator = Paginator(rooms_queryset.order_by(*ordering), 12)
         page = request.GET.get('page')
         
         try:
@@ -242,23 +285,15 @@ def room_list(request):
         logger.info(
             f"Lista de salas consultada por {request.user.username if request.user.is_authenticated else 'anónimo'}"
         )
-          # Marcar las salas que el usuario puede reservar y agregar información de disponibilidad
+          # Marcar las salas que el usuario puede reservar
         if request.user.is_authenticated:
             for room in rooms:
                 room.user_can_reserve = room.can_be_reserved_by(request.user)
-                # Agregar información de disponibilidad contextual
-                availability_info = room.get_detailed_availability_status()
-                room.availability_status = availability_info['status']
-                room.availability_message = availability_info['message']
-                room.availability_context = availability_info['context']
-        else:
-            # Para usuarios no autenticados, también agregar info de disponibilidad
-            for room in rooms:
-                availability_info = room.get_detailed_availability_status()
-                room.availability_status = availability_info['status']
-                room.availability_message = availability_info['message']
-                room.availability_context = availability_info['context']
+        
+        # Disponibilidad, calificaciones y clave de caché de cada tarjeta (consultas en lote)
+        prepare_room_cards(rooms, request.user)
         context = {
+            'card_cache_timeout': CARD_CACHE_TIMEOUT,
             'rooms': rooms,
             'form': form,
             'total_rooms': rooms_queryset.count(),
@@ -352,6 +387,13 @@ def room_detail(request, room_id):
             'has_current_reservation': current_reservations.exists(),
             'room_availability_status': availability_info['status'],
             'availability_message': availability_info['message'],
+            'room_feed_url': (
+                request.build_absolute_uri(
+                    reverse('rooms:room_calendar_feed', args=[room.id, feed_token(request.user)])
+                )
+                if request.user.is_authenticated and can_subscribe_to_room(request.user, room)
+                else None
+            ),
             'availability_context': availability_info['context'],
             'daily_occupation_percentage': round(daily_occupation, 1),
             'room_is_open_now': room.is_open_now
@@ -367,6 +409,9 @@ def room_detail(request, room_id):
 
 @login_required
 @handle_exception
+@idempotent_post
+@rate_limited
+@admission_controlled
 def room_reserve(request, room_id):
     """Vista para reservar una sala."""
     try:
@@ -411,13 +456,37 @@ def room_reserve(request, room_id):
             # Asignar la sala antes de validar
             form.instance.room = room
             
+            if form.is_valid() and form.cleaned_data.get('recurrence'):
+                return _reserve_recurring(request, room, form)
+            
             if form.is_valid():
-                with transaction.atomic():
-                    reservation = form.save(commit=False)
-                    reservation.user = request.user
-                    reservation.room = room  # Asegurar que la sala se asigne correctamente
-                    reservation.status = 'confirmed'
-                    reservation.save()
+                reservation = form.save(commit=False)
+                reservation.user = request.user
+                reservation.room = room  # Asegurar que la sala se asigne correctamente
+                reservation.status = 'confirmed'
+                # Solo los intentos que llegan a escribir cuentan para el límite
+                enforce_rate_limit(request, RATE_RESERVE)
+                try:
+                    # Revalida el solapamiento y guarda bajo el bloqueo de la sala
+                    book_reservation(reservation)
+                except BookingConflict:
+                    logger.warning(
+                        f"Reserva rechazada por conflicto concurrente: {room.name} "
+                        f"por {request.user.username} "
+                        f"({reservation.start_time} - {reservation.end_time})"
+                    )
+                    form.add_error(
+                        None,
+                        "Otro usuario acaba de reservar la sala en ese horario. "
+                        "Por favor, selecciona otro horario."
+                    )
+                except OperationalError as e:
+                    # La base de datos siguió bloqueada tras los reintentos
+                    if not is_lock_error(e):
+                        raise
+                    raise BookingOverloaded(get_retry_after()) from e
+                else:
+                    remember_reservation(request, reservation.id)
                     
                     # NUEVO: Registrar la acción de seguridad
                     try:
@@ -485,17 +554,148 @@ def room_reserve(request, room_id):
             'form': form,
             'security_rules': security_rules,
             'rate_allowed': rate_allowed,
-            'has_security_info': security_rules is not None
+            'has_security_info': security_rules is not None,
+            # Se conserva al re-mostrar un formulario inválido para que su reenvío siga siendo idempotente
+            'idempotency_key': get_idempotency_key(request) or new_idempotency_key()
         }
         
         return render(request, 'rooms/room_reserve.html', context)
     
+    except (BookingOverloaded, RateLimitExceeded):
+        raise
     except Exception as e:
         logger.error(f"Error en room_reserve: {str(e)}", exc_info=True)
         messages.error(request, "Error al procesar la reserva.")
         return redirect('rooms:room_detail', room_id=room_id)
 
 
+def _reserve_recurring(request, room, form):
+    """
+    Crear una serie de reservas recurrentes a partir de un formulario válido.
+    
+    Las ocurrencias libres se insertan en lote y las que chocan con
+    reservas existentes se informan una a una.
+    """
+    from .recurrence import expand_occurrences, create_recurring_reservations
+    
+    data = form.cleaned_data
+    occurrences, excluded = expand_occurrences(
+        data['start_time'],
+        data['end_time'],
+        data['recurrence'],
+        data['recurrence_until'],
+        data['recurrence_exclusions']
+    )
+    
+    # Cada ocurrencia cuenta contra los límites, igual que una reserva individual
+    try:
+        from core.reservation_security import SecurityManager
+        series_allowed, series_violations = SecurityManager.check_series_limits(
+            request.user, occurrences
+        )
+    except ImportError:
+        series_allowed, series_violations = True, []
+    if not series_allowed:
+        SecurityManager.log_action(
+            user=request.user,
+            action='attempt_blocked',
+            room_name=room.name,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            additional_data={
+                'recurrence': data['recurrence'],
+                'occurrences': len(occurrences),
+                'violations': [v['type'] for v in series_violations]
+            }
+        )
+        if request.headers.get('Accept', '').startswith('application/json'):
+            return JsonResponse({
+                'error': 'Límites de seguridad excedidos',
+                'violations': [v['message'] for v in series_violations]
+            }, status=429)
+        for violation in series_violations:
+            messages.error(request, f"Límite excedido: {violation['message']}")
+        return redirect('rooms:room_detail', room_id=room.id)
+    
+    enforce_rate_limit(request, RATE_RESERVE)
+    try:
+        report = create_recurring_reservations(
+            user=request.user,
+            room=room,
+            occurrences=occurrences,
+            purpose=data['purpose'],
+            attendees_count=data['attendees_count'],
+            notes=data.get('notes', '')
+        )
+    except OperationalError as e:
+        # La base de datos siguió bloqueada tras los reintentos
+        if not is_lock_error(e):
+            raise
+        raise BookingOverloaded(get_retry_after()) from e
+    created = [entry for entry in report if entry['status'] == 'created']
+    conflicts = [entry for entry in report if entry['status'] == 'conflict']
+    if created:
+        remember_reservation(request, created[0]['reservation_id'])
+    
+    try:
+        from core.reservation_security import SecurityManager
+        SecurityManager.log_action(
+            user=request.user,
+            action='create',
+            room_name=room.name,
+            reservation_id=created[0]['reservation_id'] if created else None,
+            ip_address=request.META.get('REMOTE_ADDR'),
+            user_agent=request.META.get('HTTP_USER_AGENT', ''),
+            additional_data={
+                'recurrence': data['recurrence'],
+                'created': len(created),
+                'conflicts': len(conflicts),
+                'excluded': len(excluded)
+            }
+        )
+    except ImportError:
+        pass
+    
+    if request.headers.get('Accept', '').startswith('application/json'):
+        return JsonResponse({
+            'created': len(created),
+            'conflicts': len(conflicts),
+            'excluded': [day.isoformat() for day in excluded],
+            'occurrences': [
+                {
+                    'start': entry['start'].isoformat(),
+                    'end': entry['end'].isoformat(),
+                    'status': entry['status'],
+                    'reservation_id': entry['reservation_id'],
+                    'conflict_with': entry['conflict_with'] and {
+                        'id': entry['conflict_with']['id'],
+                        'start': timezone.localtime(entry['conflict_with']['start']).isoformat(),
+                        'end': timezone.localtime(entry['conflict_with']['end']).isoformat()
+                    }
+                }
+                for entry in report
+            ]
+        }, status=201 if created else 409)
+    
+    if created:
+        messages.success(
+            request,
+            f"Serie recurrente creada: {len(created)} reservas confirmadas en {room.name}."
+        )
+    for entry in conflicts:
+        local_start = timezone.localtime(entry['start'])
+        messages.warning(
+            request,
+            f"No se reservó el {local_start.strftime('%d/%m/%Y %H:%M')}: "
+            f"conflicto con una reserva existente."
+        )
+    
+    if not created:
+        messages.error(request, "Ninguna ocurrencia de la serie estaba disponible.")
+        return redirect('rooms:room_detail', room_id=room.id)
+    return redirect('rooms:reservation_list')
+
+
 @login_required
 @handle_exception
 def reservation_list(request):
@@ -622,8 +822,11 @@ def reservation_cancel(request, reservation_id):
         if request.method == 'POST':
             with transaction.atomic():
                 reservation.status = 'cancelled'
+                # La señal post_save retira su aporte al ranking de popularidad
                 reservation.save()
                 
+                BOOKINGS_CANCELLED.inc()
+                
                 logger.info(
                     f"Reserva #{reservation_id} cancelada por {request.user.username} "
                     f"- Sala: {reservation.room.name}"
@@ -823,18 +1026,131 @@ def admin_room_edit(request, room_id):
         return redirect('rooms:room_detail', room_id=room_id)
 
 
+@user_passes_test(is_admin)
+@handle_exception
+def admin_timetable_import(request):
+    """
+    Vista para importar el horario escolar desde CSV (solo administradores).
+
+    Valida todas las filas en lote, crea las reservas válidas (salvo en modo
+    simulación) y muestra un resumen con las filas rechazadas y su motivo.
+    """
+    result = None
+
+    if request.method == 'POST':
+        form = TimetableImportForm(request.POST, request.FILES)
+
+        if form.is_valid():
+            dry_run = form.cleaned_data['dry_run']
+            stream = io.TextIOWrapper(form.cleaned_data['csv_file'].file, encoding='utf-8-sig')
+            try:
+                result = import_timetable(stream, dry_run=dry_run)
+            except (TimetableImportError, UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f"No se pudo procesar el archivo: {str(e)}")
+            except BookingConflict:
+                messages.error(
+                    request,
+                    "Otra reserva ocupó una de las franjas durante la importación. "
+                    "No se guardó ninguna fila; vuelve a intentarlo."
+                )
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                messages.error(
+                    request,
+                    "La base de datos está ocupada. No se guardó ninguna fila; vuelve a intentarlo."
+                )
+            else:
+                result['dry_run'] = dry_run
+                result['rejected_shown'] = result['rejected'][:IMPORT_REJECTED_PREVIEW]
+
+                logger.info(
+                    f"Importación de horario por {request.user.username}: "
+                    f"{result['created']} creadas, {len(result['rejected'])} rechazadas"
+                )
+                if dry_run:
+                    messages.info(
+                        request,
+                        f"Simulación: {result['valid']} de {result['total']} filas son válidas."
+                    )
+                else:
+                    messages.success(request, f"Se crearon {result['created']} reservas.")
+    else:
+        form = TimetableImportForm()
+
+    context = {
+        'form': form,
+        'result': result,
+        'preview_limit': IMPORT_REJECTED_PREVIEW,
+    }
+    return render(request, 'rooms/admin/timetable_import.html', context)
+
+
+@user_passes_test(is_admin)
+@handle_exception
+def admin_reservation_export(request):
+    """
+    Exportar reservas en CSV o iCalendar (solo administradores).
+
+    Parámetros GET: format (csv | ics), room (ID), user (nombre de usuario),
+    date_from, date_to (AAAA-MM-DD) y status. La respuesta se transmite
+    por bloques, por lo que no se carga el resultado completo en memoria.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'ics'):
+        messages.error(request, "Formato de exportación no soportado.")
+        return redirect('rooms:reservation_admin')
+
+    filters = {}
+    try:
+        if request.GET.get('room'):
+            filters['room'] = int(request.GET['room'])
+        for param in ('date_from', 'date_to'):
+            if request.GET.get(param):
+                filters[param] = datetime.strptime(request.GET[param], '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, "Parámetros de exportación inválidos.")
+        return redirect('rooms:reservation_admin')
+
+    status_filter = request.GET.get('status')
+    if status_filter and status_filter in dict(Reservation.STATUS_CHOICES):
+        filters['status'] = status_filter
+
+    queryset = Reservation.objects.all()
+    if request.GET.get('user'):
+        queryset = queryset.filter(user__username=request.GET['user'])
+    queryset = filter_reservations(queryset, **filters)
+
+    logger.info(
+        f"Exportación de reservas ({export_format}) por {request.user.username}: "
+        f"filtros {filters}"
+    )
+
+    stamp = timezone.localdate().strftime('%Y%m%d')
+    if export_format == 'ics':
+        response = StreamingHttpResponse(
+            iter_ics(queryset, uid_domain=request.get_host().split(':')[0]),
+            content_type='text/calendar; charset=utf-8',
+        )
+    else:
+        response = StreamingHttpResponse(iter_csv(queryset), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="reservas_{stamp}.{export_format}"'
+    return response
+
+
 # API endpoints para AJAX
 
 @login_required
-def api_room_availability(request, room_id):
+async def api_room_availability(request, room_id):
     """
     API endpoint para verificar disponibilidad de sala.
     
     Retorna información de disponibilidad en formato JSON
-    para uso con JavaScript en el frontend.
+    para uso con JavaScript en el frontend. Es una vista asíncrona: bajo
+    ASGI las consultas de sondeo no ocupan un hilo del servidor.
     """
     try:
-        room = get_object_or_404(Room, id=room_id, is_active=True)
+        room = await aget_object_or_404(Room, id=room_id, is_active=True)
         
         date_str = request.GET.get('date')
         start_time_str = request.GET.get('start_time')
@@ -855,7 +1171,7 @@ def api_room_availability(request, room_id):
         end_datetime = datetime.combine(date_obj, end_time_obj)
         
         # Verificar disponibilidad
-        is_available = room.is_available_at(start_datetime, end_datetime)
+        is_available = await room.ais_available_at(start_datetime, end_datetime)
         
         response_data = {
             'available': is_available,
@@ -865,15 +1181,11 @@ def api_room_availability(request, room_id):
         
         if not is_available:
             # Encontrar conflictos específicos
-            conflicts = room.reservations.filter(
-                status__in=['confirmed', 'in_progress'],
-                start_time__lt=end_datetime,
-                end_time__gt=start_datetime
-            ).values(
+            conflicts = room.overlapping_reservations(start_datetime, end_datetime).values(
                 'start_time', 'end_time', 'user__username'
             )
             
-            response_data['conflicts'] = list(conflicts)
+            response_data['conflicts'] = [conflict async for conflict in conflicts]
         
         return JsonResponse(response_data)
     
@@ -885,6 +1197,139 @@ def api_room_availability(request, room_id):
         })
 
 
+@login_required
+def room_status_stream(request):
+    """
+    Flujo Server-Sent Events con el estado en vivo de las salas.
+
+    Envía primero un evento "snapshot" con el estado de todas las salas
+    activas y luego un evento "status" por cada cambio (ver
+    rooms/live_status.py). Bajo ASGI la espera de eventos no ocupa un
+    hilo. Bajo WSGI las páginas no abren el flujo (consultan
+    room_status_api); si un cliente lo abre igual, cada conexión ocupa un
+    hilo hasta 'live.wsgi_stream_max_age', por lo que se admiten a lo más
+    'live.wsgi_max_streams' por proceso y el resto recibe 503.
+    """
+    bus = live_status.room_status_bus
+    if isinstance(request, ASGIRequest):
+        max_age = config.get('live.stream_max_age').total_seconds()
+        stream = live_status.AsyncEventStream(bus, max_age)
+    else:
+        if not live_status.wsgi_stream_slots.acquire(config.get('live.wsgi_max_streams')):
+            retry_after = int(config.get('live.client_poll_interval').total_seconds())
+            response = HttpResponse(
+                f'retry: {retry_after * 1000}\n\n',
+                status=503,
+                content_type='text/event-stream; charset=utf-8',
+            )
+            response['Retry-After'] = str(retry_after)
+            return response
+        max_age = config.get('live.wsgi_stream_max_age').total_seconds()
+        stream = live_status.SyncEventStream(bus, max_age)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    # Evita que nginx acumule los eventos en su búfer
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+async def room_status_api(request):
+    """
+    API endpoint con el estado actual de las salas activas.
+
+    Mismo formato que el evento "snapshot" del flujo room_status_stream;
+    las páginas servidas por WSGI la consultan periódicamente en lugar de
+    mantener abierto el flujo.
+    """
+    statuses = await sync_to_async(live_status.active_room_statuses)()
+    response = JsonResponse({'rooms': {str(room_id): status for room_id, status in statuses.items()}})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def api_free_slots(request):
+    """
+    API endpoint para buscar horarios libres en todas las salas elegibles.
+
+    Parámetros GET:
+        date_from, date_to (YYYY-MM-DD): Rango de búsqueda (máximo 31 días),
+            acotado a los bloques que ReservationForm acepta: desde ahora
+            hasta MAX_ADVANCE_DAYS días de anticipación
+        duration (int): Duración requerida en minutos (default: 60)
+        min_capacity (int): Capacidad mínima de la sala (opcional)
+        room_type (str): Tipo de sala (opcional)
+        limit (int): Número de bloques a retornar (default: 10, máximo 50)
+
+    Retorna los primeros bloques libres entre las salas que el usuario
+    puede reservar, calculados con una sola consulta de reservas.
+    """
+    from .availability import find_free_slots
+
+    try:
+        today = timezone.localdate()
+        date_from_str = request.GET.get('date_from')
+        date_to_str = request.GET.get('date_to')
+        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date() if date_from_str else today
+        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date() if date_to_str else date_from + timedelta(days=7)
+        duration_minutes = int(request.GET.get('duration', 60))
+        min_capacity = int(request.GET['min_capacity']) if request.GET.get('min_capacity') else None
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except ValueError:
+        return JsonResponse({
+            'error': 'Parámetros inválidos: use fechas YYYY-MM-DD y valores numéricos'
+        }, status=400)
+
+    room_type = request.GET.get('room_type')
+    if date_to < date_from or (date_to - date_from).days > 31:
+        return JsonResponse({'error': 'El rango de fechas debe ser de 0 a 31 días'}, status=400)
+    if not 1 <= duration_minutes <= 8 * 60:
+        return JsonResponse({'error': 'La duración debe estar entre 1 y 480 minutos'}, status=400)
+
+    try:
+        rooms_queryset = Room.objects.filter(is_active=True)
+        if min_capacity:
+            rooms_queryset = rooms_queryset.filter(capacity__gte=min_capacity)
+        if room_type:
+            rooms_queryset = rooms_queryset.filter(room_type=room_type)
+
+        # Permisos por rol evaluados en memoria (sin consultas adicionales)
+        eligible_rooms = [room for room in rooms_queryset if room.can_be_reserved_by(request.user)]
+
+        # Mismos límites que ReservationForm.clean_start_time
+        now = timezone.now()
+        duration = timedelta(minutes=duration_minutes)
+        range_start = max(timezone.make_aware(datetime.combine(date_from, time.min)), now)
+        range_end = min(
+            timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min)),
+            now + timedelta(days=MAX_ADVANCE_DAYS) + duration
+        )
+        slots = find_free_slots(
+            eligible_rooms,
+            range_start,
+            range_end,
+            duration,
+            limit=limit,
+            now=now
+        )
+
+        for slot in slots:
+            for key in ('start', 'end', 'free_until'):
+                slot[key] = timezone.localtime(slot[key]).isoformat()
+
+        return JsonResponse({
+            'slots': slots,
+            'rooms_considered': len(eligible_rooms),
+            'duration_minutes': duration_minutes,
+        })
+
+    except Exception as e:
+        logger.error(f"Error en api_free_slots: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'Error al buscar horarios libres'}, status=500)
+
+
 @handle_exception
 def error_404(request, exception):
     """Vista personalizada para error 404."""
@@ -1091,12 +1536,15 @@ def calendar_view(request):
             # Solo administradores ven todas las salas disponibles
             if request.user.is_superuser or (hasattr(request.user, 'is_admin') and request.user.is_admin()):
                 available_rooms = available_rooms_all
+                available_scope = None
             else:
                 # Para otros usuarios, solo mostrar salas que pueden reservar
                 user_reservable_room_ids = [room.id for room in user_reservable_rooms]
                 available_rooms = available_rooms_all.filter(id__in=user_reservable_room_ids)
+                available_scope = user_reservable_rooms
         else:
             available_rooms = available_rooms_all
+            available_scope = None
         
         context = {
             'rooms': user_reservable_rooms,  # Solo salas que el usuario puede reservar
@@ -1108,9 +1556,14 @@ def calendar_view(request):
             'total_rooms': total_rooms,
             'occupied_now': occupied_now,
             'available_rooms': available_rooms,
+            # Salas que el estado en vivo cuenta como "Disponibles" (None: todas)
+            'available_scope': available_scope,
             'occupation_percentage': round((occupied_now / total_rooms * 100) if total_rooms > 0 else 0),
             'start_of_week': start_of_week.date(),
             'end_of_week': end_of_week.date(),
+            'feed_url': request.build_absolute_uri(
+                reverse('rooms:user_calendar_feed', args=[feed_token(request.user)])
+            ),
         }
         
         return render(request, 'rooms/calendar.html', context)
@@ -1122,14 +1575,21 @@ def calendar_view(request):
 
 
 @login_required
-@handle_exception  
-def calendar_events_api(request):
+async def calendar_events_api(request):
     """
     API endpoint para obtener eventos del calendario en formato JSON.
     
-    Retorna las reservas en formato compatible con FullCalendar.js
+    Retorna las reservas en formato compatible con FullCalendar.js.
+    Responde 304 si la huella del conjunto de reservas no cambió desde la
+    consulta anterior del cliente (ver rooms/calendar_events.py). Es una
+    vista asíncrona: bajo ASGI los sondeos del calendario no ocupan un hilo
+    del servidor mientras esperan a la base de datos o a la caché.
     """
+    # Su Cache-Control (private, no-cache) permite revalidar con el ETag
+    keep_cache_control(request)
     try:
+        user = await request.auser()
+
         # Obtener parámetros de fecha del request
         start_date = request.GET.get('start')
         end_date = request.GET.get('end')
@@ -1144,80 +1604,51 @@ def calendar_events_api(request):
         
         # Filtros opcionales
         room_id = request.GET.get('room_id')
-        show_all = request.GET.get('show_all', 'false').lower() == 'true'        # Determinar qué salas mostrar según el rol del usuario
-        if request.user.is_superuser or (hasattr(request.user, 'is_admin') and request.user.is_admin()):
-            # Los administradores pueden ver todas las salas
-            available_rooms = Room.objects.filter(is_active=True)
-            user_reservable_room_ids = list(available_rooms.values_list('id', flat=True))
-        else:
-            # Usuarios normales solo ven salas que pueden reservar
-            available_rooms = Room.objects.filter(is_active=True)
-            user_reservable_room_ids = [
-                room.id for room in available_rooms 
-                if room.can_be_reserved_by(request.user)
-            ]
-        
-        # Construir query base - filtrar por salas según permisos
-        reservations_query = Reservation.objects.filter(
-            start_time__date__gte=start_dt,
-            start_time__date__lte=end_dt,
-            status__in=['confirmed', 'in_progress', 'pending'],
-            room_id__in=user_reservable_room_ids
-        ).select_related('room', 'user')
+        show_all = request.GET.get('show_all', 'false').lower() == 'true'
+
+        # Salas visibles según el rol del usuario (cacheadas por rol)
+        user_reservable_room_ids = await avisible_room_ids(user)
         
         # Filtrar por sala si se especifica (y si el usuario puede verla)
         if room_id:
-            if int(room_id) in user_reservable_room_ids:
-                reservations_query = reservations_query.filter(room_id=room_id)
-            else:
+            room_id = int(room_id)
+            if room_id not in user_reservable_room_ids:
                 # Si el usuario no puede ver esta sala, no mostrar nada
-                reservations_query = reservations_query.none()
+                return JsonResponse([], safe=False)
+        else:
+            room_id = None
         
         # Si no es admin y no se especifica show_all, mostrar solo las del usuario
-        if not show_all and not request.user.is_staff:
-            reservations_query = reservations_query.filter(user=request.user)
-        
-        # Construir eventos para FullCalendar
-        events = []
-        for reservation in reservations_query:
-            # Determinar color según estado
-            color_map = {
-                'confirmed': '#28a745',    # Verde
-                'in_progress': '#dc3545',  # Rojo
-                'pending': '#ffc107',      # Amarillo
-            }
-            
-            event = {
-                'id': reservation.id,
-                'title': f"{reservation.room.name}",
-                'start': reservation.start_time.isoformat(),
-                'end': reservation.end_time.isoformat(),
-                'backgroundColor': color_map.get(reservation.status, '#6c757d'),
-                'borderColor': color_map.get(reservation.status, '#6c757d'),                'textColor': '#ffffff',
-                'extendedProps': {
-                    'status': reservation.status,
-                    'room_id': reservation.room.id,
-                    'room_name': reservation.room.name,
-                    'user_name': reservation.user.get_full_name() or reservation.user.username,
-                    'purpose': reservation.purpose,
-                    'attendees': reservation.attendees_count,
-                    'can_edit': reservation.user == request.user or request.user.is_staff,
-                }
-            }
-            
-            # Agregar información del usuario si es admin o si es el dueño
-            if request.user.is_staff or reservation.user == request.user:
-                event['title'] += f" - {reservation.user.get_full_name() or reservation.user.username}"
-            
-            events.append(event)
-        
-        return JsonResponse(events, safe=False)
+        only_own = not show_all and not user.is_staff
+        reservations_query = events_queryset(
+            user_reservable_room_ids,
+            start_dt,
+            end_dt,
+            room_id=room_id,
+            user=user if only_own else None,
+        )
+
+        # Huella barata del conjunto: si no cambió, el cliente conserva su copia
+        fingerprint = await aevents_fingerprint(reservations_query)
+        scope = f"user-{user.id}" if only_own else viewer_scope(user)
+        rows_digest = cache_digest(scope, start_dt, end_dt, room_id, fingerprint)
+        etag = f'"{cache_digest(rows_digest, user.id, user.is_staff)}"'
+
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        events = build_events(await aload_event_rows(reservations_query, rows_digest), user)
+
+        response = JsonResponse(events, safe=False)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         logger.error(f"Error en calendar_events_api: {str(e)}", exc_info=True)
         return JsonResponse({'error': 'Error al cargar eventos'}, status=500)
 
-
 def room_reviews(request, room_id):
     """Vista para mostrar todas las reseñas de una sala específica."""
     room = get_object_or_404(Room, id=room_id)
@@ -1279,3 +1710,51 @@ def room_reviews(request, room_id):
     }
     
     return render(request, 'rooms/room_reviews.html', context)
+
+
+# Feeds iCalendar suscribibles (autenticados por token, sin sesión)
+
+def _calendar_feed_response(request, scope, pk, calendar_name):
+    """
+    Responder un feed iCalendar con soporte de GET condicional.
+
+    El ETag y Last-Modified salen de la versión de horario en caché, por lo
+    que un cliente sin cambios recibe 304 sin consultar las reservas.
+    """
+    version, etag, last_modified = feed_validators(scope, pk)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    domain = request.get_host().split(':')[0]
+    response = HttpResponse(
+        render_feed(scope, pk, version, calendar_name, domain),
+        content_type='text/calendar; charset=utf-8',
+    )
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+def room_calendar_feed(request, room_id, token):
+    """Feed iCalendar con las reservas de una sala."""
+    user = user_from_feed_token(token)
+    if user is None:
+        raise Http404("Feed no encontrado")
+
+    room = get_object_or_404(Room, id=room_id, is_active=True)
+    if not can_subscribe_to_room(user, room):
+        logger.warning(f"Suscripción denegada al feed de {room.name} para {user.username}")
+        raise Http404("Feed no encontrado")
+
+    return _calendar_feed_response(request, 'room', room.id, f'Reservas - {room.name}')
+
+
+def user_calendar_feed(request, token):
+    """Feed iCalendar con las reservas del usuario dueño del token."""
+    user = user_from_feed_token(token)
+    if user is None:
+        raise Http404("Feed no encontrado")
+
+    return _calendar_feed_response(request, 'user', user.id, f'Mis reservas - {user.username}')
@@ -0,0 +1,466 @@
+"""
+Generador de datos sintéticos a gran escala para pruebas de rendimiento.
+
+setup_reservas crea unas decenas de reservas de demostración, una a una y
+con reintentos. Este comando genera usuarios, salas, reservas, reseñas y
+registros de uso en volúmenes de producción (1M de reservas en minutos):
+
+- Distribuciones realistas: mezcla de roles, tipos de sala con sus propios
+  roles, duraciones y asistentes; más reservas de lunes a viernes y en
+  horario de clases, menos a la hora de almuerzo y en la tarde.
+- Sin solapamientos por construcción: cada día de cada sala es una línea de
+  tiempo de bloques de 15 minutos y una reserva solo se ubica en bloques
+  libres, por lo que nunca se consulta la base de datos para validar.
+- Inserción por lotes con bulk_create, una transacción por lote. Las
+  reservas futuras (bloqueantes) se insertan antes que el historial: así el
+  trigger reservation_no_overlap solo compara cada una con las otras
+  reservas bloqueantes de su sala, y el historial (completadas o
+  canceladas) no lo activa.
+
+Las fechas de creación se conservan (una reserva se crea días antes de su
+inicio, una reseña después de su término). Al final se invalidan las
+cachés que dependen de señales (bulk_create no las dispara) y se recalcula
+la popularidad de las salas.
+
+Solo se ejecuta con DEBUG activo. Todos los usuarios generados comparten
+una contraseña aleatoria que se muestra una única vez al terminar.
+
+Ejemplo:
+
+    python manage.py generar_datos --reservas 1000000 --usuarios 5000 --salas 700
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import random
+import secrets
+import time as time_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.reservation_security import ReservationUsageLog
+from rooms.calendar_events import invalidate_visible_rooms
+from rooms.calendar_feeds import bump_schedule_versions
+from rooms.models import Reservation, Review, Room
+from rooms.popularity import rebuild_scores
+
+User = get_user_model()
+
+# Línea de tiempo diaria de las salas: 08:00 a 22:00 en bloques de 15 minutos
+OPENING = time(8, 0)
+CLOSING = time(22, 0)
+SLOT_MINUTES = 15
+DAY_SLOTS = (CLOSING.hour - OPENING.hour) * 60 // SLOT_MINUTES
+
+# Proporción de usuarios por rol
+ROLE_MIX = {'estudiante': 0.78, 'profesor': 0.16, 'soporte': 0.03, 'admin': 0.03}
+
+# Reservas relativas por día de la semana (lunes = 0)
+WEEKDAY_WEIGHTS = (1.0, 1.0, 1.0, 1.0, 0.85, 0.2, 0.05)
+
+# Reservas relativas por hora de inicio: bloques de clase en la mañana y la
+# tarde, baja a la hora de almuerzo y después de las 17:00
+HOUR_WEIGHTS = {
+    8: 1.0, 9: 1.0, 10: 1.0, 11: 0.9, 12: 0.5, 13: 0.45, 14: 0.9,
+    15: 0.9, 16: 0.7, 17: 0.45, 18: 0.3, 19: 0.2, 20: 0.1, 21: 0.05,
+}
+
+# Las reservas suelen comenzar a la hora en punto o a la media
+ALIGNMENT_WEIGHTS = {0: 1.0, 30: 0.4, 15: 0.1, 45: 0.1}
+
+# Tipo de sala -> proporción de salas, peso de demanda, capacidad, duraciones
+# en minutos, roles que reservan (con su peso) y propósitos
+ROOM_PROFILES = {
+    'aula': {
+        'share': 0.35, 'demand': 1.3, 'capacity': (25, 45), 'durations': (90, 90, 135, 45),
+        'roles': {'profesor': 0.92, 'admin': 0.08},
+        'purposes': ('Clase de Matemáticas', 'Clase de Historia', 'Clase de Ciencias Naturales',
+                     'Clase de Lenguaje', 'Reforzamiento', 'Evaluación'),
+    },
+    'laboratorio_ciencias': {
+        'share': 0.07, 'demand': 1.0, 'capacity': (20, 32), 'durations': (90, 135),
+        'roles': {'profesor': 0.95, 'admin': 0.05},
+        'purposes': ('Práctica de Química', 'Práctica de Biología', 'Experimento de Física'),
+    },
+    'laboratorio_informatica': {
+        'share': 0.07, 'demand': 1.1, 'capacity': (20, 36), 'durations': (90, 135, 180),
+        'roles': {'profesor': 0.7, 'estudiante': 0.2, 'soporte': 0.1},
+        'purposes': ('Clase de Programación', 'Taller de Robótica', 'Práctica de programación',
+                     'Mantenimiento de equipos'),
+    },
+    'biblioteca': {
+        'share': 0.16, 'demand': 1.2, 'capacity': (2, 12), 'durations': (60, 90, 120, 180),
+        'roles': {'estudiante': 0.8, 'profesor': 0.2},
+        'purposes': ('Estudio personal de exámenes', 'Trabajo en grupo', 'Investigación bibliográfica',
+                     'Preparación de presentación'),
+    },
+    'sala_profesores': {
+        'share': 0.05, 'demand': 0.6, 'capacity': (8, 20), 'durations': (45, 60, 90),
+        'roles': {'profesor': 1.0},
+        'purposes': ('Planificación de clases', 'Corrección de evaluaciones', 'Atención de apoderados'),
+    },
+    'auditorio': {
+        'share': 0.03, 'demand': 0.4, 'capacity': (120, 300), 'durations': (60, 120, 180),
+        'roles': {'admin': 0.5, 'profesor': 0.5},
+        'purposes': ('Acto académico', 'Conferencia educativa', 'Presentación de proyectos'),
+    },
+    'equipamiento': {
+        'share': 0.17, 'demand': 0.9, 'capacity': (1, 1), 'durations': (45, 90, 135),
+        'roles': {'profesor': 0.75, 'soporte': 0.25},
+        'purposes': ('Uso de proyector para presentación', 'Uso de tablets en clase', 'Préstamo de notebook'),
+    },
+    'sala_reunion': {
+        'share': 0.10, 'demand': 0.8, 'capacity': (6, 16), 'durations': (30, 60, 90),
+        'roles': {'profesor': 0.5, 'admin': 0.3, 'soporte': 0.2},
+        'purposes': ('Reunión de coordinación académica', 'Consejo de profesores', 'Reunión del equipo técnico'),
+    },
+}
+
+# Estado final de las reservas según su horario respecto de ahora
+PAST_STATUSES = {'completed': 0.9, 'cancelled': 0.1}
+CURRENT_STATUSES = {'in_progress': 0.95, 'cancelled': 0.05}
+FUTURE_STATUSES = {'confirmed': 0.85, 'pending': 0.05, 'cancelled': 0.1}
+
+RATING_WEIGHTS = {1: 0.03, 2: 0.06, 3: 0.16, 4: 0.38, 5: 0.37}
+REVIEW_COMMENTS = {
+    'positive': ('Sala limpia y bien equipada.', 'Todo funcionó perfecto.', ''),
+    'neutral': ('Cumplió su propósito.', ''),
+    'suggestion': ('Faltan enchufes cerca de las mesas.', 'Sería útil un segundo proyector.'),
+    'problem': ('El proyector no encendía.', 'La sala estaba ocupada al llegar.', 'Hacía mucho frío.'),
+}
+
+USER_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/126.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_5) Safari/605.1.15',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) Mobile/15E148',
+    'Mozilla/5.0 (Linux; Android 14) Chrome/126.0 Mobile',
+)
+
+
+def weighted(options):
+    """(valores, pesos acumulados) para random.choices."""
+    values = list(options)
+    cumulative, total = [], 0.0
+    for value in values:
+        total += options[value]
+        cumulative.append(total)
+    return values, cumulative
+
+
+def slot_weight(slot):
+    minutes = slot * SLOT_MINUTES
+    return HOUR_WEIGHTS[OPENING.hour + minutes // 60] * ALIGNMENT_WEIGHTS[minutes % 60]
+
+
+SLOT_WEIGHTS = [slot_weight(slot) for slot in range(DAY_SLOTS)]
+
+# Fracción máxima del horario de una sala que se reserva en un día hábil;
+# sobre ese nivel los bloques libres quedan fragmentados y no caben reservas
+MAX_FILL = 0.6
+
+
+@contextmanager
+def preserved_timestamps(*models):
+    """Desactivar auto_now/auto_now_add para insertar fechas históricas."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generar usuarios, salas, reservas, reseñas y registros de uso sintéticos a gran escala'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=2000,
+                            help='Usuarios a crear (default: 2000)')
+        parser.add_argument('--salas', type=int, default=200,
+                            help='Salas a crear (default: 200)')
+        parser.add_argument('--reservas', type=int, default=100000,
+                            help='Reservas aproximadas a crear (default: 100000)')
+        parser.add_argument('--dias-historial', type=int, default=365,
+                            help='Días hacia atrás con reservas pasadas (default: 365)')
+        parser.add_argument('--dias-futuro', type=int, default=30,
+                            help='Días hacia adelante con reservas futuras (default: 30)')
+        parser.add_argument('--proporcion-resenas', type=float, default=0.15,
+                            help='Fracción de reservas completadas con reseña (default: 0.15)')
+        parser.add_argument('--lote', type=int, default=10000,
+                            help='Reservas por transacción (default: 10000)')
+        parser.add_argument('--prefijo', default='sint',
+                            help="Prefijo de usuarios y salas generados (default: 'sint')")
+        parser.add_argument('--semilla', type=int,
+                            help='Semilla aleatoria para repetir el mismo conjunto de datos')
+
+    def handle(self, *args, **options):
+        if options['usuarios'] < 1 or options['salas'] < 1 or options['lote'] < 1:
+            raise CommandError('--usuarios, --salas y --lote deben ser al menos 1')
+        if options['dias_historial'] < 0 or options['dias_futuro'] < 0:
+            raise CommandError('--dias-historial y --dias-futuro no pueden ser negativos')
+        if not settings.DEBUG:
+            raise CommandError(
+                'generar_datos crea miles de usuarios (algunos administradores) en la base de datos '
+                'configurada: solo se ejecuta con DEBUG activo'
+            )
+        prefix = options['prefijo']
+        if (User.objects.filter(username__startswith=f'{prefix}_').exists()
+                or Room.objects.filter(name__startswith=f'{prefix.upper()} ').exists()):
+            raise CommandError(
+                f"Ya existen datos con el prefijo '{prefix}'. Usa otro --prefijo o una base de datos nueva."
+            )
+
+        self.random = random.Random(options['semilla'])
+        self.now = timezone.now()
+        self.lote = options['lote']
+        self.review_ratio = options['proporcion_resenas']
+        self.totals = {'reservas': 0, 'reseñas': 0, 'registros': 0}
+        started = time_module.perf_counter()
+
+        self.stdout.write("🏭 Generando datos sintéticos...")
+        password = secrets.token_urlsafe(16)
+        users_by_role = self.create_users(options['usuarios'], prefix, password)
+        rooms = self.create_rooms(options['salas'], prefix)
+        self.room_names = {room.id: room.name for room in rooms}
+
+        today = timezone.localdate()
+        history = [today - timedelta(days=offset) for offset in range(options['dias_historial'], 0, -1)]
+        future = [today + timedelta(days=offset) for offset in range(options['dias_futuro'] + 1)]
+        demand = self.room_day_demand(rooms, history + future, options['reservas'])
+        target = round(sum(demand.values()) * sum(WEEKDAY_WEIGHTS[day.weekday()] for day in history + future))
+        if target < options['reservas'] * 0.98:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Las salas admiten ~{target} reservas en el período: "
+                "aumenta --salas o --dias-historial para llegar a las pedidas"
+            ))
+
+        self.stdout.write(f"📅 Generando ~{target} reservas en {len(history) + len(future)} días...")
+        self.last_report = started
+        self.pending = []
+        with preserved_timestamps(Reservation, Review, ReservationUsageLog):
+            # Primero las bloqueantes: el trigger de solapamiento solo revisa esas
+            for days in (future, history):
+                for room in rooms:
+                    for day in days:
+                        self.plan_day(room, day, demand[room.id] * WEEKDAY_WEIGHTS[day.weekday()], users_by_role)
+            self.flush()
+
+        self.stdout.write("🔄 Actualizando cachés y popularidad...")
+        bump_schedule_versions(
+            room_ids=[room.id for room in rooms],
+            user_ids=[pk for pks in users_by_role.values() for pk in pks],
+        )
+        invalidate_visible_rooms()
+        rebuild_scores()
+
+        elapsed = time_module.perf_counter() - started
+        self.stdout.write("\n" + "=" * 70)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {self.totals['reservas']} reservas, {self.totals['reseñas']} reseñas y "
+            f"{self.totals['registros']} registros de uso en {elapsed:.1f} s "
+            f"({self.totals['reservas'] / elapsed:.0f} reservas/s)"
+        ))
+        # No se guarda en ningún lado: esta es la única vez que se muestra
+        self.stdout.write(f"🔑 Contraseña de los usuarios '{prefix}_*': {password}")
+
+    # Usuarios y salas
+
+    def create_users(self, count, prefix, password):
+        roles, cumulative = weighted(ROLE_MIX)
+        # Un solo hash para todos: el hasher es deliberadamente lento
+        password = make_password(password)
+        created_at = self.now - timedelta(days=400)
+        users = [
+            User(
+                username=f'{prefix}_{index:07d}', email=f'{prefix}_{index:07d}@example.com',
+                role=role, password=password, terms_accepted=True, date_joined=created_at,
+            )
+            for index, role in enumerate(self.random.choices(roles, cum_weights=cumulative, k=count), start=1)
+        ]
+        with transaction.atomic():
+            User.objects.bulk_create(users, batch_size=500)
+        users_by_role = {role: [] for role in ROLE_MIX}
+        rows = User.objects.filter(username__startswith=f'{prefix}_').values_list('pk', 'role')
+        for pk, role in rows.iterator():
+            users_by_role[role].append(pk)
+        mix = ', '.join(f"{role}: {len(pks)}" for role, pks in users_by_role.items())
+        self.stdout.write(f"   👥 Usuarios: {count} ({mix})")
+        return users_by_role
+
+    def create_rooms(self, count, prefix):
+        types, cumulative = weighted({room_type: profile['share'] for room_type, profile in ROOM_PROFILES.items()})
+        rooms = []
+        for index, room_type in enumerate(self.random.choices(types, cum_weights=cumulative, k=count), start=1):
+            profile = ROOM_PROFILES[room_type]
+            rooms.append(Room(
+                name=f'{prefix.upper()} {room_type.replace("_", " ").title()} {index:04d}',
+                description=f'Sala sintética de tipo {room_type}',
+                capacity=self.random.randint(*profile['capacity']),
+                location=f'Edificio {1 + index % 6} - Piso {1 + index % 4}',
+                room_type=room_type,
+                allowed_roles=','.join(['admin'] + [role for role in profile['roles'] if role != 'admin']),
+                opening_time=OPENING,
+                closing_time=CLOSING,
+            ))
+        with transaction.atomic():
+            Room.objects.bulk_create(rooms, batch_size=500)
+        rooms = list(Room.objects.filter(name__startswith=f'{prefix.upper()} ').order_by('pk'))
+        self.stdout.write(f"   🏫 Salas: {len(rooms)}")
+        return rooms
+
+    def room_day_demand(self, rooms, days, total):
+        """
+        Reservas esperadas por sala en un día de peso 1, para llegar a total
+        en el período.
+
+        La demanda se reparte según el peso de cada tipo de sala, sin pasar
+        de MAX_FILL de su horario en los días hábiles; lo que excede a una
+        sala se reparte entre las demás.
+        """
+        day_weight = sum(WEEKDAY_WEIGHTS[day.weekday()] for day in days)
+        weights = {room.id: ROOM_PROFILES[room.room_type]['demand'] for room in rooms}
+        limits = {}
+        for room in rooms:
+            durations = ROOM_PROFILES[room.room_type]['durations']
+            mean_slots = sum(durations) / len(durations) / SLOT_MINUTES
+            limits[room.id] = MAX_FILL * DAY_SLOTS / mean_slots
+
+        demand = {}
+        remaining, open_rooms = total, set(weights)
+        while remaining > 0 and open_rooms and day_weight:
+            per_weight = remaining / day_weight / sum(weights[pk] for pk in open_rooms)
+            capped = {pk for pk in open_rooms if weights[pk] * per_weight >= limits[pk]}
+            if not capped:
+                demand.update((pk, weights[pk] * per_weight) for pk in open_rooms)
+                break
+            for pk in capped:
+                demand[pk] = limits[pk]
+                remaining -= limits[pk] * day_weight
+            open_rooms -= capped
+        return {room.id: demand.get(room.id, 0) for room in rooms}
+
+    # Reservas
+
+    def plan_day(self, room, day, expected, users_by_role):
+        """Ubicar las reservas de un día de una sala en bloques libres de su línea de tiempo."""
+        rand = self.random
+        count = int(expected) + (rand.random() < expected % 1)
+        if not count:
+            return
+        profile = ROOM_PROFILES[room.room_type]
+        roles = [role for role in profile['roles'] if users_by_role[role]]
+        if not roles:
+            return
+        role_weights = [profile['roles'][role] for role in roles]
+        # Los horarios de apertura (08:00-22:00) no cruzan los cambios de horario de Chile
+        # (a medianoche), por lo que basta un desfase UTC por día
+        offset = timezone.make_aware(datetime.combine(day, time(12))).utcoffset()
+        day_start = datetime.combine(day, OPENING) - offset
+
+        busy = bytearray(DAY_SLOTS)
+        for _ in range(count):
+            length = rand.choice(profile['durations']) // SLOT_MINUTES
+            starts = [slot for slot in range(DAY_SLOTS - length + 1) if not any(busy[slot:slot + length])]
+            if not starts:
+                continue
+            slot = rand.choices(starts, weights=[SLOT_WEIGHTS[start] for start in starts])[0]
+            busy[slot:slot + length] = b'\x01' * length
+
+            start = (day_start + timedelta(minutes=slot * SLOT_MINUTES)).replace(tzinfo=dt_timezone.utc)
+            end = start + timedelta(minutes=length * SLOT_MINUTES)
+            created_at = min(self.now, start - timedelta(minutes=rand.randint(30, 14 * 24 * 60)))
+            if end <= self.now:
+                statuses = PAST_STATUSES
+            elif start <= self.now:
+                statuses = CURRENT_STATUSES
+            else:
+                statuses = FUTURE_STATUSES
+            status = rand.choices(list(statuses), weights=list(statuses.values()))[0]
+            updated_at = created_at
+            if status == 'cancelled':
+                updated_at = created_at + (min(self.now, start) - created_at) * rand.random()
+
+            role = rand.choices(roles, weights=role_weights)[0]
+            self.pending.append(Reservation(
+                room_id=room.id,
+                user_id=rand.choice(users_by_role[role]),
+                start_time=start,
+                end_time=end,
+                purpose=rand.choice(profile['purposes']),
+                attendees_count=rand.randint(max(1, room.capacity // 3), room.capacity),
+                status=status,
+                created_at=created_at,
+                updated_at=updated_at,
+            ))
+            if len(self.pending) >= self.lote:
+                self.flush()
+
+    def flush(self):
+        """Insertar el lote de reservas pendiente con sus reseñas y registros de uso."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        with transaction.atomic():
+            Reservation.objects.bulk_create(batch)
+            reviews = [self.review_for(reservation) for reservation in batch
+                       if reservation.status == 'completed' and self.random.random() < self.review_ratio]
+            Review.objects.bulk_create(reviews)
+            logs = []
+            for reservation in batch:
+                logs.append(self.usage_log(reservation, 'create', reservation.created_at))
+                if reservation.status == 'cancelled':
+                    logs.append(self.usage_log(reservation, 'cancel', reservation.updated_at))
+            ReservationUsageLog.objects.bulk_create(logs)
+
+        self.totals['reservas'] += len(batch)
+        self.totals['reseñas'] += len(reviews)
+        self.totals['registros'] += len(logs)
+        now = time_module.perf_counter()
+        if now - self.last_report >= 5:
+            self.last_report = now
+            self.stdout.write(f"   📦 {self.totals['reservas']} reservas insertadas...")
+
+    def review_for(self, reservation):
+        rand = self.random
+        rating = rand.choices(list(RATING_WEIGHTS), weights=list(RATING_WEIGHTS.values()))[0]
+        if rating >= 4:
+            comment_type = 'positive'
+        elif rating == 3:
+            comment_type = rand.choice(('neutral', 'suggestion'))
+        else:
+            comment_type = 'problem'
+        created_at = min(self.now, reservation.end_time + timedelta(minutes=rand.randint(10, 48 * 60)))
+        return Review(
+            reservation=reservation,
+            rating=rating,
+            cleanliness_rating=min(5, max(1, rating + rand.randint(-1, 1))),
+            equipment_rating=min(5, max(1, rating + rand.randint(-1, 1))),
+            comfort_rating=min(5, max(1, rating + rand.randint(-1, 1))),
+            comment=rand.choice(REVIEW_COMMENTS[comment_type]),
+            comment_type=comment_type,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+
+    def usage_log(self, reservation, action, timestamp):
+        rand = self.random
+        return ReservationUsageLog(
+            user_id=reservation.user_id,
+            action=action,
+            reservation_id=reservation.pk,
+            room_name=self.room_names[reservation.room_id][:100],
+            timestamp=timestamp,
+            ip_address=f'10.{rand.randint(0, 255)}.{rand.randint(0, 255)}.{rand.randint(1, 254)}',
+            user_agent=rand.choice(USER_AGENTS),
+        )
@@ -311,13 +311,9 @@ def dashboard(request):
         start_time__gt=now
     ).select_related('room').order_by('start_time')[:3]
     
-    # Salas populares (más reservadas)
-    from django.db.models import Count
-    popular_rooms = Room.objects.filter(
-        is_active=True
-    ).annotate(
-        reservation_count=Count('reservations')
-    ).order_by('-reservation_count')[:5]
+    # Salas populares (ranking con decaimiento temporal precalculado)
+    from rooms.popularity import top_rooms
+    popular_rooms = top_rooms(limit=5)
     
     # Horarios sugeridos (basado en actividad del usuario)
     suggested_times = []